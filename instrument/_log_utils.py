@@ -2,6 +2,16 @@
 _log_utils.py
 
 Pending apstools 1.6.9 release
+
+File logging is queued (``queued_log_handler()``): the thread that logs
+(RunEngine, CA callbacks, ...) only puts the record in a bounded queue,
+a listener thread formats and writes it.  When the queue is full,
+records are dropped and counted.  ``RateLimitFilter`` limits chatty
+loggers (such as ``ophyd.control_layer``).  See ``log_queue_report()``.
+
+Compare RunEngine message times with direct and queued file logging::
+
+    python -m instrument._log_utils
 """
 
 # TODO: pending apstools 1.6.9 release
@@ -9,8 +19,21 @@ Pending apstools 1.6.9 release
 # from apstools.utils import get_log_path
 # from apstools.utils import setup_console_logging
 # from apstools.utils import stream_log_handler
+from collections import Counter
+import atexit
 import logging
+import logging.handlers
 import pathlib
+import queue
+import threading
+import time
+
+
+LOG_QUEUE_SIZE = 100_000        # records waiting to be written, then dropped
+CONTROL_LAYER_RATE = 200        # records/s from ophyd.control_layer, on average
+CONTROL_LAYER_BURST = 2_000     # records at once from ophyd.control_layer
+
+_queue_handlers = []            # DroppingQueueHandler objects, to report & stop
 
 
 def get_log_path():
@@ -134,3 +157,239 @@ def file_log_handler(
     handler.setFormatter(formatter)
 
     return handler
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    pass at most ``rate`` records/s (token bucket), ``burst`` at once
+
+    Counts the records suppressed (``suppressed``, by logger name).
+    Records at WARNING (or more) always pass.
+    """
+
+    def __init__(self, rate, burst=None, name=""):
+        super().__init__(name)
+        self.rate = rate
+        self.burst = burst or rate
+        self.suppressed = Counter()
+        self._tokens = self.burst
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._t) * self.rate)
+            self._t = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.suppressed[record.name] += 1
+            return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler with a bounded queue: drops (and counts) when full
+
+    The record is prepared as by ``QueueHandler``: the message (and
+    any exception) is formatted when queued, while its arguments are
+    what they were when logged.
+    """
+
+    def __init__(self, log_queue, name=None):
+        super().__init__(log_queue)
+        self.name = name
+        self.dropped = Counter()    # by logger name
+        self.listener = None
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped[record.name] += 1
+
+
+def queued_log_handler(handler, maxsize=LOG_QUEUE_SIZE):
+    """
+    ``handler``, moved to its own thread behind a bounded queue
+
+    Returns the ``DroppingQueueHandler`` to add to the logger(s)
+    instead of ``handler``.  Its level is that of ``handler``, so
+    records below it are not queued.  The listener thread stops (after
+    writing what is queued) when python exits.
+    """
+    qh = DroppingQueueHandler(
+        queue.Queue(maxsize=maxsize),
+        name=getattr(handler, "baseFilename", None) or handler.name,
+    )
+    qh.setLevel(handler.level)
+    qh.listener = logging.handlers.QueueListener(
+        qh.queue, handler, respect_handler_level=True
+    )
+    qh.listener.start()
+    _queue_handlers.append(qh)
+    return qh
+
+
+def log_queue_report():
+    """queued file logs: waiting, dropped, rate-limited, as a table"""
+    import pyRestTable
+
+    suppressed = Counter()
+    for name in logging.root.manager.loggerDict:
+        for f in getattr(logging.getLogger(name), "filters", []):
+            if isinstance(f, RateLimitFilter):
+                suppressed.update(f.suppressed)
+
+    table = pyRestTable.Table()
+    table.labels = "log waiting dropped rate-limited".split()
+    for qh in _queue_handlers:
+        table.addRow((
+            qh.name,
+            qh.queue.qsize(),
+            sum(qh.dropped.values()),
+            "",
+        ))
+    for name, n in sorted(suppressed.items()):
+        table.addRow((name, "", "", n))
+    return table
+
+
+def stop_queued_logging():
+    """write what is queued, stop the listener threads"""
+    while len(_queue_handlers) > 0:
+        qh = _queue_handlers.pop()
+        qh.listener.stop()
+        dropped = sum(qh.dropped.values())
+        if dropped > 0:
+            for handler in qh.listener.handlers:
+                handler.handle(
+                    logging.makeLogRecord(dict(
+                        name=__name__,
+                        levelno=logging.WARNING,
+                        levelname="WARNING",
+                        msg="%d log records dropped (queue full): %s",
+                        args=(dropped, dict(qh.dropped)),
+                    ))
+                )
+
+
+atexit.register(stop_queued_logging)
+
+
+def benchmark(num=2000, chatter_rate=20_000, stall_every=0, stall_time=0.05, log_path=None):
+    """
+    RunEngine message times: direct, queued, and rate-limited file logs
+
+    A ``count`` plan of ``num`` readings (ophyd.sim) runs while a thread
+    logs DEBUG records to ``ophyd.control_layer`` at ``chatter_rate``/s
+    (as CA monitor events do) and ``bluesky.RE.msg`` logs each message.
+    Each is written to a file as ``session_logs`` does.  With
+    ``stall_every``, every so many records written stall for
+    ``stall_time`` s (as a busy network file system).  Message times
+    are from ``RE.msg_hook``.  Returns a pyRestTable.Table.
+    """
+    import statistics
+    import tempfile
+    from bluesky import RunEngine
+    from bluesky import plans as bp
+    from ophyd.sim import det
+    import pyRestTable
+
+    log_path = pathlib.Path(log_path or tempfile.mkdtemp())
+    names = ("bluesky.RE.msg", "ophyd.control_layer")
+
+    def _stalling(emit):
+        count = [0]
+
+        def _emit(record):
+            count[0] += 1
+            if count[0] % stall_every == 0:
+                time.sleep(stall_time)
+            emit(record)
+
+        return _emit
+
+    def _run(mode):
+        handlers = []
+        for name in names:
+            logger = logging.getLogger(name)
+            logger.setLevel(logging.DEBUG)
+            logger.propagate = False
+            handler = file_log_handler(name, f"{name}-{mode}", log_path=log_path)
+            if stall_every > 0:
+                handler.emit = _stalling(handler.emit)
+            if mode != "direct":
+                handler = queued_log_handler(handler)
+            if mode == "queued, rate limit" and name == "ophyd.control_layer":
+                logger.addFilter(
+                    RateLimitFilter(CONTROL_LAYER_RATE, CONTROL_LAYER_BURST)
+                )
+            logger.addHandler(handler)
+            handlers.append((logger, handler))
+
+        chatty = logging.getLogger("ophyd.control_layer")
+        done = threading.Event()
+
+        def _chatter():
+            n = 0
+            t0 = time.monotonic()
+            while not done.is_set():
+                chatty.debug("update: pvname=%s value=%s", "9idcLAX:sim", n)
+                n += 1
+                ahead = n / chatter_rate - (time.monotonic() - t0)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        stamps = []
+        RE = RunEngine({})
+        RE.msg_hook = lambda msg: stamps.append(time.perf_counter())
+        thread = threading.Thread(target=_chatter, daemon=True)
+        thread.start()
+        t0 = time.perf_counter()
+        RE(bp.count([det], num=num))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        thread.join()
+
+        waiting = dropped = 0
+        for logger, handler in handlers:
+            logger.removeHandler(handler)
+            logger.filters.clear()
+            if isinstance(handler, DroppingQueueHandler):
+                waiting += handler.queue.qsize()
+                dropped += sum(handler.dropped.values())
+                handler.listener.stop()
+                _queue_handlers.remove(handler)
+                handler = handler.listener.handlers[0]
+            handler.close()
+
+        intervals = [b - a for a, b in zip(stamps, stamps[1:])]
+        intervals.sort()
+        return (
+            mode,
+            len(stamps),
+            f"{elapsed:.2f}",
+            f"{1e6 * statistics.median(intervals):.0f}",
+            f"{1e6 * intervals[int(0.99 * (len(intervals) - 1))]:.0f}",
+            waiting,
+            dropped,
+        )
+
+    table = pyRestTable.Table()
+    table.labels = "logging messages total,s median,us p99,us waiting dropped".split()
+    for mode in ("direct", "queued", "queued, rate limit"):
+        table.addRow(_run(mode))
+    print(f"{num} readings, ophyd.control_layer at {chatter_rate}/s, logs in {log_path}")
+    if stall_every > 0:
+        print(f"file system stalls {stall_time} s every {stall_every} records")
+    print(table)
+    return table
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark(num=1000, chatter_rate=5_000, stall_every=500)
@@ -14,6 +14,9 @@ logger.info(__file__)
 RMAX_CUTOFF = 0.4  # when calculating the center, look at data above CUTOFF*R_max
 ZINGER_THRESHOLD = 2
 DEFAULT_SCALER_PULSES_PER_SECOND = 1e-7  # FIXME: why is this < 1?
+FLYSCAN_NUM_BINS = 250  # log-spaced Q bins for reduced fly scan data
+NUM_AMPLIFIER_RANGES = 5
+UPD_AMPLIFIER_NAMES = ("DLPCA200", "DDPCA300")  # if the file has no ZNAM, ONAM
 
 
 def amplifier_corrections(signal, seconds, dark, gain):
@@ -98,47 +101,71 @@ def calc_R_Q(
     return result
 
 
+def find_zingers(y, threshold=ZINGER_THRESHOLD):
+    """
+    Return boolean array, True where y[i] is a zinger.
+
+    A zinger is a point that fails the ratio test against its neighbors:
+    ``mean(y[i-1:i+2]) / mean(y[i-1], y[i+1]) > threshold``.  All points
+    are tested at once.  Adjacent zingers are found by repeating the test
+    on the remaining points (seldom needed).
+    """
+    y = numpy.asarray(y, dtype=float)
+    zingers = numpy.zeros(len(y), dtype=bool)
+    if len(y) < 3:
+        return zingers
+    # v[i] > k * mean(neighbors) is the same test as above
+    k = 3 * threshold - 2
+    index = numpy.arange(len(y))
+    while True:
+        keep = index[~zingers]
+        v = y[keep]
+        if len(v) < 3:
+            break
+        neighbors = numpy.empty_like(v)
+        neighbors[1:-1] = (v[:-2] + v[2:]) / 2
+        neighbors[0] = v[1]  # ends have only one neighbor
+        neighbors[-1] = v[-2]
+        found = v > k * neighbors
+        if not found.any():
+            break
+        for i in keep[found]:
+            logger.debug("zinger at index %d", i)
+        zingers[keep[found]] = True
+    return zingers
+
+
+def _integrate(y, x):
+    """Simpson's rule integral of y(x), trapezoid rule if no SciPy."""
+    try:
+        from scipy.integrate import simpson
+    except ImportError:
+        trapezoid = getattr(numpy, "trapezoid", None) or numpy.trapz
+        return trapezoid(y, x)
+    return simpson(y, x=x)
+
+
 def centroid(x, y):
     """Compute centroid of y(x)."""
-    import scipy.integrate
-
-    def zinger_test(u, v):
-        m = max(v)
-        p = numpy.where(v == m)[0][0]
-        top = (v[p - 1] + v[p] + v[p + 1]) / 3
-        bot = (v[p - 1] + v[p + 1]) / 2
-        v_test = top / bot
-        logger.debug("zinger test: %f", v_test)
-        return v_test
-
-    a = remove_masked_data(x, y.mask)
-    b = remove_masked_data(y, y.mask)
-
-    while zinger_test(a, b) > ZINGER_THRESHOLD:
-        R_max = max(b)
-        peak_index = numpy.where(b == R_max)[0][0]
-        # delete or mask x[peak_index], and y[peak_index]
-        logger.debug("removing zinger at ar = %f", a[peak_index])
-        a = numpy.delete(a, peak_index)
-        b = numpy.delete(b, peak_index)
+    a = remove_masked_data(x, numpy.ma.getmaskarray(y))
+    b = remove_masked_data(y, numpy.ma.getmaskarray(y))
+
+    # remove zingers
+    good = ~find_zingers(b)
+    a = a[good]
+    b = b[good]
 
     # gather the data nearest the peak (above the CUTOFF)
-    R_max = max(b)
-    cutoff = R_max * RMAX_CUTOFF
-    peak_index = numpy.where(b == R_max)[0][0]
-    n = len(a)
-
-    # walk down each side from the peak
-    pLo = peak_index
-    while pLo >= 0 and b[pLo] > cutoff:
-        pLo -= 1
-
-    pHi = peak_index + 1
-    while pHi < n and b[pHi] > cutoff:
-        pHi += 1
-
-    # enforce boundaries
-    pLo = max(0, pLo + 1)  # the lowest ar above the cutoff
+    n = len(b)
+    peak_index = numpy.argmax(b)
+    cutoff = b[peak_index] * RMAX_CUTOFF
+    below = numpy.flatnonzero(b <= cutoff)
+
+    # contiguous region above the cutoff, around the peak
+    pLo = below[below < peak_index]
+    pLo = pLo[-1] + 1 if len(pLo) else 0  # the lowest ar above the cutoff
+    pHi = below[below > peak_index]
+    pHi = pHi[0] if len(pHi) else n
     pHi = min(n - 1, pHi)  # the highest ar (+1) above the cutoff
 
     if pHi - pLo == 0:
@@ -149,14 +176,14 @@ def centroid(x, y):
         # trivial answer
         emsg = "peak is 1 point, picking peak position as center"
         logger.debug(emsg)
-        return x[peak_index]
+        return a[peak_index]
 
     a = a[pLo:pHi]
     b = b[pLo:pHi]
 
     weight = b * b
-    top = scipy.integrate.simps(a * weight, a)
-    bottom = scipy.integrate.simps(weight, a)
+    top = _integrate(a * weight, a)
+    bottom = _integrate(weight, a)
     center = top / bottom
 
     emsg = "computed peak center: " + str(center)
@@ -207,7 +234,276 @@ def reduce_uascan(root):
     return usaxs
 
 
+def _scalar(group, key, default=None):
+    """Single value of dataset ``key``, saveFlyData writes these as [value]."""
+    if key not in group:
+        return default
+    value = numpy.asarray(group[key][()]).ravel()
+    if len(value) == 0:
+        return default
+    value = value[0]
+    if isinstance(value, bytes):
+        value = value.decode("utf8")
+    return value
+
+
+def _number(group, key, default=0):
+    """``_scalar()`` as float, ``default`` if not a number (such as "no data")."""
+    try:
+        return float(_scalar(group, key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _recorded_changes(group, chan_key, value_key):
+    """
+    Channel numbers and values recorded during a fly scan.
+
+    The IOC arrays are padded after the last change, keep only the
+    part where the channel numbers increase.
+    """
+    if chan_key not in group or value_key not in group:
+        return None, None
+    chan = numpy.asarray(group[chan_key][()]).ravel()
+    value = numpy.asarray(group[value_key][()]).ravel()
+    n = min(len(chan), len(value))
+    if n == 0 or not numpy.issubdtype(chan.dtype, numpy.number):
+        return None, None
+    chan = chan[:n].astype(int)
+    value = value[:n]
+    stop = numpy.flatnonzero(numpy.diff(chan) <= 0)
+    if len(stop) > 0:
+        n = stop[0] + 1
+    return chan[:n], value[:n]
+
+
+def amplifier_range_per_channel(
+    change_channels, change_ranges, num_channels, mask_after_change=0,
+    seconds=None, mask_times=None,
+):
+    """
+    Amplifier range of each MCS channel, from the recorded range changes.
+
+    Channels are masked after each change: ``mask_after_change``
+    channels, and (if ``seconds`` and ``mask_times`` are given) the
+    channels which start within the mask time of the new range.
+
+    :param [int] change_channels: MCS channel at each range change
+    :param [int] change_ranges: amplifier range set at each change
+    :param int num_channels: number of MCS channels
+    :param int mask_after_change: number of channels to mask after each change
+    :param [float] seconds: counting time of each MCS channel
+    :param [float] mask_times: time (s) to mask after a change, for each range
+    :returns (ranges, mask): arrays of length ``num_channels``
+    """
+    channels = numpy.arange(num_channels)
+    if change_channels is None or len(change_channels) == 0:
+        return numpy.zeros(num_channels, dtype=int), numpy.zeros(num_channels, dtype=bool)
+    index = numpy.searchsorted(change_channels, channels, side="right") - 1
+    index = index.clip(0, len(change_channels) - 1)
+    ranges = numpy.asarray(change_ranges, dtype=int)[index]
+    ranges = ranges.clip(0, NUM_AMPLIFIER_RANGES - 1)
+    change_channels = numpy.asarray(change_channels)
+    since = channels - change_channels[index]
+    mask = (index > 0) & (since >= 0) & (since < mask_after_change)
+    if seconds is not None and mask_times is not None:
+        # start time of each channel, from the start of the scan
+        t = numpy.concatenate(([0], numpy.cumsum(seconds[: num_channels - 1])))
+        since_change = t - t[change_channels.clip(0, num_channels - 1)][index]
+        mask_time = numpy.asarray(mask_times, dtype=float)[ranges]
+        mask |= (index > 0) & (since >= 0) & (since_change < mask_time)
+    return ranges, mask
+
+
+def _amplifier_gain_dark(metadata, prefix, ranges):
+    """Gain and dark current of each channel, for amplifier ``prefix``."""
+    gain = numpy.array(
+        [_scalar(metadata, f"{prefix}_gain{r}", 1) for r in range(NUM_AMPLIFIER_RANGES)],
+        dtype=float,
+    )
+    dark = numpy.array(
+        [_scalar(metadata, f"{prefix}_bkg{r}", 0) for r in range(NUM_AMPLIFIER_RANGES)],
+        dtype=float,
+    )
+    return gain[ranges], dark[ranges]
+
+
+def flyscan_ar(flyscan, num_channels):
+    """AR angle of each MCS channel of a fly scan."""
+    chan, angle = _recorded_changes(flyscan, "changes_AR_PSOpulse", "changes_AR_angle")
+    if chan is not None and len(chan) > 1:
+        # interpolate the AR encoder readings at the PSO pulses
+        return numpy.interp(numpy.arange(num_channels), chan, angle)
+
+    if "AR_PulsePositions" in flyscan:
+        positions = numpy.asarray(flyscan["AR_PulsePositions"][()], dtype=float).ravel()
+        if len(positions) > num_channels:
+            # channel i is between pulse i and pulse i+1
+            return (positions[:num_channels] + positions[1 : num_channels + 1]) / 2
+        if len(positions) == num_channels:
+            return positions
+
+    ar_start = float(_scalar(flyscan, "AR_start"))
+    ar_increment = float(_scalar(flyscan, "AR_increment"))
+    return ar_start + ar_increment * numpy.arange(num_channels)
+
+
+def reduce_flyscan(root, mask_after_change=0):
+    """
+    1-D data reduction of a fly scan, from the saveFlyData HDF5 file.
+
+    Only the datasets needed are read from the file.  Amplifier gain and
+    dark current corrections are applied per MCS channel using the
+    amplifier range changes recorded during the scan.  After each range
+    change of the photodiode amplifier, the channels within its mask
+    time (``upd_amp_change_mask_time0..4``, s) are masked.
+
+    :param obj root: h5py File object
+    :param int mask_after_change: number of channels to mask after each
+        amplifier range change
+    :returns dict: Q, R, dR, seconds (for each unmasked channel) and other terms
+    """
+    entry = root["/entry"]
+    flyscan = entry["flyScan"]
+    metadata = entry["metadata"]
+
+    num_channels = int(_scalar(flyscan, "mca_channels", len(flyscan["mca1"])))
+    num_channels = min(num_channels, *[len(flyscan[k]) for k in "mca1 mca2 mca3".split()])
+    clock = flyscan["mca1"][:num_channels].astype(float)
+    I0 = flyscan["mca2"][:num_channels].astype(float)
+    pd = flyscan["mca3"][:num_channels].astype(float)
+    seconds = clock / float(_scalar(flyscan, "mca_clock_frequency", 50e6))
+
+    ar = flyscan_ar(flyscan, num_channels)
+    wavelength = float(_scalar(metadata, "DCM_wavelength"))
+    ar_center = _scalar(metadata, "AR_center")
+
+    # photodiode: which amplifier was used in this scan?
+    model = _scalar(flyscan, "upd_flyScan_amplifier", 0)
+    names = [
+        _scalar(flyscan, f"upd_flyScan_amplifier_{key}", default)
+        for key, default in zip(("ZNAM", "ONAM"), UPD_AMPLIFIER_NAMES)
+    ]
+    try:
+        amplifier = str(names[int(model)]).strip()
+    except (ValueError, IndexError):
+        amplifier = str(model)
+    chan, gains = _recorded_changes(
+        flyscan, f"changes_{amplifier}_mcsChan", f"changes_{amplifier}_ampGain"
+    )
+    mask_times = [
+        _number(metadata, f"upd_amp_change_mask_time{r}", 0)
+        for r in range(NUM_AMPLIFIER_RANGES)
+    ]
+    pd_range, pd_mask = amplifier_range_per_channel(
+        chan, gains, num_channels, mask_after_change,
+        seconds=seconds, mask_times=mask_times,
+    )
+    pd_gain, pd_dark = _amplifier_gain_dark(metadata, "upd", pd_range)
+
+    chan, gains = _recorded_changes(flyscan, "changes_I0_mcsChan", "changes_I0_ampGain")
+    I0_range, I0_mask = amplifier_range_per_channel(chan, gains, num_channels, mask_after_change)
+    I0_gain, I0_dark = _amplifier_gain_dark(metadata, "I0", I0_range)
+
+    r = amplifier_corrections(pd, seconds, pd_dark, pd_gain)
+    r0 = amplifier_corrections(I0, seconds, I0_dark, I0_gain)
+    rVec = numpy.ma.masked_less_equal(r / r0, 0)
+    rVec = numpy.ma.masked_where(pd_mask | I0_mask | ~numpy.isfinite(rVec), rVec)
+    if ar_center is None:
+        ar_center = centroid(ar, rVec)
+
+    d2r = math.pi / 180
+    qVec = (4 * math.pi / wavelength) * numpy.sin(d2r * (ar_center - ar) / 2)
+    # counting statistics of the photodiode and monitor
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        drVec = rVec * numpy.sqrt(1 / pd + 1 / I0)
+
+    mask = numpy.ma.getmaskarray(rVec) | ~numpy.isfinite(numpy.ma.getdata(drVec))
+    Q = remove_masked_data(qVec, mask)
+    R = remove_masked_data(rVec, mask)
+    dR = remove_masked_data(drVec, mask)
+
+    result = dict(
+        Q=Q,
+        R=R,
+        dR=dR,
+        seconds=remove_masked_data(seconds, mask),
+        ar_0=ar_center,
+        ar_r_peak=ar[numpy.argmax(rVec)],
+        r_peak=rVec.max(),
+        num_channels=num_channels,
+    )
+    return result
+
+
+def save_flyscan_reduced(root, data, addr="/entry/flyscan_reduced_full"):
+    """Save reduced fly scan ``data`` to NXdata group ``addr``, replace existing."""
+    import datetime
+
+    if addr in root:
+        del root[addr]
+    nxdata = root.create_group(addr)
+    nxdata.attrs["NX_class"] = "NXdata"
+    nxdata.attrs["Q_indices"] = 0
+    nxdata.attrs["axes"] = "Q"
+    nxdata.attrs["signal"] = "R"
+    nxdata.attrs["timestamp"] = str(datetime.datetime.now())
+
+    for k, v in data.items():
+        nxdata.create_dataset(k, data=v)
+    nxdata["Q"].attrs["units"] = "1/A"
+    nxdata["R"].attrs["units"] = "none"
+    if "dR" in nxdata:
+        nxdata["R"].attrs["uncertainties"] = "dR"
+    return nxdata
+
+
+def reduce_flyscan_file(filename, num_bins=FLYSCAN_NUM_BINS, min_count=1, **kwargs):
+    """
+    Reduce a fly scan HDF5 file, write result back into the same file.
+
+    Writes NXdata groups ``/entry/flyscan_reduced_full`` and (if ``num_bins``)
+    ``/entry/flyscan_reduced_rebinned``, weighted by counting time.
+    """
+    import h5py
+
+    from .rebin_reduced_data import rebin
+
+    with h5py.File(filename, "r+") as root:
+        data = reduce_flyscan(root, **kwargs)
+        save_flyscan_reduced(root, data, "/entry/flyscan_reduced_full")
+        if num_bins:
+            rebinned = rebin(
+                data["Q"],
+                data["R"],
+                data["dR"],
+                num_bins=num_bins,
+                min_count=min_count,
+                seconds=data["seconds"],
+            )
+            save_flyscan_reduced(root, rebinned, "/entry/flyscan_reduced_rebinned")
+    return data
+
+
 def remove_masked_data(data, mask):
     """Remove all masked data, convenience routine."""
     arr = numpy.ma.masked_array(data=data, mask=mask)
     return arr.compressed()
+
+
+def _benchmark_centroid(sizes=(8_000, 20_000, 50_000, 100_000), repeat=5):
+    """Time centroid() on synthetic rocking curves with zingers."""
+    import time
+
+    rng = numpy.random.default_rng(12345)
+    for n in sizes:
+        x = numpy.linspace(-0.01, 0.01, n)
+        y = 1e6 * numpy.exp(-0.5 * (x / 0.001) ** 2) + 10
+        y = rng.poisson(y).astype(float)
+        y[rng.integers(0, n, n // 1000)] *= 20  # zingers
+        y = numpy.ma.masked_less_equal(y, 0)
+        t0 = time.time()
+        for _i in range(repeat):
+            center = centroid(x, y)
+        dt = (time.time() - t0) / repeat
+        print(f"n={n:7d}  centroid={center:+.3e}  {dt*1000:.2f} ms")
@@ -232,6 +232,7 @@ class NXWriterUascan(OurCustomNXWriterBase):
     # add RE.md["positioners"] = list : entire list is for NXdata @axes attribute
 
     nxdata_signal = "PD_USAXS"
+    rebin_num_bins = 250  # for /entry/uascan_reduced_rebinned
     nxdata_signal_axes = [
         "a_stage_r",
     ]
@@ -252,6 +253,8 @@ class NXWriterUascan(OurCustomNXWriterBase):
             nxdata.create_dataset(k, data=v)
         nxdata["Q"].attrs["units"] = "1/A"
         nxdata["R"].attrs["units"] = "none"
+        if "dR" in nxdata:
+            nxdata["R"].attrs["uncertainties"] = "dR"
 
     def write_entry(self):
         "Write reduced SAXS data from here."
@@ -273,6 +276,16 @@ class NXWriterUascan(OurCustomNXWriterBase):
             self.save_reduced_as_nxdata(h5_address, data)
         except Exception as exinfo:
             logger.warning("Did not write reduced uascan data: %s", exinfo)
+            return
+
+        try:
+            from .rebin_reduced_data import rebin
+
+            h5_address = "/entry/uascan_reduced_rebinned"
+            rebinned = rebin(data["Q"], data["R"], num_bins=self.rebin_num_bins)
+            self.save_reduced_as_nxdata(h5_address, rebinned)
+        except Exception as exinfo:
+            logger.warning("Did not write rebinned uascan data: %s", exinfo)
 
     def write_slits(self, parent):
         """
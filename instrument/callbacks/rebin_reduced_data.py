@@ -0,0 +1,141 @@
+"""
+Rebin reduced USAXS R(Q) data onto a log-spaced Q grid.
+
+Fly scans produce tens of thousands of R(Q) points, a few hundred
+are enough for users and livedata.
+"""
+
+import logging
+
+import numpy
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+
+DEFAULT_NUM_BINS = 250
+DEFAULT_MIN_COUNT = 1  # minimum number of points in a bin
+
+
+def log_bin_edges(q_min, q_max, num_bins=DEFAULT_NUM_BINS):
+    """Edges of ``num_bins`` log-spaced bins from ``q_min`` to ``q_max``."""
+    return numpy.geomspace(q_min, q_max, num_bins + 1)
+
+
+def merge_sparse_bins(counts, min_count=DEFAULT_MIN_COUNT):
+    """
+    Group adjacent bins so each group has at least ``min_count`` points.
+
+    :param numpy.ndarray([int]) counts: number of points in each bin
+    :returns numpy.ndarray([int]): group number of each bin
+    """
+    # cheap: loops over bins, not over data points
+    group = numpy.empty(len(counts), dtype=int)
+    g = 0
+    total = 0
+    for i, n in enumerate(counts):
+        group[i] = g
+        total += n
+        if total >= min_count:
+            g += 1
+            total = 0
+    if total > 0 and g > 0:
+        group[group == g] = g - 1  # last group too small, join previous group
+    return group
+
+
+def rebin(
+    Q,
+    R,
+    dR=None,
+    num_bins=DEFAULT_NUM_BINS,
+    q_min=None,
+    q_max=None,
+    min_count=DEFAULT_MIN_COUNT,
+    seconds=None,
+):
+    """
+    Rebin R(Q) onto log-spaced Q bins.
+
+    Points in each bin are averaged with weights :math:`w` (counting time
+    if ``seconds`` is given, otherwise 1).  The uncertainty of the
+    average is propagated from ``dR``:
+    :math:`\\sigma = \\sqrt{\\sum w^2 dR^2} / \\sum w`.
+    Without ``dR``, it is the standard error of the points in the bin.
+    Only :math:`Q > 0` is used.
+
+    :param numpy.ndarray([float]) Q: :math:`Q`
+    :param numpy.ndarray([float]) R: :math:`R(Q)`
+    :param numpy.ndarray([float]) dR: uncertainty of R (optional)
+    :param int num_bins: number of log-spaced bins
+    :param float q_min: lower edge of first bin (default: smallest Q)
+    :param float q_max: upper edge of last bin (default: largest Q)
+    :param int min_count: merge adjacent bins to have at least this many points
+    :param numpy.ndarray([float]) seconds: counting time of each point (optional)
+    :returns dictionary: Q, R, dR, dQ (half width of bin), n (points in bin)
+    """
+    Q = numpy.asarray(Q, dtype=float)
+    R = numpy.asarray(R, dtype=float)
+    keep = numpy.isfinite(Q) & numpy.isfinite(R) & (Q > 0)
+    if q_min is not None:
+        keep &= Q >= q_min
+    if q_max is not None:
+        keep &= Q <= q_max
+    if dR is not None:
+        dR = numpy.asarray(dR, dtype=float)
+        keep &= numpy.isfinite(dR)
+        dR = dR[keep]
+    if seconds is not None:
+        w = numpy.asarray(seconds, dtype=float)[keep]
+    else:
+        w = numpy.ones(keep.sum())
+    Q = Q[keep]
+    R = R[keep]
+
+    empty = numpy.array([])
+    if len(Q) == 0:
+        return dict(Q=empty, R=empty, dR=empty, dQ=empty, n=empty.astype(int))
+
+    edges = log_bin_edges(q_min or Q.min(), q_max or Q.max(), num_bins)
+    index = numpy.searchsorted(edges, Q, side="right") - 1
+    index = index.clip(0, num_bins - 1)
+
+    if min_count > 1:
+        counts = numpy.bincount(index, minlength=num_bins)
+        group = merge_sparse_bins(counts, min_count)
+        index = group[index]
+        lo = numpy.full(group.max() + 1, numpy.inf)
+        hi = numpy.zeros(group.max() + 1)
+        numpy.minimum.at(lo, group, edges[:-1])
+        numpy.maximum.at(hi, group, edges[1:])
+    else:
+        lo, hi = edges[:-1], edges[1:]
+
+    def _sum(weights):
+        return numpy.bincount(index, weights=weights, minlength=len(lo))
+
+    n = numpy.bincount(index, minlength=len(lo))
+    sum_w = _sum(w)
+    used = (n > 0) & (sum_w > 0)
+    sum_w = sum_w[used]
+    R_bin = _sum(w * R)[used] / sum_w
+    Q_bin = _sum(w * Q)[used] / sum_w
+    if dR is not None:
+        dR_bin = numpy.sqrt(_sum((w * dR) ** 2)[used]) / sum_w
+    else:
+        # weighted variance of the points, standard error of the mean
+        variance = _sum(w * R * R)[used] / sum_w - R_bin**2
+        nn = n[used]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            dR_bin = numpy.where(
+                nn > 1, numpy.sqrt(variance.clip(0) / (nn - 1)), 0.0
+            )
+
+    result = dict(
+        Q=Q_bin,
+        R=R_bin,
+        dR=dR_bin,
+        dQ=(hi[used] - lo[used]) / 2,
+        n=n[used],
+    )
+    return result
@@ -45,3 +45,8 @@ from .pilatus_module import *
 # and only when all devices are defined
 from .autocollect import *
 
+# connect all of the above in the background, log the connect times
+# (see instrument.utils.device_registry)
+from ..utils.device_registry import device_registry
+device_registry.add_namespace(globals())
+device_registry.connect()
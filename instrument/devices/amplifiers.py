@@ -65,6 +65,10 @@ __all__ = """
     controls_list_UPD_I0_I00_TRD
 
     autoscale_amplifiers
+    autoscale_report
+    autoscale_statistics
+    dark_current_cache
+    DarkCurrentCache
     measure_background
     """.split()
 
@@ -76,8 +80,10 @@ logger.info(__file__)
 
 from apstools.synApps import SwaitRecord
 from bluesky import plan_stubs as bps
+from collections import deque
 from collections import OrderedDict
 import epics
+import json
 import numpy as np
 from ophyd import Component, Device, Signal
 from ophyd import EpicsSignal, EpicsSignalRO
@@ -85,6 +91,8 @@ from ophyd import DynamicDeviceComponent, FormattedComponent
 # from ophyd.scaler import ScalerCH, ScalerChannel
 from .override_ScalerCH import ScalerCH, ScalerChannel
 from ophyd.utils import OrderedDefaultDict
+import os
+import time
 
 from .aps_source import aps
 from ..framework import RE, sd
@@ -94,6 +102,12 @@ from .scalers import I0_SIGNAL, I00_SIGNAL, UPD_SIGNAL, TRD_SIGNAL
 
 NUM_AUTORANGE_GAINS = 5     # common to all autorange sequence programs
 AMPLIFIER_MINIMUM_SETTLING_TIME = 0.01    # reasonable?
+AUTOSCALE_HEADROOM = 0.5    # predicted rate, as fraction of maximum allowed
+AUTOSCALE_STATISTICS_HISTORY = 200  # per detector
+DARK_CURRENT_HISTORY_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "usaxs-bluesky", "dark_currents.jsonl"
+)
+DARK_CURRENT_HISTORY_LENGTH = 100   # entries kept per amplifier range
 
 
 class ModifiedSwaitRecord(SwaitRecord):
@@ -386,10 +400,239 @@ def group_controls_by_scaler(controls):
     return scaler_dict
 
 
-def _scaler_background_measurement_(control_list, count_time=0.2, num_readings=8):
-    """plan: internal: measure amplifier backgrounds for signals sharing a common scaler"""
+class DarkCurrentCache:
+    """
+    dark current (background) of each amplifier range, with a staleness policy
+
+    Each entry is stamped with the time, temperature (if
+    ``temperature_signal`` is set), and UPD amplifier model
+    (``9idcLAX:femto:model``).  The status of a range is:
+
+    ``stale``
+        unknown, older than ``max_age``, or model, count time, or
+        temperature changed, or the EPICS background PV was changed
+        (such as by an IOC reboot): measure again
+    ``check``
+        older than ``check_age``: count ``check_readings`` times and
+        measure again only if drifted by more than ``drift_sigma``
+        times ``background_error``
+    ``fresh``
+        use as-is, no counting
+
+    Every measurement and check is appended to ``history_file``
+    (JSON lines), which also restores the cache in a new session.
+    See ``trend()`` to follow drift.  When the file has more than twice
+    ``history_length`` entries per range, it is compacted (``compact()``).
+    """
+
+    max_age = 8 * 3600          # s
+    check_age = 30 * 60         # s
+    check_readings = 2
+    drift_sigma = 3
+    minimum_error = 1.0         # counts, for ranges with no noise
+    temperature_tolerance = 1.0     # same units as temperature_signal
+    temperature_signal = None   # ophyd Signal, such as hutch temperature
+
+    def __init__(self, history_file=DARK_CURRENT_HISTORY_FILE, history_length=DARK_CURRENT_HISTORY_LENGTH):
+        self.history_file = history_file
+        self.history_length = history_length
+        self.entries = {}
+        self._lines = 0         # entries in history_file
+        self._keys = set()      # ranges in history_file
+        self._load()
+
+    @staticmethod
+    def key(control, n):
+        return f"{control.auto.prefix}gain{n}"
+
+    @property
+    def model(self):
+        return _amplifier_id_upd
+
+    def temperature(self):
+        if self.temperature_signal is None:
+            return None
+        try:
+            return float(self.temperature_signal.get())
+        except Exception as exc:
+            logger.warning("could not read temperature: %s", exc)
+            return None
+
+    def _load(self):
+        history = self.history()
+        for entry in history:
+            if entry["method"] == "measure":
+                self.entries[entry["key"]] = entry
+            elif entry["key"] in self.entries:
+                self.entries[entry["key"]]["time_checked"] = entry["time"]
+        self._lines = len(history)
+        self._keys = set(entry["key"] for entry in history)
+        if self._too_long():
+            self.compact(history)
+
+    def _too_long(self):
+        return self._lines > 2 * self.history_length * max(1, len(self._keys))
+
+    def _append(self, entry):
+        try:
+            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+            with open(self.history_file, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as exc:
+            logger.warning("could not write dark current history: %s", exc)
+            return
+        self._lines += 1
+        self._keys.add(entry["key"])
+        if self._too_long():
+            self.compact()
+
+    def compact(self, history=None):
+        """
+        rewrite ``history_file`` with the last ``history_length`` entries of each range
+
+        The latest measurement of each range is kept, even if older.
+        """
+        if history is None:
+            history = self.history()
+        by_key = OrderedDefaultDict(list)
+        for i, entry in enumerate(history):
+            by_key[entry["key"]].append(i)
+        keep = set()
+        for indexes in by_key.values():
+            keep.update(indexes[-self.history_length:])
+            measured = [i for i in indexes if history[i]["method"] == "measure"]
+            if len(measured) > 0:
+                keep.add(measured[-1])
+
+        kept = [history[i] for i in sorted(keep)]
+        temporary_file = self.history_file + ".tmp"
+        try:
+            with open(temporary_file, "w") as f:
+                for entry in kept:
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(temporary_file, self.history_file)
+        except OSError as exc:
+            logger.warning("could not compact dark current history: %s", exc)
+            return
+        logger.info(
+            "dark current history: kept %d of %d entries", len(kept), len(history)
+        )
+        self._lines = len(kept)
+
+    def history(self, control=None, n=None):
+        """list of recorded entries, optionally for one control (and range)"""
+        if not os.path.exists(self.history_file):
+            return []
+        prefix = None if control is None else control.auto.prefix
+        entries = []
+        with open(self.history_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if prefix is not None and not entry["key"].startswith(prefix):
+                    continue
+                if n is not None and entry["range"] != n:
+                    continue
+                entries.append(entry)
+        return entries
+
+    def trend(self, control, n):
+        """arrays (time, background, background_error) to follow drift"""
+        entries = self.history(control, n)
+        return (
+            np.array([e["time"] for e in entries]),
+            np.array([e["background"] for e in entries]),
+            np.array([e["background_error"] for e in entries]),
+        )
+
+    def status(self, control, n, count_time, now=None, temperature=None):
+        """one of: ``stale  check  fresh``"""
+        entry = self.entries.get(self.key(control, n))
+        now = now or time.time()
+        if (
+            entry is None
+            or entry["model"] != self.model
+            or entry["count_time"] != count_time
+            or now - entry["time"] > self.max_age
+        ):
+            return "stale"
+        if None not in (temperature, entry["temperature"]):
+            if abs(temperature - entry["temperature"]) > self.temperature_tolerance:
+                return "stale"
+        g = getattr(control.auto.ranges, f"gain{n}")
+        if not np.isclose(g.background.get(), entry["background"], rtol=1e-3):
+            return "stale"
+        if now - entry.get("time_checked", entry["time"]) > self.check_age:
+            return "check"
+        return "fresh"
+
+    def plan_ranges(self, control_list, count_time):
+        """
+        ranges to measure and ranges to check, for controls sharing a scaler
+
+        All channels on the scaler are counted together, so a range
+        is measured (or checked) for all of them when any one needs it.
+        """
+        now = time.time()
+        temperature = self.temperature()
+        stale, check = [], []
+        for n in range(NUM_AUTORANGE_GAINS):
+            states = [
+                self.status(control, n, count_time, now, temperature)
+                for control in control_list
+            ]
+            if "stale" in states:
+                stale.append(n)
+            elif "check" in states:
+                check.append(n)
+        return stale, check
+
+    def drifted(self, control, n, value):
+        entry = self.entries[self.key(control, n)]
+        limit = self.drift_sigma * max(entry["background_error"], self.minimum_error)
+        return abs(value - entry["background"]) > limit
+
+    def record(self, control, n, background, background_error, count_time, num_readings, method="measure"):
+        entry = dict(
+            time=time.time(),
+            key=self.key(control, n),
+            detector=control.nickname,
+            range=n,
+            background=float(background),
+            background_error=float(background_error),
+            count_time=count_time,
+            num_readings=num_readings,
+            temperature=self.temperature(),
+            model=self.model,
+            method=method,
+        )
+        if method == "measure":
+            self.entries[entry["key"]] = entry
+        elif entry["key"] in self.entries:
+            self.entries[entry["key"]]["time_checked"] = entry["time"]
+        self._append(entry)
+
+
+dark_current_cache = DarkCurrentCache()
+
+
+def _scaler_channel_value_(scaler_channel):
+    """internal: present value of a scaler channel"""
+    value = scaler_channel.get()     # EpicsScaler channel value or ScalerCH ScalerChannelTuple
+    if not isinstance(value, float):
+        value = scaler_channel.s.get()     # ScalerCH channel value
+    return value
+
+
+def _scaler_background_readings_(control_list, count_time, num_readings, ranges):
+    """
+    plan: internal: count each range for signals sharing a common scaler
+
+    returns dictionary: {range: {nickname: [readings]}}
+    """
     scaler = control_list[0].scaler
-    signals = [c.signal for c in control_list]
 
     stage_sigs = {}
     stage_sigs["scaler"] = scaler.stage_sigs   # benign
@@ -404,7 +647,8 @@ def _scaler_background_measurement_(control_list, count_time=0.2, num_readings=8
     for control in control_list:
         yield from bps.mv(control.auto.mode, AutorangeSettings.manual)
 
-    for n in range(NUM_AUTORANGE_GAINS-1, -1, -1):  # reverse order
+    readings = {}
+    for n in sorted(ranges, reverse=True):  # reverse order
         # set gains
         settling_time = AMPLIFIER_MINIMUM_SETTLING_TIME
         for control in control_list:
@@ -412,58 +656,91 @@ def _scaler_background_measurement_(control_list, count_time=0.2, num_readings=8
             settling_time = max(settling_time, control.femto.settling_time.get())
         yield from bps.sleep(settling_time)
 
-        def getScalerChannelPvname(scaler_channel):
-            try:
-                return scaler_channel.pvname        # EpicsScaler channel
-            except AttributeError:
-                return scaler_channel.chname.get()  # ScalerCH channel
-
-        # readings is a PV-keyed dictionary
-        readings = {getScalerChannelPvname(s): [] for s in signals}
-
+        readings[n] = {control.nickname: [] for control in control_list}
         for m in range(num_readings):
             yield from bps.sleep(0.05)  # allow amplifier to stabilize on gain
             # count and wait to complete
             yield from bps.trigger(scaler, wait=True)        #timeout=count_time+1.0)
 
-            for s in signals:
-                pvname = getScalerChannelPvname(s)
-                value = s.get()     # EpicsScaler channel value or ScalerCH ScalerChannelTuple
-                if not isinstance(value, float):
-                    value = s.s.get()     # ScalerCH channel value
-                # logger.debug(f"scaler reading {m+1}: value: {value}")
-                readings[pvname].append(value)
+            for control in control_list:
+                readings[n][control.nickname].append(
+                    _scaler_channel_value_(control.signal)
+                )
 
+    scaler.stage_sigs = stage_sigs["scaler"]
+    yield from bps.mv(
+        scaler.preset_time, original["scaler.preset_time"],
+        scaler.auto_count_delay, original["scaler.auto_count_delay"],
+        )
+    return readings
+
+
+def _scaler_background_measurement_(control_list, count_time=0.2, num_readings=8, ranges=None, cache=None):
+    """plan: internal: measure amplifier backgrounds for signals sharing a common scaler"""
+    if ranges is None:
+        ranges = range(NUM_AUTORANGE_GAINS)
+    readings = yield from _scaler_background_readings_(
+        control_list, count_time, num_readings, ranges
+    )
+
+    for n, values in readings.items():
         s_range_name = f"gain{n}"
         for control in control_list:
             g = getattr(control.auto.ranges, s_range_name)
-            pvname = getScalerChannelPvname(control.signal)
-            # logger.debug(f"gain: {s_range_name} readings:{readings[pvname]}")
+            # logger.debug(f"gain: {s_range_name} readings:{values[control.nickname]}")
+            background = np.mean(values[control.nickname])
+            background_error = np.std(values[control.nickname])
             yield from bps.mv(
-                g.background, np.mean(readings[pvname]),
-                g.background_error, np.std(readings[pvname]),
+                g.background, background,
+                g.background_error, background_error,
             )
+            if cache is not None:
+                cache.record(
+                    control, n, background, background_error,
+                    count_time, num_readings
+                )
             msg = f"{control.nickname}"
             msg += f" range={n}"
-            msg += f" gain={ _gain_to_str_(control.auto.gain.get())}"
+            msg += f" gain={ _gain_to_str_(g.gain.get())}"
             msg += f" bkg={g.background.get()}"
             msg += f" +/- {g.background_error.get()}"
 
             logger.info(msg)
 
-    scaler.stage_sigs = stage_sigs["scaler"]
-    yield from bps.mv(
-        scaler.preset_time, original["scaler.preset_time"],
-        scaler.auto_count_delay, original["scaler.auto_count_delay"],
-        )
+
+def _scaler_background_check_(control_list, cache, count_time, ranges):
+    """plan: internal: count cached ranges briefly, return the ranges that drifted"""
+    readings = yield from _scaler_background_readings_(
+        control_list, count_time, cache.check_readings, ranges
+    )
+    drifted = set()
+    for n, values in readings.items():
+        for control in control_list:
+            value = np.mean(values[control.nickname])
+            if cache.drifted(control, n, value):
+                logger.info(
+                    "%s range=%d background drifted to %s",
+                    control.nickname, n, value
+                )
+                drifted.add(n)
+            else:
+                cache.record(
+                    control, n, value, np.std(values[control.nickname]),
+                    count_time, cache.check_readings, method="check"
+                )
+    return sorted(drifted)
 
 
-def measure_background(controls, shutter=None, count_time=0.2, num_readings=5):
+def measure_background(controls, shutter=None, count_time=0.2, num_readings=5, use_cache=True):
     """
     plan: measure detector backgrounds simultaneously
 
     controls [obj]
         list (or tuple) of ``DetectorAmplifierAutorangeDevice``
+    use_cache bool
+        If ``True``, measure only the ranges with stale or drifted
+        backgrounds (see ``DarkCurrentCache``).  If ``False``, measure
+        all ranges.  (default: ``True``)
     """
     assert isinstance(controls, (tuple, list)), "controls must be a list"
     scaler_dict = group_controls_by_scaler(controls)
@@ -474,12 +751,216 @@ def measure_background(controls, shutter=None, count_time=0.2, num_readings=5):
     for control_list in scaler_dict.values():
         # do these in sequence, just in case same hardware used multiple times
         if len(control_list) > 0:
-            msg = "Measuring background for: " + control_list[0].nickname
+            nicknames = ", ".join(c.nickname for c in control_list)
+            ranges = None
+            if use_cache:
+                ranges, check = dark_current_cache.plan_ranges(control_list, count_time)
+                if len(check) > 0:
+                    drifted = yield from _scaler_background_check_(
+                        control_list, dark_current_cache, count_time, check
+                    )
+                    ranges = sorted(set(ranges + drifted))
+                if len(ranges) == 0:
+                    logger.info("Backgrounds are current for: %s", nicknames)
+                    continue
+            msg = "Measuring background for: " + nicknames
+            if ranges is not None:
+                msg += f" ranges: {ranges}"
             logger.info(msg)
-            yield from _scaler_background_measurement_(control_list, count_time, num_readings)
+            yield from _scaler_background_measurement_(
+                control_list, count_time, num_readings,
+                ranges=ranges, cache=dark_current_cache,
+            )
 
 
 _last_autorange_gain_ = OrderedDefaultDict(dict)
+autoscale_statistics = OrderedDefaultDict(
+    lambda: deque(maxlen=AUTOSCALE_STATISTICS_HISTORY))
+
+
+def _record_autoscale_statistics_(controls, start_gains, counts, t0, converged, method):
+    """internal: remember how each autoscale converged, by detector nickname"""
+    elapsed = time.time() - t0
+    for control in controls:
+        autoscale_statistics[control.nickname].append(
+            dict(
+                time=t0,
+                method=method,
+                counts=counts,
+                converged=converged,
+                elapsed=elapsed,
+                start_gain=start_gains.get(control.nickname),
+                final_gain=control.auto.gain.get(),
+            )
+        )
+
+
+def autoscale_report(printing=True):
+    """
+    table: summary of recent autoscale convergence, by detector and method
+    """
+    import pyRestTable
+
+    table = pyRestTable.Table()
+    table.labels = "detector method autoscales counts/scale s/scale failed".split()
+    for nickname, history in autoscale_statistics.items():
+        by_method = OrderedDefaultDict(list)
+        for entry in history:
+            by_method[entry["method"]].append(entry)
+        for method, entries in by_method.items():
+            n = len(entries)
+            table.addRow((
+                nickname,
+                method,
+                n,
+                f"{sum(e['counts'] for e in entries) / n:.1f}",
+                f"{sum(e['elapsed'] for e in entries) / n:.2f}",
+                sum(1 for e in entries if not e["converged"]),
+            ))
+    if printing:
+        print(table)
+    return table
+
+
+def _count_rate_(control):
+    """internal: count rate (counts/s) of the control's scaler channel"""
+    if isinstance(control.signal, ScalerChannel):   # ophyd.ScalerCH
+        return control.signal.s.get() / control.scaler.time.get()
+    elif isinstance(control.signal, EpicsSignalRO): # ophyd.EpicsScaler
+        raise RuntimeError("This scaler needs to divide by time")
+    raise ValueError(f"unexpected control.signal: {control.signal}")
+
+
+def predict_gain_index(rate, gain, gains, rate_low, rate_high, saturated=False):
+    """
+    choose the autorange index for the next count from this count's rate
+
+    The count rate is proportional to the amplifier gain, so the rate
+    at each of the ``gains`` (V/A, by range index) is predicted from
+    ``rate`` measured at ``gain``.  Keep the present range if its rate
+    is between ``rate_low`` and ``rate_high`` (same as the sequence
+    program in the IOC).  Otherwise, jump to the largest gain with a
+    predicted rate below ``AUTOSCALE_HEADROOM * rate_high``.
+
+    A ``saturated`` rate only tells us the signal is too large,
+    so jump to the smallest gain.
+    """
+    gains = np.asarray(gains, dtype=float)
+    index = int(np.argmin(np.abs(np.log(gains / gain))))
+    if saturated:
+        return int(np.argmin(gains))
+    if rate_low <= rate <= rate_high:
+        return index
+    predicted = max(rate, 0) * gains / gain
+    allowed = predicted <= AUTOSCALE_HEADROOM * rate_high
+    if not allowed.any():
+        return int(np.argmin(gains))
+    return int(np.argmax(np.where(allowed, gains, -np.inf)))
+
+
+def _scaler_autoscale_predictive_(controls, count_time=0.05, max_iterations=9):
+    """
+    plan: internal: autoscale amplifiers for signals sharing a common scaler
+
+    Predict the best gain from the measured count rate and the gain
+    ladder (``auto.ranges.gainN.gain``), then set it directly.
+    Usually needs only one or two counts, instead of waiting for the
+    sequence program to step the gain one range at a time.
+    """
+    ladders = {
+        control.nickname: [
+            getattr(control.auto.ranges, f"gain{i}").gain.get()
+            for i in range(NUM_AUTORANGE_GAINS)
+        ]
+        for control in controls
+    }
+    if min(min(gains) for gains in ladders.values()) <= 0:
+        logger.warning(
+            "%s: gain ladder not known, stepping through ranges instead",
+            controls[0].nickname
+        )
+        yield from _scaler_autoscale_(controls, count_time, max_iterations)
+        return
+
+    scaler = controls[0].scaler
+    originals = {}
+
+    originals["preset_time"] = scaler.preset_time.get()
+    originals["delay"] = scaler.delay.get()
+    originals["count_mode"] = scaler.count_mode.get()
+    yield from bps.mv(
+        scaler.preset_time, count_time,
+        scaler.delay, 0,    # we wait for the amplifiers to settle
+        scaler.count_mode, "OneShot",
+    )
+
+    t0 = time.time()
+    last_gain_dict = _last_autorange_gain_[scaler.name]
+    start_gains = {}
+
+    settling_time = AMPLIFIER_MINIMUM_SETTLING_TIME
+    for control in controls:
+        # the IOC must not change the gain while we count
+        yield from bps.mv(control.auto.mode, AutorangeSettings.manual)
+        # faster if we start from last known autoscale gain
+        gain = last_gain_dict.get(control.auto.gain.name)
+        if gain is not None:    # be cautious, might be unknown
+            yield from control.auto.setGain(gain)
+        start_gains[control.nickname] = control.auto.gain.get()
+        settling_time = max(settling_time, control.femto.settling_time.get())
+
+    yield from bps.sleep(settling_time)
+
+    complete = False
+    for iteration in range(max_iterations):
+        yield from bps.trigger(scaler, wait=True)
+
+        settling_time = 0
+        for control in controls:
+            gains = ladders[control.nickname]
+            gain_now = control.auto.gain.get()
+            rate = _count_rate_(control)
+            max_rate = control.auto.max_count_rate.get()
+            index_now = int(np.argmin(np.abs(np.log(np.divide(gains, gain_now)))))
+            target = predict_gain_index(
+                rate,
+                gain_now,
+                gains,
+                control.auto.gainU.get(),
+                min(control.auto.gainD.get(), max_rate),
+                saturated=rate >= max_rate,
+            )
+            logger.debug(
+                "%s: gain=%s  rate=%s  range %d -> %d",
+                control.nickname, gain_now, rate, index_now, target
+            )
+            if target != index_now:
+                yield from control.auto.setGain(target)
+                settling_time = max(settling_time, control.femto.settling_time.get())
+
+        if settling_time == 0:      # no gains changed
+            complete = True
+            break
+        yield from bps.sleep(settling_time)
+
+    for control in controls:
+        last_gain_dict[control.auto.gain.name] = control.auto.gain.get()
+
+    # restore starting conditions
+    yield from bps.mv(
+        scaler.preset_time, originals["preset_time"],
+        scaler.delay, originals["delay"],
+        scaler.count_mode, originals["count_mode"],
+    )
+    _record_autoscale_statistics_(
+        controls, start_gains, iteration + 1, t0, complete, "predictive"
+    )
+
+    if not complete and aps.inUserOperations:        # bailed out early from loop
+        msg = f"FAILED TO FIND CORRECT GAIN IN {max_iterations} AUTOSCALE ITERATIONS"
+        if RE.state != "idle":      # don't raise if in summarize_plan()
+            raise AutoscaleError(msg)
+
 
 def _scaler_autoscale_(controls, count_time=0.05, max_iterations=9):
     """plan: internal: autoscale amplifiers for signals sharing a common scaler"""
@@ -487,6 +968,8 @@ def _scaler_autoscale_(controls, count_time=0.05, max_iterations=9):
 
     scaler = controls[0].scaler
     originals = {}
+    t0 = time.time()
+    start_gains = {c.nickname: c.auto.gain.get() for c in controls}
 
     originals["preset_time"] = scaler.preset_time.get()
     originals["delay"] = scaler.delay.get()
@@ -554,6 +1037,9 @@ def _scaler_autoscale_(controls, count_time=0.05, max_iterations=9):
         scaler.delay, originals["delay"],
         scaler.count_mode, originals["count_mode"],
     )
+    _record_autoscale_statistics_(
+        controls, start_gains, iteration + 1, t0, complete, "iterative"
+    )
 
     if not complete and aps.inUserOperations:        # bailed out early from loop
         logger.warning(f"converged={converged}")
@@ -562,12 +1048,16 @@ def _scaler_autoscale_(controls, count_time=0.05, max_iterations=9):
             raise AutoscaleError(msg)
 
 
-def autoscale_amplifiers(controls, shutter=None, count_time=0.05, max_iterations=9):
+def autoscale_amplifiers(controls, shutter=None, count_time=0.05, max_iterations=9, predictive=True):
     """
     bluesky plan: autoscale detector amplifiers simultaneously
 
     controls [obj]
         list (or tuple) of ``DetectorAmplifierAutorangeDevice``
+    predictive bool
+        If ``True``, predict each gain from the count rate and set it
+        directly.  If ``False``, let the sequence programs step the
+        gains one range at a time.  (default: ``True``)
     """
     assert isinstance(controls, (tuple, list)), "controls must be a list"
     scaler_dict = group_controls_by_scaler(controls)
@@ -583,7 +1073,11 @@ def autoscale_amplifiers(controls, shutter=None, count_time=0.05, max_iterations
                 control_list[0].nickname
             )
             try:
-                yield from _scaler_autoscale_(
+                if predictive:
+                    autoscale = _scaler_autoscale_predictive_
+                else:
+                    autoscale = _scaler_autoscale_
+                yield from autoscale(
                     control_list,
                     count_time=count_time,
                     max_iterations=max_iterations)
@@ -601,9 +1095,26 @@ def autoscale_amplifiers(controls, shutter=None, count_time=0.05, max_iterations
 
 # ------------
 
-_amplifier_id_upd = epics.caget("9idcLAX:femto:model", as_string=True)
+UPD_AMPLIFIER_MODEL_PV = "9idcLAX:femto:model"
+UPD_AMPLIFIER_MODEL_DEFAULT = "DLPCA200"
+UPD_AMPLIFIER_MODEL_TIMEOUT = 2     # s, the PV prefixes depend on it
+
+# The only EPICS read needed to construct the devices (all others
+# connect in the background, see instrument.utils.device_registry).
+_amplifier_id_upd = epics.caget(
+    UPD_AMPLIFIER_MODEL_PV,
+    as_string=True,
+    timeout=UPD_AMPLIFIER_MODEL_TIMEOUT,
+    connection_timeout=UPD_AMPLIFIER_MODEL_TIMEOUT,
+)
+if _amplifier_id_upd not in ("DLPCA200", "DDPCA300"):
+    logger.warning(
+        "%s: unknown UPD amplifier model %r, assuming %s",
+        UPD_AMPLIFIER_MODEL_PV, _amplifier_id_upd, UPD_AMPLIFIER_MODEL_DEFAULT
+    )
+    _amplifier_id_upd = UPD_AMPLIFIER_MODEL_DEFAULT
 
-if _amplifier_id_upd == "DLCPA200":
+if _amplifier_id_upd == "DLPCA200":
     _upd_femto_prefix = "9idcLAX:fem01:seq01:"
     _upd_auto_prefix  = "9idcLAX:pd01:seq01:"
 elif _amplifier_id_upd == "DDPCA300":
@@ -640,7 +1151,7 @@ upd_controls = DetectorAmplifierAutorangeDevice(
 upd_photocurrent_calc = ModifiedSwaitRecord(
     "9idcLAX:USAXS:upd",
     name="upd_photocurrent_calc")
-upd_photocurrent = upd_photocurrent_calc.get()
+upd_photocurrent = upd_photocurrent_calc.calculated_value
 
 trd_controls = DetectorAmplifierAutorangeDevice(
     "TR diode",
@@ -655,7 +1166,7 @@ trd_controls = DetectorAmplifierAutorangeDevice(
 trd_photocurrent_calc = ModifiedSwaitRecord(
     "9idcLAX:USAXS:trd",
     name="trd_photocurrent_calc")
-trd_photocurrent = trd_photocurrent_calc.get()
+trd_photocurrent = trd_photocurrent_calc.calculated_value
 
 I0_controls = DetectorAmplifierAutorangeDevice(
     "I0_USAXS",
@@ -670,7 +1181,7 @@ I0_controls = DetectorAmplifierAutorangeDevice(
 I0_photocurrent_calc = ModifiedSwaitRecord(
     "9idcLAX:USAXS:I0",
     name="I0_photocurrent_calc")
-I0_photocurrent = I0_photocurrent_calc.get()
+I0_photocurrent = I0_photocurrent_calc.calculated_value
 
 I00_controls = DetectorAmplifierAutorangeDevice(
     "I00_USAXS",
@@ -685,13 +1196,13 @@ I00_controls = DetectorAmplifierAutorangeDevice(
 I00_photocurrent_calc = ModifiedSwaitRecord(
     "9idcLAX:USAXS:I00",
     name="I00_photocurrent_calc")
-I00_photocurrent = I00_photocurrent_calc.get()
+I00_photocurrent = I00_photocurrent_calc.calculated_value
 
 
 I000_photocurrent_calc = ModifiedSwaitRecord(
     "9idcLAX:USAXS:I000",
     name="I000_photocurrent_calc")
-I000_photocurrent = I000_photocurrent_calc.get()
+I000_photocurrent = I000_photocurrent_calc.calculated_value
 
 
 controls_list_I0_I00_TRD = [I0_controls, I00_controls, trd_controls]
@@ -45,8 +45,9 @@ These attributes, set internally, are results of the tune scan::
     tune_ok : bool
         status of most recent tune
 
-    peaks : instance of `bluesky.callbacks.fitting.PeakStats`
+    peaks : instance of `instrument.utils.peak_centers.StreamingPeakStats`
         with results from most recent tune scan
+        (same attributes as `bluesky.callbacks.fitting.PeakStats`)
 
     stats : [peaks]
         list of peak summary statistics from all previous tune scans
@@ -54,6 +55,8 @@ These attributes, set internally, are results of the tune scan::
     center : float
         value of tune result: `if tune_ok: axis.move(center)`
 
+The ``width`` of each tuner here is its PV in ``axis_tune_range``
+(``width_signal``), read when tuning (not at import).
 """
 
 __all__ = [
@@ -68,7 +71,6 @@ import logging
 logger = logging.getLogger(__name__)
 logger.info(__file__)
 
-from apstools.plans import TuneAxis
 from apstools.utils import trim_plot_by_name
 from bluesky import plan_stubs as bps
 from ophyd import Component, Device, EpicsSignal
@@ -162,7 +164,6 @@ m_stage.r.tuner = TuneAxis(
 )
 m_stage.r.tuner.peak_choice = TUNE_METHOD_PEAK_CHOICE
 m_stage.r.tuner.num = 31
-m_stage.r.tuner.width = axis_tune_range.mr.get()     # -0.004
 
 m_stage.r.pre_tune_method = mr_pretune_hook
 m_stage.r.post_tune_method = mr_posttune_hook
@@ -205,7 +206,6 @@ m_stage.r2p.tuner = TuneAxis(
 )
 m_stage.r2p.tuner.peak_choice = TUNE_METHOD_PEAK_CHOICE
 m_stage.r2p.tuner.num = 21
-m_stage.r2p.tuner.width = axis_tune_range.m2rp.get()     -8
 
 m_stage.r2p.pre_tune_method = m2rp_pretune_hook
 m_stage.r2p.post_tune_method = m2rp_posttune_hook
@@ -244,7 +244,6 @@ ms_stage.rp.tuner = TuneAxis(
 )
 ms_stage.rp.tuner.peak_choice = TUNE_METHOD_PEAK_CHOICE
 ms_stage.rp.tuner.num = 21
-ms_stage.rp.tuner.width = axis_tune_range.msrp.get()     # 6
 
 ms_stage.rp.pre_tune_method = msrp_pretune_hook
 ms_stage.rp.post_tune_method = msrp_posttune_hook
@@ -286,7 +285,6 @@ a_stage.r.tuner = TuneAxis(
 )
 a_stage.r.tuner.peak_choice = TUNE_METHOD_PEAK_CHOICE
 a_stage.r.tuner.num = 35
-a_stage.r.tuner.width = axis_tune_range.ar.get()     # -0.004
 
 a_stage.r.pre_tune_method = ar_pretune_hook
 a_stage.r.post_tune_method = ar_posttune_hook
@@ -325,7 +323,6 @@ as_stage.rp.tuner = TuneAxis(
 )
 as_stage.rp.tuner.peak_choice = TUNE_METHOD_PEAK_CHOICE
 as_stage.rp.tuner.num = 21
-as_stage.rp.tuner.width = axis_tune_range.asrp.get()     # 6
 
 as_stage.rp.pre_tune_method = asrp_pretune_hook
 as_stage.rp.post_tune_method = asrp_posttune_hook
@@ -367,7 +364,6 @@ a_stage.r2p.tuner = TuneAxis(
 )
 a_stage.r2p.tuner.peak_choice = TUNE_METHOD_PEAK_CHOICE
 a_stage.r2p.tuner.num = 31
-a_stage.r2p.tuner.width = axis_tune_range.a2rp.get()     # -8
 a_stage.r2p.pre_tune_method = a2rp_pretune_hook
 a_stage.r2p.post_tune_method = a2rp_posttune_hook
 
@@ -403,7 +399,6 @@ d_stage.x.tuner = TuneAxis(
 )
 d_stage.x.tuner.peak_choice = TUNE_METHOD_PEAK_CHOICE
 d_stage.x.tuner.num = 35
-d_stage.x.tuner.width = axis_tune_range.dx.get()     # 10
 
 d_stage.x.pre_tune_method = dx_pretune_hook
 d_stage.x.post_tune_method = dx_posttune_hook
@@ -440,7 +435,6 @@ d_stage.y.tuner = TuneAxis(
 )
 d_stage.y.tuner.peak_choice = TUNE_METHOD_PEAK_CHOICE
 d_stage.y.tuner.num = 35
-d_stage.y.tuner.width = axis_tune_range.dy.get()     # 10
 
 d_stage.y.pre_tune_method = dy_pretune_hook
 d_stage.y.post_tune_method = dy_posttune_hook
@@ -18,13 +18,76 @@ from apstools.plans import TuneAxis
 from bluesky import plans as bp
 from bluesky import plan_stubs as bps
 from bluesky import preprocessors as bpp
-from bluesky.callbacks.fitting import PeakStats
 import datetime
 import numpy as np
+import time
 from ophyd import Component, Device, Signal
 from ophyd import EpicsMotor
 import pyRestTable
 
+from ..utils.peak_centers import StreamingPeakStats
+
+
+ADAPTIVE_MIN_POINTS = 7    # points in the coarse scan of an adaptive tune
+FWHM_GAUSSIAN = 2 * np.sqrt(2 * np.log(2))     # FWHM / sigma
+
+
+def _gaussian(x, center, fwhm, height, background):
+    return background + height * np.exp(-4 * np.log(2) * ((x - center) / fwhm) ** 2)
+
+
+def _lorentzian(x, center, fwhm, height, background):
+    return background + height / (1 + 4 * ((x - center) / fwhm) ** 2)
+
+
+PEAK_PROFILES = dict(gaussian=_gaussian, lorentzian=_lorentzian)
+
+
+def fit_peak(x, y, profile="gaussian", guess=None):
+    """
+    fit ``background + height * profile((x - center) / fwhm)`` to y(x)
+
+    Weights are from counting statistics.  Start from ``guess``
+    (a previous result) if given, to refine the fit as points are added.
+
+    Returns dictionary (center, center_error, fwhm, height, background)
+    or ``None`` if the fit failed.
+    """
+    from scipy.optimize import curve_fit
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) < 5:
+        return None
+    if guess is None:
+        i = np.argmax(y)
+        background = y.min()
+        height = y[i] - background
+        above = x[y > background + height / 2]
+        fwhm = max(above.max() - above.min(), np.ptp(x) / len(x))
+        p0 = [x[i], fwhm, height, background]
+    else:
+        p0 = [guess[k] for k in "center fwhm height background".split()]
+    try:
+        popt, pcov = curve_fit(
+            PEAK_PROFILES[profile], x, y, p0=p0,
+            sigma=np.sqrt(np.maximum(y, 1)), absolute_sigma=True,
+            maxfev=2000,
+        )
+    except (RuntimeError, ValueError) as exc:
+        logger.debug("peak fit failed: %s", exc)
+        return None
+    center, fwhm, height, background = popt
+    if height <= 0 or not np.isfinite(pcov[0, 0]):
+        return None
+    return dict(
+        center=center,
+        center_error=np.sqrt(pcov[0, 0]),
+        fwhm=abs(fwhm),
+        height=height,
+        background=background,
+    )
+
 
 class TuningResults(Device):
     """
@@ -70,11 +133,32 @@ class TuningResults(Device):
 
 
 class UsaxsTuneAxis(TuneAxis):
-    """use bp.rel_scan() for the tune()"""
+    """
+    use bp.rel_scan() for the tune()
+
+    With ``tune_mode = "adaptive"``, ``tune()`` starts with a sparse
+    scan, then adds points about the fitted peak until the uncertainty
+    of the center is less than ``adaptive_center_tolerance * FWHM``
+    (or ``num`` points have been measured).  If the sparse scan finds
+    no peak, the fixed scan is run instead.
+
+    The peak statistics (``peaks``) are a ``StreamingPeakStats``,
+    updated with each point.  With ``stop_past_peak = True``, the fixed
+    scan stops once it has gone past the peak.  (Use with
+    ``peak_choice = "cen"``, the center of mass is biased by the points
+    not measured.)
+    """
 
     width_signal = None
     _width_default = 1      # fallback default when width_signal is None
 
+    tune_mode = "fixed"     # or "adaptive"
+    adaptive_coarse_fraction = 0.3  # sparse scan: this fraction of num
+    adaptive_center_tolerance = 0.05    # fraction of FWHM
+    adaptive_profile = "gaussian"   # or "lorentzian"
+    adaptive_summary = {}   # points & time of the last adaptive tune
+    stop_past_peak = False  # fixed scan: stop once past the peak
+
     def __init__(self, signals, axis, signal_name=None,
                  width_signal=None):
         """
@@ -112,10 +196,12 @@ class UsaxsTuneAxis(TuneAxis):
         else:
             self.width_signal.put(value)
 
-    def peak_analysis(self, initial_position):
+    def peak_analysis(self, initial_position, fitted_center=None):
         if self.peak_detected():
             self.tune_ok = True
-            if self.peak_choice == "cen":
+            if fitted_center is not None:
+                final_position = fitted_center
+            elif self.peak_choice == "cen":
                 final_position = self.peaks.cen
             elif self.peak_choice == "com":
                 final_position = self.peaks.com
@@ -163,7 +249,15 @@ class UsaxsTuneAxis(TuneAxis):
             Default value in ``self.num`` (initially 10)
         md : dict, optional
             metadata
+
+        If ``tune_mode`` is ``"adaptive"``, run ``adaptive_tune()`` instead.
         """
+        if self.tune_mode == "adaptive":
+            return (yield from self.adaptive_tune(width=width, num=num, md=md))
+        yield from self.fixed_tune(width=width, num=num, md=md)
+
+    def fixed_tune(self, width=None, num=None, md=None):
+        """Bluesky plan: the fixed scan of ``tune()``"""
         width = width or self.width
         num = num or self.num
 
@@ -181,13 +275,46 @@ class UsaxsTuneAxis(TuneAxis):
         signal_list = list(self.signals)
         signal_list += [self.axis,]
 
+        _md = self._tune_metadata(width, num, md, ".tune")
+
+        if "pass_max" not in _md:
+            self.stats = []
+
+        self.peaks = StreamingPeakStats(x=self.axis.name, y=self.signal_name)
+
+        @bpp.stage_decorator(signal_list)
+        @bpp.run_decorator(md=_md)
+        def _stop_past_peak_scan():
+            # events reach self.peaks before trigger_and_read() returns
+            for position in np.linspace(start, finish, num):
+                yield from bps.checkpoint()
+                yield from bps.mv(self.axis, position)
+                yield from bps.trigger_and_read(signal_list)
+                if self.peaks.peak_passed():
+                    logger.info(
+                        "%s: past the peak after %d of %d points",
+                        self.axis.name, self.peaks.n, num
+                    )
+                    break
+
+        @bpp.subs_decorator(self.peaks)
+        def _scan(md=None):
+            if self.stop_past_peak:
+                yield from _stop_past_peak_scan()
+            else:
+                yield from bp.scan(signal_list, self.axis, start, finish, num, md=_md)
+            yield from self.peak_analysis(initial_position)
+
+        yield from _scan()
+
+    def _tune_metadata(self, width, num, md, method):
         tune_md = dict(
             width = width,
             initial_position = self.axis.position,
             time_iso8601 = str(datetime.datetime.now()),
             )
         _md = {'tune_md': tune_md,
-               'plan_name': self.__class__.__name__ + '.tune',
+               'plan_name': self.__class__.__name__ + method,
                'tune_parameters': dict(
                     num = num,
                     width = width,
@@ -206,19 +333,114 @@ class UsaxsTuneAxis(TuneAxis):
                    )
                }
         _md.update(md or {})
+        return _md
+
+    def adaptive_tune(self, width=None, num=None, md=None):
+        """
+        Bluesky plan: tune with a sparse scan, refined about the peak
+
+        Scan ``num * adaptive_coarse_fraction`` points over ``width``
+        (centered about the current position).  If these show a peak
+        (same test as ``peak_detected()``), fit the peak profile
+        (``adaptive_profile``) and measure two more points, about one
+        half-width either side of the fitted center, then fit again
+        (starting from the last fit).  Stop when the uncertainty of the
+        center is below ``adaptive_center_tolerance * FWHM`` or after
+        ``num`` points.  The axis is moved to the fitted center.
+
+        If no peak is found, run the fixed scan (``fixed_tune()``).
+
+        The number of points and elapsed time, with the estimated time
+        of the fixed scan, are in ``adaptive_summary``.
+        """
+        width = width or self.width
+        num = num or self.num
+        t0 = time.time()
+
+        initial_position = self.axis.position
+        start = initial_position - width/2
+        finish = initial_position + width/2
+        lo, hi = min(start, finish), max(start, finish)
+        self.tune_ok = False
+
+        signal_list = list(self.signals)
+        signal_list += [self.axis,]
+
+        _md = self._tune_metadata(width, num, md, ".adaptive_tune")
+        _md["tune_parameters"]["profile"] = self.adaptive_profile
+        _md["tune_parameters"]["center_tolerance"] = self.adaptive_center_tolerance
 
         if "pass_max" not in _md:
             self.stats = []
 
-        self.peaks = PeakStats(x=self.axis.name, y=self.signal_name)
+        self.peaks = StreamingPeakStats(x=self.axis.name, y=self.signal_name)
+        x_data, y_data = [], []
+        fit = None
+        converged = False
+
+        def _measure(position):
+            yield from bps.checkpoint()
+            yield from bps.mv(self.axis, min(hi, max(lo, position)))
+            reading = yield from bps.trigger_and_read(signal_list)
+            x_data.append(reading[self.axis.name]["value"])
+            y_data.append(reading[self.signal_name]["value"])
 
         @bpp.subs_decorator(self.peaks)
-        def _scan(md=None):
-            yield from bp.scan(signal_list, self.axis, start, finish, num, md=_md)
-            yield from self.peak_analysis(initial_position)
+        @bpp.stage_decorator(signal_list)
+        @bpp.run_decorator(md=_md)
+        def _scan():
+            nonlocal fit, converged
+            n_coarse = max(ADAPTIVE_MIN_POINTS, int(num * self.adaptive_coarse_fraction))
+            for position in np.linspace(start, finish, n_coarse):
+                yield from _measure(position)
+            if max(y_data) <= 4 * min(y_data):      # same test as peak_detected()
+                return
+
+            step = 0
+            while len(x_data) < num:
+                fit = fit_peak(x_data, y_data, self.adaptive_profile, guess=fit)
+                if fit is None or not lo <= fit["center"] <= hi:
+                    fit = None
+                    return
+                if fit["center_error"] < self.adaptive_center_tolerance * fit["fwhm"]:
+                    converged = True
+                    return
+                # steepest slopes tell most about the center
+                offset = fit["fwhm"] / 2 * (1, 0.5, 1.5)[step % 3]
+                step += 1
+                yield from _measure(fit["center"] - offset)
+                yield from _measure(fit["center"] + offset)
 
         yield from _scan()
 
+        if len(x_data) == 0 or fit is None and max(y_data) <= 4 * min(y_data):
+            logger.info("%s: no peak in adaptive scan, using fixed scan", self.axis.name)
+            yield from self.fixed_tune(width=width, num=num, md=md)
+            method = "fixed (fallback)"
+            points = len(x_data) + num
+        else:
+            center = None if fit is None else fit["center"]
+            yield from self.peak_analysis(initial_position, fitted_center=center)
+            method = "adaptive" if converged else "adaptive (not converged)"
+            points = len(x_data)
+
+        elapsed = time.time() - t0
+        per_point = elapsed / max(1, points)
+        self.adaptive_summary = dict(
+            method=method,
+            points=points,
+            elapsed=elapsed,
+            fixed_points=num,
+            fixed_elapsed_estimate=num * per_point,
+            center=None if fit is None else fit["center"],
+            center_error=None if fit is None else fit["center_error"],
+            fwhm=None if fit is None else fit["fwhm"],
+        )
+        logger.info(
+            "%s %s tune: %d points in %.1f s (fixed scan: %d points, about %.1f s)",
+            self.axis.name, method, points, elapsed, num, num * per_point
+        )
+
     def multi_pass_tune(self, width=None, step_factor=None,
                         num=None, pass_max=None, snake=None, md=None):
         """
@@ -15,6 +15,7 @@ import logging
 logger = logging.getLogger(__name__)
 logger.info(__file__)
 
+from ..utils.device_registry import device_registry
 from .area_detector_common import Override_AD_plugin_primed
 # from apstools.devices import AD_prime_plugin2
 from bluesky import plan_stubs as bps
@@ -153,6 +154,16 @@ class MyPointGreyDetectorTIFF(MyPointGreyDetector, AreaDetector):
         yield from bps.unstage(self)
 
 
+def _warn_if_not_primed(det):
+    """Once connected: Has the JPEG plugin been primed?"""
+    if not Override_AD_plugin_primed(det.jpeg1):
+        warnings.warn(
+            f"NOTE: {det.name}.jpeg1 has not been primed yet."
+            "  BEFORE using this detector in bluesky, call: "
+            f"  AD_prime_plugin2({det.name}.jpeg1)"
+        )
+
+
 try:
     nm = RADIOGRAPHY_CAMERA
     prefix = area_detector_EPICS_PV_prefix[nm]
@@ -180,12 +191,7 @@ try:
         labels=["camera", "area_detector"])
     blackfly_optical.read_attrs.append("jpeg1")
     blackfly_optical.jpeg1.stage_sigs["file_write_mode"] = "Single"
-    if not Override_AD_plugin_primed(blackfly_optical.jpeg1):
-        warnings.warn(
-            "NOTE: blackfly_optical.jpeg1 has not been primed yet."
-            "  BEFORE using this detector in bluesky, call: "
-            "  AD_prime_plugin2(blackfly_optical.jpeg1)"
-        )
+    device_registry.add(blackfly_optical, on_connect=_warn_if_not_primed)
 except TimeoutError as exc_obj:
     logger.warning(
         "Timeout connecting with %s (%s): %s",
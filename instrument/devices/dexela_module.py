@@ -22,6 +22,7 @@ logger = logging.getLogger(__name__)
 
 logger.info(__file__)
 
+from ..utils.device_registry import device_registry
 from .area_detector_common import area_detector_EPICS_PV_prefix
 from .area_detector_common import _validate_AD_FileWriter_path_
 
@@ -68,6 +69,23 @@ class MyDexelaDetector(SingleTrigger, DexelaDetector):
     image = ADComponent(ImagePlugin, "image1:")
     proc1 = ADComponent(MyProcessPlugin, "Proc1:")
 
+    def stage(self):
+        # the HDF5 plugin chain is configured once connected (_dexela_setup)
+        device_registry.get(self.name)
+        return super().stage()
+
+
+def _dexela_setup(det):
+    """Configure the HDF5 file writing, once connected."""
+    # configure the processing plugin into the chain for file writing
+    proc_port = det.proc1.port_name.get()
+    det.hdf1.nd_array_port.put(proc_port)
+
+    # MUST come before staging writes file_path
+    det.hdf1.create_directory.put(-5)
+
+    det.hdf1.file_name.put("bluesky")
+
 
 try:
     nm = "Dexela 2315"
@@ -76,16 +94,7 @@ try:
         prefix, name="dexela_det", labels=["camera", "area_detector"]
     )
     dexela_det.read_attrs.append("hdf1")
-
-    # configure the processing plugin into the chain for file writing
-    proc_port = dexela_det.proc1.port_name.get()
-    dexela_det.hdf1.nd_array_port.put(proc_port)
-
-    # MUST come before staging writes file_path
-    dexela_det.hdf1.create_directory.put(-5)
-
-    dexela_det.hdf1.file_name.put("bluesky")
-
+    device_registry.add(dexela_det, on_connect=_dexela_setup)
 
 except TimeoutError as exc_obj:
     logger.warning("Timeout connecting with %s (%s): %s", nm, prefix, exc_obj)
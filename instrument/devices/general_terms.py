@@ -44,6 +44,8 @@ class PreUsaxsTuneParameters(Device):
     sx = Component(EpicsSignal, "9idcLAX:preUSAXStuneSX")
     sy = Component(EpicsSignal, "9idcLAX:preUSAXStuneSY")
     use_specific_location = Component(EpicsSignal, "9idcLAX:UseSpecificTuneLocation")
+    # tune with plans.tune_orchestrator (shared autoscale, coarse-to-fine, skip axes in tune)
+    use_orchestrator = Component(Signal, value=False)
 
     @property
     def needed(self):
@@ -154,6 +156,7 @@ class Parameters_USAXS(Device):
     useDynamicTime = Component(Signal,                value=True)
     useMSstage = Component(Signal,                    value=False)
     useSBUSAXS = Component(Signal,                    value=False)
+    useUascanPipeline = Component(Signal,             value=False)
 
     retune_needed = Component(Signal, value=False)     # does not *need* an EPICS PV
 
@@ -305,6 +308,9 @@ class GeneralParameters(Device):
 
     PauseBeforeNextScan = Component(EpicsSignal, "9idcLAX:PauseBeforeNextScan")
     StopBeforeNextScan = Component(EpicsSignal,  "9idcLAX:StopBeforeNextScan")
+    # command lists: run in the order of the file, unless a file (a
+    # GROUP_BY_TECHNIQUE line) or this (False) asks to group by technique
+    strict_command_order = Component(Signal, value=True)
 
     # consider refactoring
     FlyScan = Component(FlyScanParameters)
@@ -14,33 +14,32 @@ logger.info(__file__)
 
 from apstools.devices import Linkam_CI94_Device
 from apstools.devices import Linkam_T96_Device
-import warnings
 
+from ..utils.device_registry import device_registry
 
-linkam_ci94 = Linkam_CI94_Device("9idcLAX:ci94:", name="ci94")
-linkam_tc1 = Linkam_T96_Device("9idcLINKAM:tc1:", name="linkam_tc1")
-
-for _o in (linkam_ci94, linkam_tc1):
-    try:
-        _o.wait_for_connection()
-    except Exception as exc:
-        warnings.warn(f"Linkam controller {_o.name} not connected.")
-        break
 
+def _linkam_setup(controller):
+    """Configure a Linkam controller, once it is connected."""
     # set tolerance for "in position" (Python term, not an EPICS PV)
     # note: done = |readback - setpoint| <= tolerance
-    _o.temperature.tolerance.put(1.0)
+    controller.temperature.tolerance.put(1.0)
 
     # sync the "inposition" computation
-    _o.temperature.cb_readback()
+    controller.temperature.cb_readback()
 
     # easy access to the engineering units
-    _o.units.put(
-        _o.temperature.readback.metadata["units"]
+    controller.units.put(
+        controller.temperature.readback.metadata["units"]
     )
 
+
+linkam_ci94 = Linkam_CI94_Device("9idcLAX:ci94:", name="ci94")
+linkam_tc1 = Linkam_T96_Device("9idcLINKAM:tc1:", name="linkam_tc1")
+
 # make a common term for the ramp rate (devices use different names)
-if linkam_ci94.connected:
-    linkam_ci94.ramp = linkam_ci94.rate
-if linkam_tc1.connected:
-    linkam_tc1.ramp = linkam_tc1.ramprate
+linkam_ci94.ramp = linkam_ci94.rate
+linkam_tc1.ramp = linkam_tc1.ramprate
+
+# not connected: reported by the device_registry
+device_registry.add(linkam_ci94, name="linkam_ci94", on_connect=_linkam_setup)
+device_registry.add(linkam_tc1, on_connect=_linkam_setup)
@@ -74,6 +74,8 @@ class GSlitDevice(MotorBundle):
     h_step_into = 1.1     # 1.1mm step into the beam (blocks the beam)
     v_step_into = 0.4     # 0.4mm step into the beam (blocks the beam)
     tuning_intensity_threshold = 500
+    tuning_method = "edge fit"  # or "fixed step"
+    edge_fit_max_points = 30    # readings per blade, at most
 
     def set_size(self, *args, h=None, v=None):
         """move the slits to the specified size"""
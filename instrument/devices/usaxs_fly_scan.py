@@ -18,11 +18,13 @@ import datetime
 from ophyd import Component, Device, EpicsSignal, Signal
 from ophyd.status import Status
 import os
+import queue
 import time
 import uuid
 
 from ..usaxs_support.saveFlyData import SaveFlyScan
 from ..usaxs_support.saveFlyData import XML_CONFIGURATION_FILE
+from ..utils.writer_service import WriterService
 
 # NOTES for testing SaveFlyScan() command
 """
@@ -49,6 +51,7 @@ class UsaxsFlyScanDevice(Device):
     scan_time = Component(EpicsSignal, "9idcLAX:USAXS:FS_ScanTime")
     num_points = Component(EpicsSignal, "9idcLAX:USAXS:FS_NumberOfPoints")
     flying = Component(Signal, value=False)
+    writer_backlog = Component(Signal, value=0)  # HDF5 files not yet written
     timeout_s = 120
 
     def __init__(self, *args, **kwargs):
@@ -64,9 +67,20 @@ class UsaxsFlyScanDevice(Device):
         self.saveFlyData_HDF5_dir ="/tmp"
         self.fallback_dir = FALLBACK_DIR
         self.saveFlyData_HDF5_file ="sfs.h5"
+        self.saveFlyData_streaming = False   # write MCA arrays during the scan
         self._output_HDF5_file_ = None
         self.flying._status = Status()  # issue #501
         self.flying._status.set_finished()
+        # one worker: jobs share the NeXus structure manager, keep them in order
+        self.writer = WriterService(num_workers=1, max_queue=4, name="flyscan_writer")
+        self.writer.subscribe(self.writer_backlog.put)
+        self.writer_job = None          # most recent finish_HDF5_file() job
+        self.wait_for_writer = False    # wait for previous file at scan start?
+        self.writer_timeout_s = 120
+        self.reduce_after_write = True  # write /entry/flyscan_reduced
+        self.reducer = WriterService(num_workers=1, max_queue=4, name="flyscan_reducer")
+        # EPICS reads of the HDF5 file, the plan waits for them
+        self.reader = WriterService(num_workers=1, max_queue=1, name="flyscan_reader")
 
     def plan(self, md={}):
         """
@@ -125,16 +139,15 @@ class UsaxsFlyScanDevice(Device):
             else:
                 logger.debug(f"{time.time()-self.t0}s - progress_reporting is done")
 
-        @run_in_thread
-        def prepare_HDF5_file():
-            fname = os.path.abspath(self.saveFlyData_HDF5_dir)
+        def HDF5_file_name(hdf5_dir, hdf5_file):
+            fname = os.path.abspath(hdf5_dir)
             if not os.path.exists(fname):
                 msg = f"Must save fly scan data to an existing directory.  Gave {fname}"
                 fname = os.path.abspath(self.fallback_dir)
                 msg += f"  Using fallback directory {self.fallback_dir}"
                 logger.error(msg)
 
-            s = self.saveFlyData_HDF5_file
+            s = hdf5_file
             _s_ = os.path.join(fname, s)      # for testing here
             if os.path.exists(_s_):
                 msg = f"File {_s_} exists.  Will not overwrite."
@@ -144,29 +157,75 @@ class UsaxsFlyScanDevice(Device):
                 _s_ = os.path.join(fname, s)
                 msg += f"  Using fallback file name {_s_}"
                 logger.error(msg)
-            fname = os.path.join(fname, s)
+            return os.path.join(fname, s)
 
-            logger.info(f"HDF5 config: {self.saveFlyData_config}")
+        def read_preliminary_data(fname, config_file, streaming):
+            # EPICS reads, the plan waits for them (before flying)
+            logger.info(f"HDF5 config: {config_file}")
             logger.info(f"HDF5 output: {fname}")
-            self._output_HDF5_file_ = fname
-            user_data.set_state_blocking("FlyScanning: " + os.path.split(fname)[-1])
-
             # logger.debug(resource_usage("before SaveFlyScan()"))
-            self.saveFlyData = SaveFlyScan(
+            sfs = SaveFlyScan(
                 fname,
-                config_file=self.saveFlyData_config)
-            # logger.debug(resource_usage("before saveFlyData.preliminaryWriteFile()"))
-            self.saveFlyData.preliminaryWriteFile()
-            # logger.debug(resource_usage("after saveFlyData.preliminaryWriteFile()"))
-
-        @run_in_thread
-        def finish_HDF5_file():
-            if self.saveFlyData is None:
-                raise RuntimeError("Must first call prepare_HDF5_file()")
-            self.saveFlyData.saveFile()
+                config_file=config_file,
+                streaming=streaming,
+                create_file=False)
+            return sfs, sfs.readPreliminaryData()
+
+        def prepare_HDF5_file(read_job):
+            # HDF5 writes only, all PVs were read by the plan
+            sfs, values = read_job.result
+            sfs.createFile()
+            # logger.debug(resource_usage("before saveFlyData.writePreliminaryData()"))
+            sfs.writePreliminaryData(values)
+            # logger.debug(resource_usage("after saveFlyData.writePreliminaryData()"))
+            return sfs, sfs.hdf5_file_name
+
+        def finish_HDF5_file(prepare_job, values):
+            if not prepare_job.success:
+                raise RuntimeError(
+                    f"Must first call prepare_HDF5_file(): {prepare_job}"
+                )
+            sfs, fname = prepare_job.result
+            sfs.writeFinalData(values)
+
+            logger.info(f"HDF5 output complete: {fname}")
+            if self.saveFlyData is sfs:
+                self.saveFlyData = None
+
+            if self.reduce_after_write:
+                # own worker: the next scan's prepare does not wait for it
+                try:
+                    self.reducer.submit("reduce_HDF5_file", reduce_HDF5_file, fname)
+                except queue.Full:
+                    logger.warning(
+                        "Did not write reduced fly scan data: %s, %d reductions pending",
+                        fname, self.reducer.backlog
+                    )
+            return fname
+
+        def reduce_HDF5_file(fname):
+            from ..callbacks.calculate_reduced_data import reduce_flyscan_file
 
-            logger.info(f"HDF5 output complete: {self._output_HDF5_file_}")
-            self.saveFlyData = None
+            try:
+                reduce_flyscan_file(fname)
+                logger.info(f"reduced fly scan data written: {fname}")
+            except Exception as exinfo:
+                logger.warning("Did not write reduced fly scan data: %s", exinfo)
+            return fname
+
+        def wait_for_previous_HDF5_file():
+            job = self.writer_job
+            if job is None:
+                return
+            if self.wait_for_writer and not job.done:
+                logger.info("waiting for previous fly scan file: %s", job)
+                yield from job.wait_plan(timeout=self.writer_timeout_s)
+                if not job.done:
+                    logger.warning("previous fly scan file not done: %s", job)
+            if job.done and not job.success:
+                msg = f"previous fly scan file not written: {job}"
+                logger.error(msg)
+                specwriter._cmt("start", msg)
 
         ######################################################################
         # plan starts here
@@ -184,6 +243,7 @@ class UsaxsFlyScanDevice(Device):
 
         yield from bps.open_run(md=_md)
         specwriter._cmt("start", "start USAXS Fly scan")
+        yield from wait_for_previous_HDF5_file()
         yield from bps.mv(
             upd_controls.auto.mode, AutorangeSettings.auto_background,
         )
@@ -194,8 +254,39 @@ class UsaxsFlyScanDevice(Device):
             logger.warning("Was flying.  Setting that signal to False now.")
             yield from bps.abs_set(self.flying, False)
 
+        prepare_job = None
         if bluesky_runengine_running:
-            prepare_HDF5_file()      # prepare HDF5 file to save fly scan data (background thread)
+            # settings now: the next Flyscan() may change them before
+            # the file is written
+            self._output_HDF5_file_ = HDF5_file_name(
+                self.saveFlyData_HDF5_dir, self.saveFlyData_HDF5_file
+            )
+            yield from user_data.set_state_plan(
+                "FlyScanning: " + os.path.split(self._output_HDF5_file_)[-1]
+            )
+            # read the pre-scan PVs now, write the HDF5 file in background
+            read_job = yield from self.reader.submit_plan(
+                "read_preliminary_data",
+                read_preliminary_data,
+                self._output_HDF5_file_,
+                self.saveFlyData_config,
+                self.saveFlyData_streaming,
+                timeout=self.writer_timeout_s,
+            )
+            if (yield from read_job.wait_plan(timeout=self.writer_timeout_s)):
+                sfs = self.saveFlyData = read_job.result[0]
+                prepare_job = yield from self.writer.submit_plan(
+                    "prepare_HDF5_file",
+                    prepare_HDF5_file,
+                    read_job,
+                    timeout=self.writer_timeout_s,
+                )
+            else:
+                logger.error("fly scan HDF5 file will not be written: %s", read_job)
+            if prepare_job is not None and self.saveFlyData_streaming:
+                # streaming starts in prepare_HDF5_file(): before flying
+                if not (yield from prepare_job.wait_plan(timeout=self.writer_timeout_s)):
+                    logger.warning("fly scan data not streaming: %s", prepare_job)
         # path = os.path.abspath(self.saveFlyData_HDF5_dir)
         specwriter._cmt("start", f"HDF5 configuration file: {self.saveFlyData_config}")
 
@@ -239,8 +330,26 @@ class UsaxsFlyScanDevice(Device):
                 # FIXME: hack to avoid `Another set() call is still in progress`
                 # see: https://github.com/APS-USAXS/ipython-usaxs/issues/417
                 user_data.state._set_thread = None
-            # logger.debug(resource_usage("before saveFlyData.finish_HDF5_file()"))
-            finish_HDF5_file()    # finish saving data to HDF5 file (background thread)
+            if prepare_job is not None:
+                # read the arrays now, before the next scan restarts the MCS
+                read_job = yield from self.reader.submit_plan(
+                    "read_final_data",
+                    sfs.readFinalData,
+                    timeout=self.writer_timeout_s,
+                )
+                if (yield from read_job.wait_plan(timeout=self.writer_timeout_s)):
+                    # logger.debug(resource_usage("before saveFlyData.finish_HDF5_file()"))
+                    # finish saving data to HDF5 file (background thread)
+                    self.writer_job = yield from self.writer.submit_plan(
+                        "finish_HDF5_file",
+                        finish_HDF5_file,
+                        prepare_job,
+                        read_job.result,
+                        timeout=self.writer_timeout_s,
+                    )
+                else:
+                    logger.error("fly scan HDF5 file not finished: %s", read_job)
+            logger.debug("fly scan writer backlog: %d", self.writer.backlog)
             # logger.debug(resource_usage("after saveFlyData.finish_HDF5_file()"))
             specwriter._cmt("stop", f"finished {msg}")
             logger.info(f"finished {msg}")
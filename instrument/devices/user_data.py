@@ -17,7 +17,7 @@ from bluesky import plan_stubs as bps
 from apstools.devices import ApsBssUserInfoDevice
 from apsbss.apsbss_ophyd import EpicsBssDevice
 from apstools.utils import trim_string_for_EPICS
-from ophyd import Component, Device, EpicsSignal
+from ophyd import Component, Device, EpicsSignal, Signal
 
 from ..framework import sd
 
@@ -101,6 +101,9 @@ class UserDataDevice(Device):
     # for GUI to know if user is collecting data: 0="On", 1="Off"
     collection_in_progress = Component(EpicsSignal, "9idcLAX:dataColInProgress")
 
+    # estimated end of the command list in progress (no EPICS PV yet)
+    command_list_eta = Component(Signal, value="")
+
     def set_state_plan(self, msg, confirm=True):
         """plan: tell EPICS about what we are doing"""
         msg = trim_string_for_EPICS(msg)
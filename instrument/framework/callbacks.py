@@ -20,9 +20,11 @@ logger.info(__file__)
 
 from .initialize import RE, callback_db
 # from ..utils.check_file_exists import filename_exists
+from ..utils.spec_writer import UsaxsSpecWriterCallback
 
 # write scans to SPEC data file
-specwriter = apstools.callbacks.SpecWriterCallback()
+# (rows buffered, written in batches; array data summarized, not as text)
+specwriter = UsaxsSpecWriterCallback()
 # _path = "/tmp"      # make the SPEC file in /tmp (assumes OS is Linux)
 _path = (
     os.getcwd()
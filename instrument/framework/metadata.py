@@ -10,20 +10,17 @@ import logging
 logger = logging.getLogger(__name__)
 
 import apstools
-import area_detector_handlers
 import bluesky
 import databroker
 import epics
 import getpass
-import h5py
+import importlib.metadata
 import matplotlib
 import numpy
 import ophyd
 import os
-import pymongo
 import pyRestTable
 import socket
-import spec2nexus
 
 logger.info(__file__)
 
@@ -40,20 +37,21 @@ USERNAME = getpass.getuser() or "APS 9-ID-C USAXS user"
 RE.md["login_id"] = USERNAME + "@" + HOSTNAME
 
 # useful diagnostic to record with all data
+# (packages not otherwise needed here: installed version, not imported)
 RE.md["versions"] = dict(
     apstools=apstools.__version__,
-    area_detector_handlers=area_detector_handlers.__version__,
+    area_detector_handlers=importlib.metadata.version("area-detector-handlers"),
     bluesky=bluesky.__version__,
     databroker=databroker.__version__,
     epics_ca=epics.__version__,
     epics=epics.__version__,
-    h5py=h5py.__version__,
+    h5py=importlib.metadata.version("h5py"),
     matplotlib=matplotlib.__version__,
     numpy=numpy.__version__,
     ophyd=ophyd.__version__,
-    pymongo=pymongo.__version__,
+    pymongo=importlib.metadata.version("pymongo"),
     pyRestTable=pyRestTable.__version__,
-    spec2nexus=spec2nexus.__version__,
+    spec2nexus=importlib.metadata.version("spec2nexus"),
 )
 
 # per https://github.com/APS-USAXS/ipython-usaxs/issues/553
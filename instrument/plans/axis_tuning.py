@@ -53,11 +53,15 @@ from .requested_stop import IfRequestedStopBeforeNextScan
 user_override.register("usaxs_minstep")
 
 
-def _tune_base_(axis, md={}):
+def _tune_base_(axis, md={}, autoscale=True, **kwargs):
     """
     plan for simple tune and report
 
     satisfies: report of tuning OK/not OK on console
+
+    Skip the autoscale if the caller has done it (``autoscale=False``).
+    Other keyword arguments (such as ``width`` and ``num``) are passed
+    to the axis tuner.
     """
     yield from IfRequestedStopBeforeNextScan()
     logger.info(f"tuning axis: {axis.name}")
@@ -66,8 +70,9 @@ def _tune_base_(axis, md={}):
         mono_shutter, "open",
         ti_filter_shutter, "open",
     )
-    yield from autoscale_amplifiers([upd_controls, I0_controls, I00_controls])
-    yield from axis.tune(md=md)
+    if autoscale:
+        yield from autoscale_amplifiers([upd_controls, I0_controls, I00_controls])
+    yield from axis.tune(md=md, **kwargs)
     yield from bps.mv(
         ti_filter_shutter, "close",
         scaler0.count_mode, "AutoCount",
@@ -85,18 +90,18 @@ def _tune_base_(axis, md={}):
     logger.info(f"final position: {axis.position}")
 
 
-def tune_mr(md={}):
+def tune_mr(md={}, **kwargs):
     yield from bps.mv(scaler0.preset_time, 0.1)
     md['plan_name'] = "tune_mr"
     # print(f"metadata={md}")  # TOO much data to print
-    yield from _tune_base_(m_stage.r, md=md)
+    yield from _tune_base_(m_stage.r, md=md, **kwargs)
 
 
-def tune_m2rp(md={}):
+def tune_m2rp(md={}, **kwargs):
     yield from bps.sleep(0.2)   # piezo is fast, give the system time to react
     yield from bps.mv(scaler0.preset_time, 0.1)
     md['plan_name'] = "tune_m2rp"
-    yield from _tune_base_(m_stage.r2p, md=md)
+    yield from _tune_base_(m_stage.r2p, md=md, **kwargs)
     yield from bps.sleep(0.1)   # piezo is fast, give the system time to react
 
 
@@ -112,24 +117,24 @@ if m_stage.isChannelCut:
     tune_m2rp = empty_plan
 
 
-def tune_msrp(md={}):
+def tune_msrp(md={}, **kwargs):
     pass
     # yield from bps.mv(scaler0.preset_time, 0.1)
     # md['plan_name'] = "tune_msrp"
     # yield from _tune_base_(ms_stage.rp, md=md)
 
 
-def tune_ar(md={}):
+def tune_ar(md={}, **kwargs):
     yield from bps.mv(ti_filter_shutter, "open")
     ##redundant## yield from autoscale_amplifiers([upd_controls])
     yield from bps.mv(scaler0.preset_time, 0.1)
     yield from bps.mv(upd_controls.auto.mode, "manual")
     md['plan_name'] = "tune_ar"
-    yield from _tune_base_(a_stage.r, md=md)
+    yield from _tune_base_(a_stage.r, md=md, **kwargs)
     yield from bps.mv(upd_controls.auto.mode, "auto+background")
 
 
-def tune_asrp(md={}):
+def tune_asrp(md={}, **kwargs):
     pass
 #     yield from bps.mv(ti_filter_shutter, "open")
 #     ##redundant## yield from autoscale_amplifiers([upd_controls])
@@ -140,35 +145,35 @@ def tune_asrp(md={}):
 #     yield from bps.mv(upd_controls.auto.mode, "auto+background")
 
 
-def tune_a2rp(md={}):
+def tune_a2rp(md={}, **kwargs):
     yield from bps.mv(ti_filter_shutter, "open")
     yield from bps.sleep(0.1)   # piezo is fast, give the system time to react
     ##redundant## yield from autoscale_amplifiers([upd_controls])
     yield from bps.mv(scaler0.preset_time, 0.1)
     yield from bps.mv(upd_controls.auto.mode, "manual")
     md['plan_name'] = "tune_a2rp"
-    yield from _tune_base_(a_stage.r2p, md=md)
+    yield from _tune_base_(a_stage.r2p, md=md, **kwargs)
     yield from bps.mv(upd_controls.auto.mode, "auto+background")
     yield from bps.sleep(0.1)   # piezo is fast, give the system time to react
 
 
-def tune_dx(md={}):
+def tune_dx(md={}, **kwargs):
     yield from bps.mv(ti_filter_shutter, "open")
     ##redundant## yield from autoscale_amplifiers([upd_controls])
     yield from bps.mv(scaler0.preset_time, 0.1)
     yield from bps.mv(upd_controls.auto.mode, "manual")
     md['plan_name'] = "tune_dx"
-    yield from _tune_base_(d_stage.x, md=md)
+    yield from _tune_base_(d_stage.x, md=md, **kwargs)
     yield from bps.mv(upd_controls.auto.mode, "auto+background")
 
 
-def tune_dy(md={}):
+def tune_dy(md={}, **kwargs):
     yield from bps.mv(ti_filter_shutter, "open")
     ##redundant## yield from autoscale_amplifiers([upd_controls])
     yield from bps.mv(scaler0.preset_time, 0.1)
     yield from bps.mv(upd_controls.auto.mode, "manual")
     md['plan_name'] = "tune_dy"
-    yield from _tune_base_(d_stage.y, md=md)
+    yield from _tune_base_(d_stage.y, md=md, **kwargs)
     yield from bps.mv(upd_controls.auto.mode, "auto+background")
 
 
@@ -28,7 +28,6 @@ import logging
 logger = logging.getLogger(__name__)
 logger.info(__file__)
 
-from apstools.utils import ExcelDatabaseFileGeneric
 from apstools.utils import rss_mem
 from bluesky import plan_stubs as bps
 from IPython import get_ipython
@@ -39,6 +38,7 @@ import datetime
 import os
 import pyRestTable
 import sys
+import time
 
 from ..devices import a_shutter_autoopen
 from ..devices import constants
@@ -53,10 +53,15 @@ from ..devices.amplifiers import measure_background
 from ..devices.amplifiers import trd_controls
 from ..devices.amplifiers import upd_controls
 from ..devices.stages import s_stage
-from ..utils.quoted_line import split_quoted_line
+from ..utils.command_file import Command
+from ..utils.command_file import read_command_file
+from ..utils.command_file import validate_commands
 from .axis_tuning import instrument_default_tune_ranges
 from .axis_tuning import update_EPICS_tuning_widths
 from .axis_tuning import user_defined_settings
+from .command_planner import compile_command_list
+from .command_planner import order_directive
+from .runtime_estimator import RuntimeEstimator
 from .doc_run import documentation_run
 from .mode_changes import mode_BlackFly
 from .mode_changes import mode_Radiography
@@ -155,49 +160,28 @@ def before_command_list(md=None, commands=None):
         yield from postCommandsListfile2WWW(commands)
 
     # force the next FlyScan to reload the metadata configuration
-    # which forces a (re)connection to the EPICS PVs
+    # (parsed again only if the XML file changed, connected PVs are reused)
     reset_manager()
 
 
 def verify_commands(commands):
-    """Verifies command input parameters to check if they are valid"""
-    # create string for error logging
-    list_of_errors = []
-    # separate commands into individual components, see execute_command_list for details
-    scan_actions = "flyscan usaxsscan saxs saxsexp waxs waxsexp".split()
-    for command in commands:
-        action, args, i, raw_command = command
-        if action.lower() in scan_actions:
-            #if args[2].isnumeric() is False :
-            #    list_of_errors.append(f"line {i}: thickness incorrect for : {raw_command.strip()}")
-            try:
-                sx = float(args[0])
-                sy = float(args[1])
-                sth = float(args[2])
-                snm = args[3]
-            except (IndexError,ValueError) as exc:
-                list_of_errors.append(f"line {i}: Improper command : {raw_command.strip()} : {exc}")
-                continue
-            # check sx against travel limits
-            if sx < s_stage.x.low_limit :
-                list_of_errors.append(f"line {i}: SX low limit: value {sx} < low limit {s_stage.x.low_limit},  command: {raw_command.strip()}")
-            if sx > s_stage.x.high_limit :
-                list_of_errors.append(f"line {i}: SX high limit: value {sx} > high limit {s_stage.x.high_limit},  command: {raw_command.strip()}")
-            # check sy against travel limits
-            if sy < s_stage.y.low_limit :
-                list_of_errors.append(f"line {i}: SY low limit: value {sy} < low limit {s_stage.y.low_limit},  command: {raw_command.strip()}")
-            if sy > s_stage.y.high_limit :
-                list_of_errors.append(f"line {i}: SY high limit: value {sy} > high limit {s_stage.y.high_limit},  command: {raw_command.strip()}")
-            # check sth for reasonable sample thickness value
-            if sth < 0:
-                print(f"{sth = } from args[2] = float('{args[2]}') -- thickness problem")
-            #    list_of_errors.append(f"line {i}: thickness incorrect for : {raw_command.strip()}")
-            # check snm for reasonable sample title value
-    if len(list_of_errors) > 0:
-        err_msg="Errors were found in command file. Cannot continue. List of errors:\n"+"\n".join(list_of_errors)
+    """
+    Verifies command input parameters to check if they are valid
+
+    Checks are in ``validate_commands()``: scan parameters (sample
+    within the soft limits of the sample stage, thickness), arguments of
+    ``set`` and ``run_python``, and unknown actions (a warning).
+    """
+    errors, warnings = validate_commands(
+        commands,
+        x_limits=(s_stage.x.low_limit, s_stage.x.high_limit),
+        y_limits=(s_stage.y.low_limit, s_stage.y.high_limit),
+    )
+    for warning in warnings:
+        logger.warning(warning)
+    if len(errors) > 0:
+        err_msg="Errors were found in command file. Cannot continue. List of errors:\n"+"\n".join(errors)
         raise RuntimeError(err_msg)
-    #this is the end of this routine
-    #raise RuntimeError("Stop anyway")
     logger.info("Command file verified")
 
 
@@ -208,6 +192,7 @@ def after_command_list(md=None):
     yield from bps.mv(
         user_data.time_stamp, str(datetime.datetime.now()),
         user_data.collection_in_progress, 0,
+        user_data.command_list_eta, "",
         ti_filter_shutter, "close",
     )
     yield from user_data.set_state_plan("USAXS macro file done")
@@ -274,25 +259,10 @@ def parse_Excel_command_file(filename):
         if file cannot be found
 
     """
-    full_filename = os.path.abspath(filename)
-    assert os.path.exists(full_filename)
-    xl = ExcelDatabaseFileGeneric(full_filename)
-
-    commands = []
-
-    if len(xl.db) > 0:
-        for i, row in enumerate(xl.db.values()):
-            action, *values = list(row.values())
-
-            # trim off any None values from end
-            while len(values) > 0:
-                if values[-1] is not None:
-                    break
-                values = values[:-1]
-
-            commands.append((action, values, i+1, list(row.values())))
-
-    return commands
+    commands = read_command_file(filename)
+    if commands.kind != "excel":
+        raise ValueError(f"not an Excel file: {filename}")
+    return commands.commands
 
 
 def parse_text_command_file(filename):
@@ -342,22 +312,10 @@ def parse_text_command_file(filename):
     FileNotFoundError
         if file cannot be found
     """
-    full_filename = os.path.abspath(filename)
-    assert os.path.exists(full_filename)
-    with open(full_filename, "r") as fp:
-        buf = fp.readlines()
-
-    commands = []
-    for i, raw_command in enumerate(buf):
-        row = raw_command.strip()
-        if row == "" or row.startswith("#"):
-            continue                    # comment or blank
-
-        else:                           # command line
-            action, *values = split_quoted_line(row)
-            commands.append((action, values, i+1, raw_command.rstrip()))
-
-    return commands
+    commands = read_command_file(filename)
+    if commands.kind != "text":
+        raise ValueError(f"not a text file: {filename}")
+    return commands.commands
 
 
 def command_list_as_table(commands):
@@ -374,26 +332,79 @@ def command_list_as_table(commands):
 
 
 def get_command_list(filename):
-    """Return command list from either text or Excel file."""
-    full_filename = os.path.abspath(filename)
-    assert os.path.exists(full_filename)
-    try:
-        commands = parse_Excel_command_file(filename)
-    except Exception:          # TODO: XLRDError
-        commands = parse_text_command_file(filename)
-    return commands
+    """
+    Return command list from either text or Excel file.
 
+    The file is read again only if it changed since it was read last.
+    """
+    return read_command_file(filename).commands
 
-def summarize_command_file(filename):
-    """Print the command list from a text or Excel file."""
+
+def current_technique():
+    """USAXS, SAXS, or WAXS if that is in the beam now, else None"""
+    mode_now = terms.SAXS.UsaxsSaxsMode.get(as_string=True)
+    technique = mode_now.split()[0]
+    if mode_now.endswith("in beam") and technique in ("USAXS", "SAXS", "WAXS"):
+        return technique
+
+
+def command_list_estimator():
+    """RuntimeEstimator, from the instrument now and its tune cadence"""
+    cadence = terms.preUSAXStune
+    if terms.FlyScan.use_flyscan.get():
+        usaxs_plan = "Flyscan"
+    else:
+        usaxs_plan = "USAXSscanStep"
+    return RuntimeEstimator(
+        mode=current_technique(),
+        usaxs_plan=usaxs_plan,
+        tune_scans=cadence.req_num_scans_between_tune.get(),
+        tune_interval=cadence.req_time_between_tune.get(),
+        scans_since_tune=cadence.num_scans_last_tune.get(),
+        time_since_tune=time.time() - cadence.epoch_last_tune.get(),
+    )
+
+
+def post_command_list_eta(commands):
+    """Plan: estimate the time of the commands left, post the ETA."""
+    seconds = command_list_estimator().total(commands)
+    eta = datetime.datetime.now() + datetime.timedelta(seconds=seconds)
+    remaining = datetime.timedelta(seconds=round(seconds))
+    yield from bps.mv(
+        user_data.command_list_eta, f"{eta:%Y-%m-%d %H:%M} ({remaining} remaining)"
+    )
+
+
+def _strict_order(commands, strict=None):
+    """
+    run the commands in file order?
+
+    ``strict`` if given, else as the file says (``STRICT_ORDER`` or
+    ``GROUP_BY_TECHNIQUE`` line), else ``terms.strict_command_order``.
+    """
+    if strict is None:
+        strict = order_directive(commands)
+    if strict is None:
+        strict = terms.strict_command_order.get()
+    return strict
+
+
+def summarize_command_file(filename, strict=None):
+    """Print the command list from a text or Excel file, as it would run."""
     commands = get_command_list(filename)
+    graph = compile_command_list(
+        commands,
+        strict=_strict_order(commands, strict),
+        mode=current_technique(),
+        estimator=command_list_estimator(),
+    )
     logger.info(
-        "Command file: %s\n%s",
-        command_list_as_table(commands), filename
+        "Command file: %s\n%s\nExecution order: %s",
+        filename, command_list_as_table(commands), graph.summary()
     )
 
 
-def run_command_file(filename, md=None):
+def run_command_file(filename, md=None, strict=None):
     """
     Plan: execute a list of commands from a text or Excel file.
 
@@ -403,10 +414,10 @@ def run_command_file(filename, md=None):
     if md is None:
         md = {}
     commands = get_command_list(filename)
-    yield from execute_command_list(filename, commands, md=md)
+    yield from execute_command_list(filename, commands, md=md, strict=strict)
 
 
-def execute_command_list(filename, commands, md=None):
+def execute_command_list(filename, commands, md=None, strict=None):
     """
     Plan: execute the command list.
 
@@ -438,6 +449,13 @@ def execute_command_list(filename, commands, md=None):
     raw_command: obj (str or list(str)
         contents from input file, such as:
         ``SAXS 0 0 0 blank``
+    strict : bool
+        Run the commands in the order given.  Otherwise, group the
+        scans of each sample set by technique and remove redundant
+        mode changes (see ``command_planner``).
+        Default: as the file says (a ``GROUP_BY_TECHNIQUE`` or
+        ``STRICT_ORDER`` line), else ``terms.strict_command_order``
+        (``True``).
     """
     from .scans import preUSAXStune, SAXS, USAXSscan, WAXS, allUSAXStune
 
@@ -450,8 +468,16 @@ def execute_command_list(filename, commands, md=None):
         yield from bps.null()
         return
 
+    graph = compile_command_list(
+        commands,
+        strict=_strict_order(commands, strict),
+        mode=current_technique(),
+        estimator=command_list_estimator(),
+    )
+
     text = f"Command file: {filename}\n"
     text += str(command_list_as_table(commands))
+    text += f"\nExecution order: {graph.summary()}"
     logger.info(text)
     logger.info("memory report: %s", rss_mem())
 
@@ -461,10 +487,11 @@ def execute_command_list(filename, commands, md=None):
     instrument_archive(text)
 
     yield from before_command_list(md=md, commands=commands)
-    for command in commands:
+    for n, command in enumerate(graph.commands):
         action, args, i, raw_command = command
         logger.info("file line %d: %s", i, raw_command)
         yield from bps.checkpoint()
+        yield from post_command_list_eta(graph.commands[n:])
 
         _md = {}
         _md["full_filename"] = full_filename
@@ -496,26 +523,17 @@ def execute_command_list(filename, commands, md=None):
             """Inner function to make try..except clause more clear."""
             if action in ("flyscan", "usaxsscan"):
                 # handles either step or fly scan
-                sx = float(args[0])
-                sy = float(args[1])
-                sth = float(args[2])
-                snm = args[3]
+                sx, sy, sth, snm = Command(*command).scan_parameters()
                 _md.update(dict(sx=sx, sy=sy, thickness=sth, title=snm))
                 yield from USAXSscan(sx, sy, sth, snm, md=_md)
 
             elif action in ("saxs", "saxsexp"):
-                sx = float(args[0])
-                sy = float(args[1])
-                sth = float(args[2])
-                snm = args[3]
+                sx, sy, sth, snm = Command(*command).scan_parameters()
                 _md.update(dict(sx=sx, sy=sy, thickness=sth, title=snm))
                 yield from SAXS(sx, sy, sth, snm, md=_md)
 
             elif action in ("waxs", "waxsexp"):
-                sx = float(args[0])
-                sy = float(args[1])
-                sth = float(args[2])
-                snm = args[3]
+                sx, sy, sth, snm = Command(*command).scan_parameters()
                 _md.update(dict(sx=sx, sy=sy, thickness=sth, title=snm))
                 yield from WAXS(sx, sy, sth, snm, md=_md)
 
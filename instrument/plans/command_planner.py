@@ -0,0 +1,264 @@
+"""
+compile a command list into an execution graph, before running it
+
+``execute_command_list()`` runs the command list in the order compiled
+here.  Each command is a node of the graph, its edges are the commands
+it must follow:
+
+* A scan (``FlyScan``, ``USAXSscan``, ``SAXS``, ``WAXS``, ...) follows
+  the last other command before it.  Consecutive scans form a *sample
+  set*.
+* Any other command (``set``, ``preUSAXStune``, ``run_python``, ...)
+  follows everything before it, and everything after follows it.
+* In a sample set that measures a position more than once with the
+  same technique (such as a time series), each scan follows the one
+  before it: the order of the file is kept.
+* In strict mode (the default), each command follows the one before
+  it: the command list runs as written, nothing is removed.
+
+Grouping must be asked for: ``strict=False``, or a ``GROUP_BY_TECHNIQUE``
+line in the command file (``STRICT_ORDER`` keeps the file order, these
+directives are not run).  Then, within these constraints, the scans of
+a sample set are grouped by technique (staying in the current mode
+first, then USAXS, SAXS, WAXS), so the instrument changes mode once per
+technique instead of for each sample.  ``mode_USAXS``, ``mode_SAXS``,
+and ``mode_WAXS`` lines are removed when the next command changes the
+mode anyway (a scan or another such line).
+
+The time of each step is estimated by a ``RuntimeEstimator``
+(from past run times, with the tune cadence).
+"""
+
+__all__ = """
+    CommandGraph
+    compile_command_list
+    order_directive
+""".split()
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from collections import defaultdict
+import datetime
+import heapq
+import pyRestTable
+
+from ..utils.command_file import ORDER_DIRECTIVES
+from .runtime_estimator import MODE_TECHNIQUES
+from .runtime_estimator import RuntimeEstimator
+from .runtime_estimator import SCAN_TECHNIQUES
+
+
+TECHNIQUE_ORDER = ("USAXS", "SAXS", "WAXS")
+
+
+def order_directive(commands):
+    """
+    strict order asked by the command list: True, False, or None (not said)
+
+    The last ``STRICT_ORDER`` or ``GROUP_BY_TECHNIQUE`` line counts.
+    """
+    strict = None
+    for command in commands:
+        strict = ORDER_DIRECTIVES.get(str(command[0]).lower(), strict)
+    return strict
+
+
+class CommandStep:
+    """one command of the command list, a node of the CommandGraph"""
+
+    def __init__(self, index, command):
+        self.index = index      # in the command list
+        self.command = command
+        self.action = str(command[0]).lower()
+        self.technique = SCAN_TECHNIQUES.get(self.action)
+        self.after = set()      # indices of the steps this one follows
+        self.estimate = 0       # s
+        self.mode_change = False
+        self.tune = False       # a preUSAXStune is expected first
+
+    @property
+    def is_scan(self):
+        return self.technique is not None
+
+    @property
+    def position(self):
+        """(sx, sy) of a scan, as written"""
+        return tuple(self.command[1][:2])
+
+    @property
+    def line_number(self):
+        return self.command[2]
+
+
+class CommandGraph:
+    """
+    command list, compiled: run ``order``, ``removed`` are not run
+
+    Use ``compile_command_list()`` to create.
+    """
+
+    def __init__(self, commands, strict=True, mode=None, estimator=None):
+        self.strict = strict
+        self.initial_mode = mode
+        self.estimator = estimator or RuntimeEstimator(mode=mode)
+        self.removed = []
+        self.steps = []
+        commands = [c for c in commands if str(c[0]).lower() not in ORDER_DIRECTIVES]
+        for index, command in enumerate(commands):
+            step = CommandStep(index, command)
+            if (
+                not strict
+                and step.action in MODE_TECHNIQUES
+                and self._superseded(commands, index)
+            ):
+                self.removed.append(step)
+            else:
+                self.steps.append(step)
+        self._connect()
+        self.order = self._schedule()
+        self._estimate()
+
+    @staticmethod
+    def _superseded(commands, index):
+        """True if the next command changes the mode anyway"""
+        if index + 1 >= len(commands):
+            return False
+        action = str(commands[index + 1][0]).lower()
+        return action in SCAN_TECHNIQUES or action in MODE_TECHNIQUES
+
+    def _connect(self):
+        """add the edges of the graph"""
+        previous = []       # steps since (and including) the last barrier
+        sample_set = []
+        for step in self.steps:
+            if self.strict or not step.is_scan:
+                step.after.update(s.index for s in previous)
+                previous = [step]
+                self._chain_if_repeated(sample_set)
+                sample_set = []
+            else:
+                if len(previous) > 0 and not previous[0].is_scan:
+                    step.after.add(previous[0].index)
+                previous.append(step)
+                sample_set.append(step)
+        self._chain_if_repeated(sample_set)
+
+    @staticmethod
+    def _chain_if_repeated(sample_set):
+        """keep the order of a sample set with repeated measurements"""
+        keys = [(s.technique, s.position) for s in sample_set]
+        if len(keys) != len(set(keys)):
+            for before, step in zip(sample_set, sample_set[1:]):
+                step.after.add(before.index)
+
+    def _schedule(self):
+        """topological order, fewest mode changes first, then file order"""
+        followers = defaultdict(list)
+        waiting = {}        # number of steps each step still waits for
+        ready = defaultdict(list)   # technique (None: not a scan): heap of indices
+        steps = {s.index: s for s in self.steps}
+        for step in self.steps:
+            waiting[step.index] = len(step.after)
+            for index in step.after:
+                followers[index].append(step)
+            if len(step.after) == 0:
+                heapq.heappush(ready[step.technique], step.index)
+
+        order = []
+        mode = self.initial_mode
+        while len(order) < len(steps):
+            for technique in (None, mode) + TECHNIQUE_ORDER:
+                if len(ready[technique]) > 0:
+                    break
+            step = steps[heapq.heappop(ready[technique])]
+            order.append(step)
+            mode = step.technique or MODE_TECHNIQUES.get(step.action, mode)
+            for follower in followers[step.index]:
+                waiting[follower.index] -= 1
+                if waiting[follower.index] == 0:
+                    heapq.heappush(ready[follower.technique], follower.index)
+        return order
+
+    def _estimate(self):
+        for step, result in zip(self.order, self.estimator.estimate(self.commands)):
+            step.estimate = result["seconds"]
+            step.mode_change = result["mode_change"]
+            step.tune = result["tune"]
+
+    @property
+    def commands(self):
+        """the commands, in the order to run them"""
+        return [step.command for step in self.order]
+
+    @property
+    def mode_changes(self):
+        return sum(step.mode_change for step in self.order)
+
+    @property
+    def tunes(self):
+        return sum(step.tune for step in self.order)
+
+    @property
+    def total_time(self):
+        """estimated time (s) to run the command list"""
+        return sum(step.estimate for step in self.order)
+
+    def eta(self, start=None):
+        """estimated finish time (datetime), starting now (or ``start``)"""
+        start = start or datetime.datetime.now()
+        return start + datetime.timedelta(seconds=self.total_time)
+
+    def table(self):
+        """the steps in order of execution, as a pyRestTable.Table"""
+        tbl = pyRestTable.Table()
+        tbl.labels = "# line action parameters mode? tune? estimate,s".split()
+        for i, step in enumerate(self.order, start=1):
+            action, args, line_number = step.command[:3]
+            tbl.addRow((
+                i,
+                line_number,
+                action,
+                ", ".join(map(str, args)),
+                "change" if step.mode_change else "",
+                "tune" if step.tune else "",
+                f"{step.estimate:.0f}",
+            ))
+        return tbl
+
+    def summary(self):
+        """text: order of execution, removed lines, ETA"""
+        text = "strict order" if self.strict else "grouped by technique"
+        text += f", {self.mode_changes} mode changes, {self.tunes} tunes"
+        if len(self.removed) > 0:
+            lines = ", ".join(str(s.line_number) for s in self.removed)
+            text += f", redundant mode lines removed: {lines}"
+        text += f"\n{self.table()}"
+        text += (
+            f"estimated time: {datetime.timedelta(seconds=round(self.total_time))}"
+            f", ETA: {self.eta().isoformat(sep=' ', timespec='minutes')}"
+        )
+        return text
+
+
+def compile_command_list(commands, strict=True, mode=None, estimator=None):
+    """
+    compile the command list into a ``CommandGraph``
+
+    PARAMETERS
+
+    commands *list* :
+        Command list from ``get_command_list()``.
+    strict *bool* :
+        Keep the order of the command list, run all of it.  ``False``:
+        group by technique.  (default: ``True``)
+    mode *str* :
+        Technique (``USAXS``, ``SAXS``, or ``WAXS``) of the instrument
+        now, or ``None`` if not known.  (default: ``None``)
+    estimator *obj* :
+        ``RuntimeEstimator`` for the time of each step.
+        (default: ``RuntimeEstimator(mode=mode)``)
+    """
+    return CommandGraph(commands, strict=strict, mode=mode, estimator=estimator)
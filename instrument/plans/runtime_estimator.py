@@ -0,0 +1,208 @@
+"""
+estimate how long a command list will take, from past run times
+
+The times of past plans come from the plan profile log (see
+``instrument.utils.plan_profiler``): the median time of each scan plan
+(without its mode change and tune), of a mode change that moved the
+instrument, and of ``preUSAXStune`` and ``allUSAXStune``.  Defaults are
+used until there is history.
+
+The estimate follows the tune cadence of ``before_plan()``: a
+``preUSAXStune`` runs before a scan when more than
+``req_num_scans_between_tune`` scans (USAXS scans count 3) or
+``req_time_between_tune`` seconds have passed since the last tune,
+and only if the instrument is in USAXS mode then.  (``before_plan()``
+of SAXS and WAXS comes before their mode change.)
+"""
+
+__all__ = """
+    plan_durations
+    RuntimeEstimator
+""".split()
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from collections import defaultdict
+import os
+import statistics
+
+from ..utils.plan_profiler import PROFILE_LOG_FILE
+from ..utils.plan_profiler import read_profile_log
+
+
+SCAN_TECHNIQUES = dict(     # action (lower case): technique
+    flyscan="USAXS",
+    usaxsscan="USAXS",
+    saxs="SAXS",
+    saxsexp="SAXS",
+    waxs="WAXS",
+    waxsexp="WAXS",
+)
+MODE_TECHNIQUES = dict(mode_usaxs="USAXS", mode_saxs="SAXS", mode_waxs="WAXS")
+SCAN_WEIGHTS = dict(USAXS=3, SAXS=1, WAXS=1)    # as after_plan(weight=...)
+SCAN_PLANS = ("Flyscan", "USAXSscanStep", "SAXS", "WAXS")   # profiled plan names
+TUNE_PLANS = dict(preUSAXStune="preusaxstune", allUSAXStune="allusaxstune")
+MODE_CHANGE_MIN_TIME = 5    # s, shorter "mode change" phases did not move
+DEFAULT_DURATIONS = dict(   # s, rough, when there is no history
+    Flyscan=150,
+    USAXSscanStep=600,
+    SAXS=60,
+    WAXS=45,
+    mode_change=60,
+    preusaxstune=60,
+    allusaxstune=180,
+)
+
+_durations_cache = {}       # log_file: (mtime, durations)
+
+
+def plan_durations(log_file=PROFILE_LOG_FILE):
+    """
+    typical times (s) from the plan profile log, with defaults
+
+    Returns dictionary (keys as ``DEFAULT_DURATIONS``) with the median
+    time of each scan plan (without its mode change and tune phases),
+    ``mode_change`` (of the mode changes that moved the instrument), and
+    ``preusaxstune`` & ``allusaxstune`` (run alone or within a scan).
+    The log is read again only when it has changed.
+    """
+    try:
+        mtime = os.path.getmtime(log_file)
+    except OSError:
+        return dict(DEFAULT_DURATIONS)
+    cached = _durations_cache.get(log_file)
+    if cached is not None and cached[0] == mtime:
+        return dict(cached[1])
+
+    runs = defaultdict(lambda: defaultdict(float))    # (time, plan): {phase: s}
+    for row in read_profile_log(log_file):
+        runs[(row["time"], row["plan"])][row["phase"]] += row["seconds"]
+
+    samples = defaultdict(list)
+    for (_t, plan), phases in runs.items():
+        total = sum(phases.values())
+        if plan in TUNE_PLANS:
+            samples[TUNE_PLANS[plan]].append(total)
+        elif plan in SCAN_PLANS:
+            mode_change = phases.get("mode change", 0)
+            if mode_change > MODE_CHANGE_MIN_TIME:
+                samples["mode_change"].append(mode_change)
+            tunes = 0
+            for phase, key in TUNE_PLANS.items():
+                if phases.get(phase, 0) > 0:
+                    samples[key].append(phases[phase])
+                    tunes += phases[phase]
+            samples[plan].append(total - mode_change - tunes)
+
+    durations = dict(DEFAULT_DURATIONS)
+    for key, values in samples.items():
+        durations[key] = statistics.median(values)
+    _durations_cache[log_file] = (mtime, durations)
+    return dict(durations)
+
+
+class RuntimeEstimator:
+    """
+    estimate the time of each command of a command list
+
+    PARAMETERS
+
+    durations *dict* :
+        Times (s), as from ``plan_durations()``.
+        (default: ``plan_durations()``)
+    mode *str* :
+        Technique (``USAXS``, ``SAXS``, or ``WAXS``) in the beam at the
+        start, or ``None`` if not known.  (default: ``None``)
+    usaxs_plan *str* :
+        ``Flyscan`` or ``USAXSscanStep``, as ``USAXSscan()`` will run.
+        (default: ``Flyscan``)
+    tune_scans *int* :
+        Tune after this many scans.  (default: ``None``, never)
+    tune_interval *float* :
+        Tune after this many seconds.  (default: ``None``, never)
+    scans_since_tune *int* :
+        Scans since the last tune, at the start.  (default: 0)
+    time_since_tune *float* :
+        Seconds since the last tune, at the start.  (default: 0)
+    """
+
+    def __init__(
+        self,
+        durations=None,
+        mode=None,
+        usaxs_plan="Flyscan",
+        tune_scans=None,
+        tune_interval=None,
+        scans_since_tune=0,
+        time_since_tune=0,
+    ):
+        self.durations = durations or plan_durations()
+        self.mode = mode
+        self.usaxs_plan = usaxs_plan
+        self.tune_scans = tune_scans
+        self.tune_interval = tune_interval
+        self.scans_since_tune = scans_since_tune
+        self.time_since_tune = time_since_tune
+
+    def _tune_due(self, scans, elapsed):
+        return (
+            (self.tune_scans is not None and scans > self.tune_scans)
+            or (self.tune_interval is not None and elapsed > self.tune_interval)
+        )
+
+    def estimate(self, commands):
+        """
+        estimated time of each command, in order
+
+        Returns list of dictionaries: ``seconds``, ``mode_change``
+        (bool), ``tune`` (bool, a preUSAXStune is expected first).
+        """
+        d = self.durations
+        scan_time = dict(
+            USAXS=d[self.usaxs_plan],
+            SAXS=d["SAXS"],
+            WAXS=d["WAXS"],
+        )
+        mode = self.mode
+        scans = self.scans_since_tune
+        t = 0                               # since the start
+        t_tune = -self.time_since_tune      # of the last tune
+        results = []
+        for command in commands:
+            action = str(command[0]).lower()
+            technique = SCAN_TECHNIQUES.get(action)
+            seconds = 0
+            tune = False
+            new_mode = technique or MODE_TECHNIQUES.get(action)
+            if technique is not None:
+                # USAXS scans change mode before before_plan(), others after
+                tune_mode = technique if technique == "USAXS" else mode
+                if tune_mode == "USAXS" and self._tune_due(scans, t - t_tune):
+                    tune = True
+                    seconds += d["preusaxstune"]
+                seconds += scan_time[technique]
+            elif action in TUNE_PLANS.values():
+                tune = True
+                seconds += d[action]
+                new_mode = "USAXS"
+            else:
+                seconds += d.get(action, 0)
+            mode_change = new_mode is not None and new_mode != mode
+            if mode_change:
+                seconds += d["mode_change"]
+            if tune:
+                scans = 0
+                t_tune = t + seconds - scan_time.get(technique, 0)
+            if technique is not None:
+                scans += SCAN_WEIGHTS[technique]
+            mode = new_mode or mode
+            t += seconds
+            results.append(dict(seconds=seconds, mode_change=mode_change, tune=tune))
+        return results
+
+    def total(self, commands):
+        """estimated time (s) of the command list"""
+        return sum(r["seconds"] for r in self.estimate(commands))
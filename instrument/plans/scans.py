@@ -55,6 +55,7 @@ from ..devices import waxsx, waxs_det
 from ..devices.suspenders import suspend_BeamInHutch
 from ..framework import bec, RE, specwriter
 from ..utils.cleanup_text import cleanupText
+from ..utils.plan_profiler import plan_profiler
 from ..utils.setup_new_user import techniqueSubdirectory
 from ..utils.user_sample_title import getSampleTitle
 from .area_detector import areaDetectorAcquire
@@ -69,6 +70,7 @@ from .requested_stop import IfRequestedStopBeforeNextScan
 from .sample_imaging import record_sample_image_on_demand
 from .sample_transmission import measure_SAXS_Transmission
 from .sample_transmission import measure_USAXS_Transmission
+from .tune_orchestrator import orchestrated_tune
 from .uascan import uascan
 from ..utils.a2q_q2a import angle2q, q2angle
 
@@ -78,6 +80,7 @@ AD_FILE_TEMPLATE = "%s%s_%4.4d.hdf"
 LOCAL_FILE_TEMPLATE = "%s_%04d.hdf"
 MASTER_TIMEOUT = 60
 user_override.register("useDynamicTime")
+user_override.register("useUascanPipeline")
 
 # Make sure these are not staged. For acquire_time,
 # any change > 0.001 s takes ~0.5 s for Pilatus to complete!
@@ -86,6 +89,7 @@ DO_NOT_STAGE_THESE_KEYS___THEY_ARE_SET_IN_EPICS = """
 """.split()
 
 
+@plan_profiler.profiled("preUSAXStune")
 def preUSAXStune(md={}):
     """
     tune the USAXS optics *only* if in USAXS mode
@@ -149,28 +153,41 @@ def preUSAXStune(md={}):
 
     # now, tune the desired axes, bail out if a tune fails
     yield from bps.install_suspender(suspend_BeamInHutch)
-    for axis, tune in tuners.items():
+    if terms.preUSAXStune.use_orchestrator.get():
+        # tune a2rp one more time as final step, skipped if still in tune
+        tune_list = list(tuners.items()) + [(a_stage.r2p, tune_a2rp)]
+        results = yield from orchestrated_tune(tune_list, md=md)
+        for entry in results:
+            if not entry["tune_ok"]:
+                logger.warning("!!! tune failed for axis %s !!!", entry["axis"])
+                if NOTIFY_ON_BADTUNE:
+                    email_notices.send(
+                        f"USAXS tune failed for axis {entry['axis']}",
+                        f"USAXS tune failed for axis {entry['axis']}"
+                        )
+    else:
+        for axis, tune in tuners.items():
+            yield from bps.mv(ti_filter_shutter, "open", timeout=MASTER_TIMEOUT)
+            yield from tune(md=md)
+            if not axis.tuner.tune_ok:
+                logger.warning("!!! tune failed for axis %s !!!", axis.name)
+                if NOTIFY_ON_BADTUNE:
+                    email_notices.send(
+                        f"USAXS tune failed for axis {axis.name}",
+                        f"USAXS tune failed for axis {axis.name}"
+                        )
+
+            # If we don't wait, the next tune often fails
+            # intensity stays flat, statistically
+            # We need to wait a short bit to allow EPICS database
+            # to complete processing and report back to us.
+            yield from bps.sleep(1)
+        # tune a2rp one more time as final step, we will see if it is needed...  
         yield from bps.mv(ti_filter_shutter, "open", timeout=MASTER_TIMEOUT)
-        yield from tune(md=md)
+        yield from tune_a2rp(md=md)
         if not axis.tuner.tune_ok:
-            logger.warning("!!! tune failed for axis %s !!!", axis.name)
-            if NOTIFY_ON_BADTUNE:
-                email_notices.send(
-                    f"USAXS tune failed for axis {axis.name}",
-                    f"USAXS tune failed for axis {axis.name}"
-                    )
-
-        # If we don't wait, the next tune often fails
-        # intensity stays flat, statistically
-        # We need to wait a short bit to allow EPICS database
-        # to complete processing and report back to us.
+            logger.warning("!!! tune failed for axis %s !!!", "a2rp")
         yield from bps.sleep(1)
-    # tune a2rp one more time as final step, we will see if it is needed...  
-    yield from bps.mv(ti_filter_shutter, "open", timeout=MASTER_TIMEOUT)
-    yield from tune_a2rp(md=md)
-    if not axis.tuner.tune_ok:
-        logger.warning("!!! tune failed for axis %s !!!", "a2rp")
-    yield from bps.sleep(1)
     yield from bps.remove_suspender(suspend_BeamInHutch)
 
     logger.info("USAXS count time: %s second(s)", terms.USAXS.usaxs_time.get())
@@ -185,6 +202,7 @@ def preUSAXStune(md={}):
     )
     yield from user_data.set_state_plan("pre-USAXS optics tune")
 
+@plan_profiler.profiled("allUSAXStune")
 def allUSAXStune(md={}):
     """
     tune mr, ar, a2rp, ar, a2rp USAXS optics
@@ -367,6 +385,7 @@ def USAXSscan(x, y, thickness_mm, title, md=None):
         yield from USAXSscanStep(x, y, thickness_mm, title, md=_md)
 
 
+@plan_profiler.profiled("USAXSscanStep")
 def USAXSscanStep(pos_X, pos_Y, thickness, scan_title, md=None):
     """
     general scan macro for step USAXS for both 1D & 2D collimation
@@ -378,22 +397,22 @@ def USAXSscanStep(pos_X, pos_Y, thickness, scan_title, md=None):
 
     yield from IfRequestedStopBeforeNextScan()
 
-    yield from mode_USAXS()
+    yield from plan_profiler.phase("mode change", mode_USAXS())
 
-    yield from bps.mv(
+    yield from plan_profiler.phase("slits", bps.mv(
         usaxs_slit.v_size, terms.SAXS.usaxs_v_size.get(),
         usaxs_slit.h_size, terms.SAXS.usaxs_h_size.get(),
         guard_slit.v_size, terms.SAXS.usaxs_guard_v_size.get(),
         guard_slit.h_size, terms.SAXS.usaxs_guard_h_size.get(),
         timeout=MASTER_TIMEOUT,
-    )
-    yield from before_plan()
+    ))
+    yield from plan_profiler.phase("before_plan", before_plan())
 
-    yield from bps.mv(
+    yield from plan_profiler.phase("sample move", bps.mv(
         s_stage.x, pos_X,
         s_stage.y, pos_Y,
         timeout=MASTER_TIMEOUT,
-    )
+    ))
 
     # Update Sample name.  getSampleTitle is used to create proper sample name. It may add time and temperature
     #   therefore it needs to be done close to real data collection, after mode chaneg and optional tuning.
@@ -451,7 +470,7 @@ def USAXSscanStep(pos_X, pos_Y, thickness, scan_title, md=None):
 
     # measure transmission values using pin diode if desired
     yield from bps.install_suspender(suspend_BeamInHutch)
-    yield from measure_USAXS_Transmission(md=_md)
+    yield from plan_profiler.phase("transmission", measure_USAXS_Transmission(md=_md))
 
     yield from bps.mv(
         monochromator.feedback.on, MONO_FEEDBACK_OFF,
@@ -476,7 +495,7 @@ def USAXSscanStep(pos_X, pos_Y, thickness, scan_title, md=None):
         ti_filter_shutter, "open",
         timeout=MASTER_TIMEOUT,
     )
-    yield from autoscale_amplifiers([upd_controls, I0_controls, I00_controls])
+    yield from plan_profiler.phase("autoscale", autoscale_amplifiers([upd_controls, I0_controls, I00_controls]))
 
     yield from user_data.set_state_plan("Running USAXS step scan")
 
@@ -523,7 +542,10 @@ def USAXSscanStep(pos_X, pos_Y, thickness, scan_title, md=None):
     use_dynamic_time = user_override.pick(
         "useDynamicTime", terms.USAXS.useDynamicTime.get()
     )
-    yield from uascan(
+    use_pipeline = user_override.pick(
+        "useUascanPipeline", terms.USAXS.useUascanPipeline.get()
+    )
+    yield from plan_profiler.phase("acquire", uascan(
         startAngle,
         terms.USAXS.ar_val_center.get(),
         endAngle,
@@ -536,8 +558,9 @@ def USAXSscanStep(pos_X, pos_Y, thickness, scan_title, md=None):
         terms.USAXS.AX0.get(),
         terms.USAXS.SAD.get(),
         useDynamicTime=use_dynamic_time,
+        pipelined=use_pipeline,
         md=_md
-    )
+    ))
     bec.enable_plots()
 
     yield from bps.mv(
@@ -579,9 +602,10 @@ def USAXSscanStep(pos_X, pos_Y, thickness, scan_title, md=None):
     # FS_disableASRP
 
     # measure_USAXS_PD_dark_currents    # used to be here, not now
-    yield from after_plan(weight=3)
+    yield from plan_profiler.phase("after_plan", after_plan(weight=3))
 
 
+@plan_profiler.profiled("Flyscan")
 def Flyscan(pos_X, pos_Y, thickness, scan_title, md=None):
     """
     do one USAXS Fly Scan
@@ -594,22 +618,22 @@ def Flyscan(pos_X, pos_Y, thickness, scan_title, md=None):
 
     yield from IfRequestedStopBeforeNextScan()
 
-    yield from mode_USAXS()
+    yield from plan_profiler.phase("mode change", mode_USAXS())
 
-    yield from bps.mv(
+    yield from plan_profiler.phase("slits", bps.mv(
         usaxs_slit.v_size, terms.SAXS.usaxs_v_size.get(),
         usaxs_slit.h_size, terms.SAXS.usaxs_h_size.get(),
         guard_slit.v_size, terms.SAXS.usaxs_guard_v_size.get(),
         guard_slit.h_size, terms.SAXS.usaxs_guard_h_size.get(),
         timeout=MASTER_TIMEOUT,
-    )
-    yield from before_plan()
+    ))
+    yield from plan_profiler.phase("before_plan", before_plan())
 
-    yield from bps.mv(
+    yield from plan_profiler.phase("sample move", bps.mv(
         s_stage.x, pos_X,
         s_stage.y, pos_Y,
         timeout=MASTER_TIMEOUT,
-    )
+    ))
 
     # Update Sample name. getSampleTitle is used to create proper sample name. It may add time and temperature
     #   therefore it needs to be done close to real data collection, after mode chaneg and optional tuning.
@@ -683,7 +707,7 @@ def Flyscan(pos_X, pos_Y, thickness, scan_title, md=None):
     usaxs_flyscan.saveFlyData_HDF5_dir = flyscan_path
     usaxs_flyscan.saveFlyData_HDF5_file = flyscan_file_name
     yield from bps.install_suspender(suspend_BeamInHutch)
-    yield from measure_USAXS_Transmission(md=_md)
+    yield from plan_profiler.phase("transmission", measure_USAXS_Transmission(md=_md))
 
     yield from bps.mv(
         monochromator.feedback.on, MONO_FEEDBACK_OFF,
@@ -708,7 +732,7 @@ def Flyscan(pos_X, pos_Y, thickness, scan_title, md=None):
         ti_filter_shutter, "open",
         timeout=MASTER_TIMEOUT,
     )
-    yield from autoscale_amplifiers([upd_controls, I0_controls, I00_controls])
+    yield from plan_profiler.phase("autoscale", autoscale_amplifiers([upd_controls, I0_controls, I00_controls]))
 
 
     FlyScanAutoscaleTime = 0.025
@@ -769,7 +793,7 @@ def Flyscan(pos_X, pos_Y, thickness, scan_title, md=None):
 
     yield from record_sample_image_on_demand("usaxs", scan_title_clean, _md)
 
-    yield from usaxs_flyscan.plan(md=_md)        # DO THE FLY SCAN
+    yield from plan_profiler.phase("acquire", usaxs_flyscan.plan(md=_md))        # DO THE FLY SCAN
 
     yield from bps.mv(
         user_data.scanning, "no",          # for sure, we are not scanning now
@@ -822,11 +846,12 @@ def Flyscan(pos_X, pos_Y, thickness, scan_title, md=None):
     # FS_disableASRP
 
     # measure_USAXS_PD_dark_currents    # used to be here, not now
-    yield from after_plan(weight=3)
+    yield from plan_profiler.phase("after_plan", after_plan(weight=3))
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
+@plan_profiler.profiled("SAXS")
 def SAXS(pos_X, pos_Y, thickness, scan_title, md=None):
     """
     collect SAXS data
@@ -836,12 +861,12 @@ def SAXS(pos_X, pos_Y, thickness, scan_title, md=None):
 
     yield from IfRequestedStopBeforeNextScan()
 
-    yield from before_plan()    # MUST come before mode_SAXS since it might tune
+    yield from plan_profiler.phase("before_plan", before_plan())    # MUST come before mode_SAXS since it might tune
 
-    yield from mode_SAXS()
+    yield from plan_profiler.phase("mode change", mode_SAXS())
 
     pinz_target = terms.SAXS.z_in.get() + constants["SAXS_PINZ_OFFSET"]
-    yield from bps.mv(
+    yield from plan_profiler.phase("slits", bps.mv(
         usaxs_slit.v_size, terms.SAXS.v_size.get(),
         usaxs_slit.h_size, terms.SAXS.h_size.get(),
         guard_slit.v_size, terms.SAXS.guard_v_size.get(),
@@ -851,13 +876,13 @@ def SAXS(pos_X, pos_Y, thickness, scan_title, md=None):
         terms.SAXS.collecting, 1,
         # user_data.collection_in_progress, 1,
         timeout=MASTER_TIMEOUT,
-    )
+    ))
 
-    yield from bps.mv(
+    yield from plan_profiler.phase("sample move", bps.mv(
         s_stage.x, pos_X,
         s_stage.y, pos_Y,
         timeout=MASTER_TIMEOUT,
-    )
+    ))
 
     # Update Sample name. getSampleTitle is used to create proper sample name. It may add time and temperature
     #   therefore it needs to be done close to real data collection, after mode chaneg and optional tuning.
@@ -923,8 +948,8 @@ def SAXS(pos_X, pos_Y, thickness, scan_title, md=None):
     @restorable_stage_sigs([saxs_det.cam, saxs_det.hdf1])
     @bpp.suspend_decorator(suspend_BeamInHutch)
     def _image_acquisition_steps(): 
-        yield from measure_SAXS_Transmission()
-        yield from insertSaxsFilters()
+        yield from plan_profiler.phase("transmission", measure_SAXS_Transmission())
+        yield from plan_profiler.phase("filters", insertSaxsFilters())
 
         yield from bps.mv(
             mono_shutter, "open",
@@ -944,7 +969,7 @@ def SAXS(pos_X, pos_Y, thickness, scan_title, md=None):
         saxs_det.hdf1.stage_sigs["blocking_callbacks"] = "No"
 
         yield from bps.sleep(0.2)
-        yield from autoscale_amplifiers([I0_controls])
+        yield from plan_profiler.phase("autoscale", autoscale_amplifiers([I0_controls]))
 
         yield from bps.mv(
             ti_filter_shutter, "close",
@@ -978,7 +1003,7 @@ def SAXS(pos_X, pos_Y, thickness, scan_title, md=None):
         # )
 
         yield from record_sample_image_on_demand("saxs", scan_title_clean, _md)
-        yield from areaDetectorAcquire(saxs_det, create_directory=-5, md=_md)
+        yield from plan_profiler.phase("acquire", areaDetectorAcquire(saxs_det, create_directory=-5, md=_md))
 
     yield from _image_acquisition_steps()
 
@@ -999,12 +1024,13 @@ def SAXS(pos_X, pos_Y, thickness, scan_title, md=None):
     )
     yield from user_data.set_state_plan("Done SAXS")
     logger.info(f"I0 value: {terms.SAXS_WAXS.I0.get()}")
-    yield from after_plan()
+    yield from plan_profiler.phase("after_plan", after_plan())
 
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 
+@plan_profiler.profiled("WAXS")
 def WAXS(pos_X, pos_Y, thickness, scan_title, md=None):
     """
     collect WAXS data
@@ -1014,11 +1040,11 @@ def WAXS(pos_X, pos_Y, thickness, scan_title, md=None):
 
     yield from IfRequestedStopBeforeNextScan()
 
-    yield from before_plan()    # MUST come before mode_WAXS since it might tune
+    yield from plan_profiler.phase("before_plan", before_plan())    # MUST come before mode_WAXS since it might tune
 
-    yield from mode_WAXS()
+    yield from plan_profiler.phase("mode change", mode_WAXS())
 
-    yield from bps.mv(
+    yield from plan_profiler.phase("slits", bps.mv(
         usaxs_slit.v_size, terms.SAXS.v_size.get(),
         usaxs_slit.h_size, terms.SAXS.h_size.get(),
         guard_slit.v_size, terms.SAXS.guard_v_size.get(),
@@ -1027,13 +1053,13 @@ def WAXS(pos_X, pos_Y, thickness, scan_title, md=None):
         terms.WAXS.collecting, 1,
         #user_data.collection_in_progress, 1,
         timeout=MASTER_TIMEOUT,
-    )
+    ))
 
-    yield from bps.mv(
+    yield from plan_profiler.phase("sample move", bps.mv(
         s_stage.x, pos_X,
         s_stage.y, pos_Y,
         timeout=MASTER_TIMEOUT,
-    )
+    ))
 
     # Update Sample name.  getSampleTitle is used to create proper sample name. It may add time and temperature
     #   therefore it needs to be done close to real data collection, after mode chaneg and optional tuning.
@@ -1100,7 +1126,7 @@ def WAXS(pos_X, pos_Y, thickness, scan_title, md=None):
     @bpp.suspend_decorator(suspend_BeamInHutch)
     def _image_acquisition_steps(): 
         #yield from measure_SAXS_Transmission()
-        yield from insertWaxsFilters()
+        yield from plan_profiler.phase("filters", insertWaxsFilters())
 
         yield from bps.mv(
             mono_shutter, "open",
@@ -1120,7 +1146,7 @@ def WAXS(pos_X, pos_Y, thickness, scan_title, md=None):
         waxs_det.hdf1.stage_sigs["blocking_callbacks"] = "No"
 
         yield from bps.sleep(0.2)
-        yield from autoscale_amplifiers([I0_controls, trd_controls])
+        yield from plan_profiler.phase("autoscale", autoscale_amplifiers([I0_controls, trd_controls]))
 
         yield from bps.mv(
             ti_filter_shutter, "close",
@@ -1153,7 +1179,7 @@ def WAXS(pos_X, pos_Y, thickness, scan_title, md=None):
 
         yield from record_sample_image_on_demand("waxs", scan_title_clean, _md)
 
-        yield from areaDetectorAcquire(waxs_det, create_directory=-5, md=_md)
+        yield from plan_profiler.phase("acquire", areaDetectorAcquire(waxs_det, create_directory=-5, md=_md))
 
     yield from _image_acquisition_steps()
 
@@ -1180,4 +1206,4 @@ def WAXS(pos_X, pos_Y, thickness, scan_title, md=None):
     yield from user_data.set_state_plan("Done WAXS")
 
     logger.info(f"I0 value: {terms.SAXS_WAXS.I0.get()}")
-    yield from after_plan()
+    yield from plan_profiler.phase("after_plan", after_plan())
@@ -15,7 +15,6 @@ import logging
 logger = logging.getLogger(__name__)
 logger.info(__file__)
 
-from apstools.plans import TuneAxis
 from bluesky import plan_stubs as bps
 from bluesky.utils import FailedStatus
 from collections import defaultdict
@@ -25,6 +24,7 @@ import pyRestTable
 
 from ..devices import autoscale_amplifiers, upd_controls, I0_controls, I00_controls
 from ..devices import guard_slit, usaxs_slit
+from ..devices.axis_tuning_patches import UsaxsTuneAxis
 from ..devices import monochromator, MONO_FEEDBACK_OFF, MONO_FEEDBACK_ON
 from ..devices import scaler0
 from ..devices import terms
@@ -33,6 +33,7 @@ from ..devices import UPD_SIGNAL
 from ..devices import user_data
 from ..framework import RE
 from ..utils.derivative import numerical_derivative
+from ..utils.edge_fit import edge_scan
 from ..utils.peak_centers import peak_center
 from .filters import insertTransmissionFilters
 from .mode_changes import mode_USAXS
@@ -86,7 +87,7 @@ def tune_GslitsCenter():
         scaler0.select_channels([UPD_SIGNAL.chname.get()])
         scaler0.channels.chan01.kind = Kind.config
 
-        tuner = TuneAxis([scaler0], motor, signal_name=UPD_SIGNAL.chname.get())
+        tuner = UsaxsTuneAxis([scaler0], motor, signal_name=UPD_SIGNAL.chname.get())
         yield from tuner.tune(width=-width, num=steps+1)
 
         bluesky_runengine_running = RE.state != "idle"
@@ -215,7 +216,7 @@ def _USAXS_tune_guardSlits():
         scaler0.select_channels([UPD_SIGNAL.chname.get()])
         scaler0.channels.chan01.kind = Kind.config
 
-        tuner = TuneAxis([scaler0], axis, signal_name=UPD_SIGNAL.chname.get())
+        tuner = UsaxsTuneAxis([scaler0], axis, signal_name=UPD_SIGNAL.chname.get())
         yield from tuner.tune(width=scan_width, num=steps+1)
 
         diff = abs(tuner.peaks.y_data[0] - tuner.peaks.y_data[-1])
@@ -255,44 +256,98 @@ def _USAXS_tune_guardSlits():
         results["width"] = width
         results["position"] = position
 
+    def tune_blade_edges_fitted(blades, num_points, ct_time, results):
+        """
+        find the blade edges with fewer points, fitting an edge model
+
+        Each move of a blade back to its position before its scan is
+        made together with the move of the next blade to the start of
+        its scan.  (Two motors at once, not all four.)  A blade whose
+        edge fit fails is scanned in fixed steps (``tune_blade_edge()``).
+        """
+        old_ct_time = scaler0.preset_time.get()
+        scaler0.select_channels([UPD_SIGNAL.chname.get()])
+        scaler0.channels.chan01.kind = Kind.config
+        yield from bps.mv(scaler0.preset_time, ct_time)
+
+        table = pyRestTable.Table()
+        table.labels = "blade method edge +/-(95%) width points".split()
+        pending = []    # move of the previous blade back to its position
+        for i, (key, label, axis, start, end) in enumerate(blades, start=1):
+            logger.info(f"*** {i}. tune {label} guard slits (edge fit)")
+            old_position = axis.position
+            yield from bps.mv(*pending, axis, start)
+            pending = [axis, old_position]
+
+            result = yield from edge_scan(
+                [scaler0], axis, start, end,
+                signal_name=UPD_SIGNAL.chname.get(),
+                max_points=guard_slit.edge_fit_max_points,
+            )
+
+            diff = abs(result["y"][0] - result["y"][1])
+            if diff < guard_slit.tuning_intensity_threshold:
+                msg = f"{axis.name}: Not enough intensity change from first to last point."
+                msg += f" {diff} < {guard_slit.tuning_intensity_threshold}."
+                msg += "  Did the guard slit move far enough to move into/out of the beam?"
+                msg += "  Not tuning this axis."
+                yield from cleanup(msg)
+
+            if result["method"] == "bisection":
+                logger.warning(f"{axis.name}: edge fit failed, scanning in fixed steps")
+                yield from bps.mv(*pending)
+                pending = []
+                yield from tune_blade_edge(axis, start, end, num_points, ct_time, results[key])
+                table.addRow((label, "fixed step", results[key]["position"], "", "", num_points + 1))
+                continue
+
+            results[key]["position"] = result["edge"]
+            results[key]["width"] = result["width"] * guard_slit.scale_factor   # expand a bit
+            results[key]["confidence"] = result["confidence"]
+            table.addRow((
+                label,
+                result["method"],
+                result["edge"],
+                result["confidence"],
+                result["width"],
+                result["points"],
+            ))
+
+        yield from bps.mv(*pending, scaler0.preset_time, old_ct_time)
+        logger.info("guard slit blade edges\n%s", table)
+
     tunes = defaultdict(dict)
     count_time = 0.2
     num_points = 100
-    logger.info("*** 1. tune top guard slits")
-    yield from tune_blade_edge(
-        guard_slit.top,
-        original_position["top"] + v_step_away,
-        original_position["top"] - v_step_into,
-        num_points,
-        count_time,
-        tunes["top"])
-
-    logger.info("*** 2. tune bottom guard slits")
-    yield from tune_blade_edge(
-        guard_slit.bot,
-        original_position["bot"] - v_step_away,
-        original_position["bot"] + v_step_into,
-        num_points,
-        count_time,
-        tunes["bot"])
-
-    logger.info("*** 3. tune outboard guard slits")
-    yield from tune_blade_edge(
-        guard_slit.outb,
-        original_position["out"] + h_step_away,
-        original_position["out"] - h_step_into,
-        num_points,
-        count_time,
-        tunes["out"])
-
-    logger.info("*** 4. tune inboard guard slits")
-    yield from tune_blade_edge(
-        guard_slit.inb,
-        original_position["inb"] - h_step_away,
-        original_position["inb"] + h_step_into,
-        num_points,
-        count_time,
-        tunes["inb"])
+    blades = (
+        # key, label, axis, start (out of the beam), end (into the beam)
+        (
+            "top", "top", guard_slit.top,
+            original_position["top"] + v_step_away,
+            original_position["top"] - v_step_into,
+        ),
+        (
+            "bot", "bottom", guard_slit.bot,
+            original_position["bot"] - v_step_away,
+            original_position["bot"] + v_step_into,
+        ),
+        (
+            "out", "outboard", guard_slit.outb,
+            original_position["out"] + h_step_away,
+            original_position["out"] - h_step_into,
+        ),
+        (
+            "inb", "inboard", guard_slit.inb,
+            original_position["inb"] - h_step_away,
+            original_position["inb"] + h_step_into,
+        ),
+    )
+    if guard_slit.tuning_method == "edge fit":
+        yield from tune_blade_edges_fitted(blades, num_points, count_time, tunes)
+    else:
+        for i, (key, label, axis, start, end) in enumerate(blades, start=1):
+            logger.info(f"*** {i}. tune {label} guard slits")
+            yield from tune_blade_edge(axis, start, end, num_points, count_time, tunes[key])
 
     # Tuning is done, now move the motors to the center of the beam found
     yield from bps.mv(
@@ -0,0 +1,278 @@
+"""
+tune several optical axes in one pass, as in preUSAXStune()
+
+Compared with tuning each axis on its own:
+
+* One autoscale of the amplifiers on ``scaler0`` is shared by all axes.
+* Axes tuned within ``TUNE_SKIP_AGE`` are checked with a single
+  count at the tuned position.  The tune is skipped if the signal
+  (normalized by amplifier gain) is still within ``TUNE_SKIP_FRACTION``
+  of the peak from the last tune.  (``terms.preUSAXStune.epoch_last_tune``
+  has no per-axis peak to compare with, so the per-axis
+  ``tune_history`` of this session is used.)
+* Scans go coarse-to-fine: a coarse scan with fewer points over the
+  full tune width, then a fine scan over a few FWHM about that peak.
+  An axis tuned before in this session starts with the fine scan.
+  If the coarse scan finds no peak, the standard tune scan is run.
+* The shared autoscale is done before any axis is at its peak.  If the
+  peak of a scan reaches the top of the amplifier range (the count rate
+  at which the amplifier would change to a lower gain), the amplifier
+  is autoscaled again, at the peak, and the coarse scan repeated.
+
+Each axis tuned is recorded in ``tune_history``, with an estimate of
+the time saved compared with the standard tune.
+"""
+
+__all__ = """
+    orchestrated_tune
+    tune_history
+    tune_report
+""".split()
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from bluesky import plan_stubs as bps
+from ophyd.utils import OrderedDefaultDict
+import math
+import pyRestTable
+import time
+
+from ..devices import autoscale_amplifiers, upd_controls, I0_controls, I00_controls
+from ..devices.scalers import scaler0
+from ..devices.shutters import mono_shutter, ti_filter_shutter
+
+
+TUNE_SKIP_AGE = 15 * 60     # s, only recent tunes may be skipped
+TUNE_SKIP_FRACTION = 0.9    # of (peak max / gain) at the last tune
+TUNE_COARSE_FRACTION = 0.4  # coarse scan points, fraction of tuner.num
+TUNE_FINE_FRACTION = 0.5    # fine scan points, fraction of tuner.num
+TUNE_FINE_FWHM = 4          # fine scan width, in FWHM of the peak
+TUNE_MIN_POINTS = 9
+TUNE_SETTLE_TIME = 1        # s, after a tune, let EPICS finish processing
+
+tune_history = OrderedDefaultDict(list)     # by axis name
+
+
+def _control_for_(axis):
+    """the amplifier controls of the axis tuner's signal, or None"""
+    for control in (upd_controls, I0_controls, I00_controls):
+        if control.signal.chname.get() == axis.tuner.signal_name:
+            return control
+
+
+def _still_in_tune_(axis, now):
+    """plan: count once at the tuned position, is the peak still there?"""
+    history = tune_history.get(axis.name)
+    control = _control_for_(axis)
+    if not history or control is None:
+        return False
+    last = history[-1]
+    if (
+        not last["tune_ok"]
+        or last["peak_per_gain"] is None
+        or now - last["time_tuned"] > TUNE_SKIP_AGE
+        or abs(axis.position - last["center"]) > abs(last["fwhm"] or 0) / 4
+    ):
+        return False
+
+    yield from bps.mv(
+        scaler0.preset_time, last["count_time"],
+        scaler0.count_mode, "OneShot",
+    )
+    yield from bps.trigger(scaler0, wait=True)
+    value = control.signal.s.get() / control.femto.gain.get()
+    yield from bps.mv(scaler0.count_mode, "AutoCount")
+
+    ok = value >= TUNE_SKIP_FRACTION * last["peak_per_gain"]
+    logger.info(
+        "%s: signal/gain=%g, at last tune=%g, still in tune: %s",
+        axis.name, value, last["peak_per_gain"], ok
+    )
+    return ok
+
+
+def _peak_at_ceiling_(axis):
+    """True if the last tune's peak reached the top of the amplifier range"""
+    tuner = axis.tuner
+    control = _control_for_(axis)
+    if control is None or tuner.peaks is None or tuner.peaks.max is None:
+        return False
+    rate = tuner.peaks.max[-1] / scaler0.preset_time.get()
+    ceiling = min(control.auto.gainD.get(), control.auto.max_count_rate.get())
+    if rate < ceiling:
+        return False
+    logger.info(
+        "%s: peak count rate %g at the top of the %s range (%g), autoscale",
+        axis.name, rate, control.nickname, ceiling
+    )
+    return True
+
+
+def _autoscale_at_peak_(axis):
+    """plan: autoscale the amplifier of the axis, the axis is at its peak"""
+    yield from autoscale_amplifiers([_control_for_(axis)])
+
+
+def _centered_(tuner, width):
+    """True if the last tune found a peak in the middle half of its scan"""
+    if not tuner.tune_ok or len(tuner.stats) == 0:
+        return False
+    results = tuner.stats[-1]
+    offset = results.center.get() - results.initial_position.get()
+    return abs(offset) < abs(width) / 4
+
+
+def _fine_width_(width, fwhm):
+    if fwhm is None or not math.isfinite(fwhm) or fwhm <= 0:
+        return width / 2
+    return math.copysign(min(abs(width), TUNE_FINE_FWHM * fwhm), width)
+
+
+def _coarse_to_fine_(axis, tune, md):
+    """
+    plan: tune one axis, coarse-to-fine
+
+    returns (tune_ok, number of points, method)
+    """
+    tuner = axis.tuner
+    width, num = tuner.width, tuner.num
+    fine_num = max(TUNE_MIN_POINTS, int(num * TUNE_FINE_FRACTION))
+    coarse_num = max(TUNE_MIN_POINTS, int(num * TUNE_COARSE_FRACTION))
+    points = 0
+
+    history = tune_history.get(axis.name)
+    if history and history[-1]["tune_ok"]:
+        # tuned before: the peak is probably near, try the fine scan first
+        fine_width = _fine_width_(width, history[-1]["fwhm"])
+        yield from tune(md=md, autoscale=False, width=fine_width, num=fine_num)
+        points += fine_num
+        if _peak_at_ceiling_(axis):
+            yield from _autoscale_at_peak_(axis)
+        elif _centered_(tuner, fine_width):
+            return True, points, "fine"
+
+    yield from tune(md=md, autoscale=False, width=width, num=coarse_num)
+    points += coarse_num
+    if tuner.tune_ok and _peak_at_ceiling_(axis):
+        # the peak was clipped, the center and FWHM are not reliable
+        yield from _autoscale_at_peak_(axis)
+        yield from tune(md=md, autoscale=False, width=width, num=coarse_num)
+        points += coarse_num
+    if not tuner.tune_ok:
+        # nothing found, fall back to the standard tune
+        yield from tune(md=md)
+        return tuner.tune_ok, points + num, "standard"
+
+    fine_width = _fine_width_(width, tuner.peaks.fwhm)
+    yield from tune(md=md, autoscale=False, width=fine_width, num=fine_num)
+    points += fine_num
+    if not tuner.tune_ok:
+        # keep the coarse result, the axis was returned there
+        return True, points, "coarse"
+    return True, points, "coarse+fine"
+
+
+def _record_(axis, entry, autoscale_time):
+    """complete the entry with the peak and an estimate of the time saved"""
+    tuner = axis.tuner
+    control = _control_for_(axis)
+    history = tune_history[axis.name]
+
+    if entry["method"] == "skipped":
+        last = history[-1]
+        for key in "time_tuned center fwhm peak_per_gain count_time per_point".split():
+            entry[key] = last[key]
+    else:
+        entry["time_tuned"] = entry["time"]
+        entry["center"] = axis.position
+        entry["fwhm"] = getattr(tuner.peaks, "fwhm", None)
+        entry["count_time"] = scaler0.preset_time.get()
+        entry["peak_per_gain"] = None
+        if entry["tune_ok"] and control is not None and tuner.peaks.max is not None:
+            entry["peak_per_gain"] = tuner.peaks.max[-1] / control.femto.gain.get()
+        scan_time = entry["elapsed"] - TUNE_SETTLE_TIME
+        entry["per_point"] = scan_time / max(1, entry["points"])
+
+    # standard tune: autoscale, tuner.num points, settling time
+    per_point = entry["per_point"] or 0
+    standard = autoscale_time + tuner.num * per_point + TUNE_SETTLE_TIME
+    entry["saved"] = standard - entry["elapsed"]
+    history.append(entry)
+
+
+def orchestrated_tune(tuners, md={}, force=False):
+    """
+    plan: tune the axes in order, skipping those still in tune
+
+    PARAMETERS
+
+    tuners *list* :
+        ``(axis, tune_plan)`` pairs, in order.  The same axis may
+        appear more than once.  Each ``tune_plan`` (such as ``tune_ar``)
+        must accept keywords: ``md``, ``autoscale``, ``width``, ``num``.
+    force *bool* :
+        Tune every axis, even if still in tune.  (default: ``False``)
+
+    Returns the list of ``tune_history`` entries for this pass.
+    """
+    t0 = time.time()
+    yield from bps.mv(
+        mono_shutter, "open",
+        ti_filter_shutter, "open",
+    )
+    yield from autoscale_amplifiers([upd_controls, I0_controls, I00_controls])
+    autoscale_time = time.time() - t0
+
+    results = []
+    for axis, tune in tuners:
+        t_axis = time.time()
+        entry = dict(axis=axis.name, time=t_axis, tune_ok=True, points=0, method="skipped")
+        in_tune = False
+        if not force:
+            in_tune = yield from _still_in_tune_(axis, t_axis)
+        if not in_tune:
+            yield from bps.mv(ti_filter_shutter, "open")
+            ok, points, method = yield from _coarse_to_fine_(axis, tune, md)
+            entry.update(dict(tune_ok=ok, points=points, method=method))
+            # If we don't wait, the next tune often fails
+            # intensity stays flat, statistically
+            # We need to wait a short bit to allow EPICS database
+            # to complete processing and report back to us.
+            yield from bps.sleep(TUNE_SETTLE_TIME)
+        entry["elapsed"] = time.time() - t_axis
+        _record_(axis, entry, autoscale_time)
+        results.append(entry)
+
+    saved = sum(e["saved"] for e in results) - autoscale_time
+    logger.info(
+        "tuned %d axes in %.1f s, estimated %.1f s saved\n%s",
+        len(results), time.time() - t0, saved, tune_report(results, printing=False)
+    )
+    return results
+
+
+def tune_report(entries=None, printing=True):
+    """
+    table: results of orchestrated tunes (default: last of each axis)
+    """
+    if entries is None:
+        entries = [history[-1] for history in tune_history.values() if history]
+    table = pyRestTable.Table()
+    table.labels = "axis method ok? points center fwhm elapsed,s saved,s".split()
+    for e in entries:
+        table.addRow((
+            e["axis"],
+            e["method"],
+            e["tune_ok"],
+            e["points"],
+            e["center"],
+            e["fwhm"],
+            f"{e['elapsed']:.1f}",
+            f"{e['saved']:.1f}",
+        ))
+    if printing:
+        print(table)
+    return table
@@ -17,6 +17,8 @@ from bluesky import plan_stubs as bps
 from bluesky import preprocessors as bpp
 from collections import OrderedDict
 import math
+import numpy
+import time
 
 from ..usaxs_support.ustep import Ustep
 
@@ -47,16 +49,62 @@ from ..devices import user_data
 # Ustep(8.7474, 8.746588, 7.9, 200, 1, 0.000025)
 # uascan(8.7474, 8.746588, 7.9, 0.000025, 1, 200, 1, 12.83, 910, 0, 215)
 
+STATE_UPDATE_INTERVAL_S = 1.0   # pipelined: update user_data.state at most this often
+
+
+def uascan_targets(
+        ar_series, ar0, ax0, SAD_mm, dx0, SDD_mm, sy0, sy_step,
+        count_time_base, useDynamicTime,
+    ):
+    """
+    table of all target positions and count times for a uascan
+
+    Returns a dict of numpy arrays, one value for each point:
+    ``ar``, ``ax``, ``dx``, ``sy``, and ``count_time``.
+    The AX and DX stages track the scattered beam position.
+    """
+    ar = ar_series.series_array()
+    index = numpy.arange(len(ar))
+    angle = numpy.radians(ar - ar0)
+
+    if useDynamicTime:
+        fraction = index / ar_series.numPts
+        count_time = numpy.select(
+            [fraction < 0.33, fraction < 0.66],
+            [count_time_base / 3, count_time_base],
+            count_time_base * 2,
+        )
+    else:
+        count_time = numpy.full(len(ar), count_time_base, dtype=float)
+
+    return dict(
+        ar=ar,
+        ax=ax0 + SAD_mm * numpy.tan(angle),
+        dx=dx0 + SDD_mm * numpy.tan(angle),
+        sy=sy0 + index * sy_step,
+        count_time=count_time,
+    )
+
 
 def uascan(
         start, reference, finish, minStep,
         exponent, intervals, count_time,
         dx0, SDD_mm, ax0, SAD_mm,
         useDynamicTime=True,
+        pipelined=False,
         md={}
     ):
     """
     USAXS ascan (step size varies with distance from a reference point)
+
+    With ``pipelined=True``, the state string is updated at most every
+    ``STATE_UPDATE_INTERVAL_S`` seconds (without waiting for put-completion).
+    The readings of a point are made right after it is counted, before
+    the motors move: the UPD is in automatic mode, its autorange may
+    switch gain & range as soon as AR moves.
+
+    The dead time per point (all time not spent counting) is
+    logged at the end of the scan.
     """
     if intervals <= 0:
         raise ValueError(f"intervals must be >0, given: {intervals}")
@@ -178,47 +226,69 @@ def uascan(
     _md['ax0'] = ax0
     _md['SAD_mm'] = SAD_mm
     _md['useDynamicTime'] = str(useDynamicTime)
-
-    def _triangulate_(angle, dist):
-        """triangulate offset, given angle of rotation"""
-        return dist * math.tan(angle*math.pi/180)
+    _md['pipelined'] = str(pipelined)
+
+    timing = dict(dead_time=[], t_state=0)
+
+    def _state_(msg, i):
+        """plan: update user_data.state, throttled when pipelined"""
+        if not pipelined:
+            yield from user_data.set_state_plan(msg)
+            return
+        t = time.time()
+        last_point = i == intervals - 1
+        if i == 0 or last_point or t - timing["t_state"] >= STATE_UPDATE_INTERVAL_S:
+            timing["t_state"] = t
+            yield from user_data.set_state_plan(msg, confirm=False)
+
+    def _dead_time_summary_():
+        dead = numpy.array(timing["dead_time"])
+        if len(dead) == 0:
+            return ""
+        return (
+            f"uascan dead time: {dead.sum():.3f} s total"
+            f", {dead.mean():.4f} s/point mean"
+            f", {dead.max():.4f} s/point max"
+            f", {len(dead)} points"
+            f", pipelined={pipelined}"
+        )
 
     @bpp.run_decorator(md=_md)
     def _scan_():
-        count_time = count_time_base
-
         ar0 = terms.USAXS.center.AR.get()
         sy0 = s_stage.y.position
-        for i, target_ar in enumerate(ar_series.stepper()):
-
-            if useDynamicTime:
-                if i / intervals < 0.33:
-                    count_time = count_time_base / 3
-                elif i / intervals < 0.66:
-                    count_time = count_time_base
-                else:
-                    count_time = count_time_base * 2
-
-            # track ay & dy on scattered beam position
-            target_ax = ax0 + _triangulate_(target_ar-ar0, SAD_mm)
-            target_dx = dx0 + _triangulate_(target_ar-ar0, SDD_mm)
-
-            # re-position the sample before each step
-            target_sy = sy0 + i*terms.USAXS.sample_y_step.get()
+        targets = uascan_targets(
+            ar_series, ar0, ax0, SAD_mm, dx0, SDD_mm,
+            sy0, terms.USAXS.sample_y_step.get(),
+            count_time_base, useDynamicTime,
+        )
+        if terms.USAXS.useSBUSAXS.get():
+            # adjust the ASRP piezo on the AS side-bounce stage
+            tanBragg = math.tan(reference*math.pi/180)
+            cosScatAngle = numpy.cos(numpy.radians(reference - targets["ar"]))
+            diff = numpy.degrees(numpy.arctan(tanBragg/cosScatAngle)) - reference
+            # see the note on asrp adjustment in the non-pipelined loop
+            targets["asrp"] = asrp0 - diff/terms.usaxs.asrp_degrees_per_VDC.get()
+
+        if pipelined:
+            yield from _pipelined_scan_(targets)
+            return
+
+        for i, target_ar in enumerate(targets["ar"]):
+            t_point = time.time()
+            count_time = targets["count_time"][i]
 
             moves = [
                 a_stage.r, target_ar,
-                a_stage.x, target_ax,
-                d_stage.x, target_dx,
-                s_stage.y, target_sy,
+                a_stage.x, targets["ax"][i],
+                d_stage.x, targets["dx"][i],
+                s_stage.y, targets["sy"][i],
                 scaler0.preset_time, count_time
             ]
 
             if terms.USAXS.useSBUSAXS.get():
                 # adjust the ASRP piezo on the AS side-bounce stage
-                tanBragg = math.tan(reference*math.pi/180)
-                cosScatAngle = math.cos((reference-target_ar)*math.pi/180)
-                diff = math.atan(tanBragg/cosScatAngle)*180/math.pi - reference
+                # (diff computed in the table above)
 
                 # Note on asrp adjustment:  NOTE: seems wrong, but may need to be revisited???
                 #   use "-" when reflecting  inboard towards storage ring (single bounce setup)
@@ -228,8 +298,7 @@ def uascan(
                     ## verified experimentally - higher voltage on piezo = lower Bragg angle...
                 ## and we need to INCREASE the Bragg Angle with increasing Q, to correct for tilt down...
 
-                asrp_vdc = asrp0 - diff/terms.usaxs.asrp_degrees_per_VDC.get()
-                moves += [as_stage.rp, asrp_vdc]
+                moves += [as_stage.rp, targets["asrp"][i]]
 
             # added for fuel spray users as indication that we are counting...
             # moves += [fuel_spray_bit, 1]
@@ -244,14 +313,36 @@ def uascan(
 
             # collect data for the primary stream
             yield from addDeviceDataAsStream(read_devices, "primary")
+            timing["dead_time"].append(time.time() - t_point - count_time)
+
+    def _pipelined_scan_(targets):
+        sbusaxs = "asrp" in targets
+        t_previous = time.time()
+        for i, target_ar in enumerate(targets["ar"]):
+            count_time = targets["count_time"][i]
+            moves = [
+                a_stage.r, target_ar,
+                a_stage.x, targets["ax"][i],
+                d_stage.x, targets["dx"][i],
+                s_stage.y, targets["sy"][i],
+                scaler0.preset_time, count_time
+            ]
+            if sbusaxs:
+                moves += [as_stage.rp, targets["asrp"][i]]
 
-            if useDynamicTime:
-                if i < intervals/3:
-                    count_time = count_time_base / 2
-                elif intervals/3 <= i < intervals * 2/3:
-                    count_time = count_time_base
-                else:
-                    count_time = 2*count_time_base
+            yield from _state_(f"moving motors {i+1}/{intervals}", i)
+            yield from bps.mv(*moves)
+
+            # count
+            yield from _state_(f"counting {i+1}/{intervals}", i)
+            yield from bps.trigger(scaler0, group="uascan_count")   # start the scaler
+            yield from bps.wait(group="uascan_count")               # wait for the scaler
+
+            # collect data for the primary stream
+            yield from addDeviceDataAsStream(read_devices, "primary")
+            t = time.time()
+            timing["dead_time"].append(t - t_previous - count_time)
+            t_previous = t
 
     def _after_scan_():
         yield from bps.mv(
@@ -295,4 +386,7 @@ def uascan(
     # run the scan
     # TODO: implement try..except..else..finally stanza for error handling
     yield from _scan_()
+    summary = _dead_time_summary_()
+    if summary:
+        logger.info(summary)
     yield from _after_scan_()
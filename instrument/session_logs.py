@@ -9,7 +9,11 @@ __all__ = ['logger', ]
 # from apstools.utils import file_log_handler
 # from apstools.utils import setup_console_logging
 # from apstools.utils import stream_log_handler
+from ._log_utils import CONTROL_LAYER_BURST
+from ._log_utils import CONTROL_LAYER_RATE
 from ._log_utils import file_log_handler
+from ._log_utils import queued_log_handler
+from ._log_utils import RateLimitFilter
 from ._log_utils import setup_console_logging
 from ._log_utils import stream_log_handler
 
@@ -28,9 +32,12 @@ MB = 1024 * kB
 logger = logging.getLogger(SESSION_NAME)
 logger.setLevel(logging.DEBUG)  # allow any log content at this level
 logger.addHandler(stream_log_handler())
+# files are written by a listener thread (see _log_utils.log_queue_report())
 logger.addHandler(
-    file_log_handler(
-        SESSION_NAME, IPYTHON_LOGGER, maxBytes=1 * MB, backupCount=9
+    queued_log_handler(
+        file_log_handler(
+            SESSION_NAME, IPYTHON_LOGGER, maxBytes=1 * MB, backupCount=9
+        )
     )
 )
 setup_console_logging(logger)
@@ -76,11 +83,18 @@ for logger_name, level in log_these_names.items():
     _l = logging.getLogger(logger_name)
     _l.setLevel(logging.DEBUG)  # allow any log content at this level
     _l.addHandler(
-        file_log_handler(  # logger to a file
-            logger_name,
-            logger_name,
-            maxBytes=1 * MB,
-            backupCount=19,
-            level=level,  # filter reporting to this level
+        queued_log_handler(
+            file_log_handler(  # logger to a file
+                logger_name,
+                logger_name,
+                maxBytes=1 * MB,
+                backupCount=19,
+                level=level,  # filter reporting to this level
+            )
         )
     )
+
+# CA monitor events: at most CONTROL_LAYER_RATE records/s (on average)
+logging.getLogger("ophyd.control_layer").addFilter(
+    RateLimitFilter(CONTROL_LAYER_RATE, CONTROL_LAYER_BURST)
+)
@@ -5,9 +5,10 @@ conversion to utf-8 and from others
 :see: https://stackoverflow.com/questions/447107/what-is-the-difference-between-encode-decode
 """
 
+from ..utils.lazy_import import lazy_import
 
-from reportlab.lib.utils import asUnicode
-
+# reportlab: only when text_decode() is called
+reportlab_utils = lazy_import("reportlab.lib.utils")
 
 
 XML_CODEPOINT = 'ISO-8859-1'
@@ -25,7 +26,7 @@ def text_decode(source):
     :see: https://github.com/prjemian/assign_gup/issues/55
     :see: http://stackoverflow.com/questions/9942594/unicodeencodeerror-ascii-codec-cant-encode-character-u-xa0-in-position-20
     """
-    return asUnicode(source)
+    return reportlab_utils.asUnicode(source)
 
 # from reportlab.lib.utils import asUnicode # sorts out py2 or py3
 #     def asUnicode(v,enc='utf8'):
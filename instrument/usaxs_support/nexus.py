@@ -7,10 +7,12 @@ PUBLIC FUNCTIONS
 
     ~get_manager
     ~reset_manager
+    ~clear_layout_cache
 
 INTERNAL
 
     ~NeXus_Structure
+    ~layout_cache_key
     ~getGroupObjectByXmlNode
     ~Field_Specification
     ~Group_Specification
@@ -20,14 +22,15 @@ INTERNAL
 
 """
 
+import hashlib
 import logging
 import os
 # ensure we have a location for the libca (& libCom) library
 # os.environ["PYEPICS_LIBCA"] = "/APSshare/epics/base-7.0.3/lib/linux-x86_64/libca.so"
 os.environ["PYEPICS_LIBCA"] = "/local/epics/base-7.0.6.1/lib/linux-x86_64/libca.so"
 
-from lxml import etree as lxml_etree
 from ophyd import Component, EpicsSignal
+import pickle
 import socket
 import time
 
@@ -41,8 +44,14 @@ path = os.path.dirname(__file__)
 XML_CONFIGURATION_FILE = os.path.join(COMMON_AD_CONFIG_DIR, 'saveFlyData.xml')
 XSD_SCHEMA_FILE = os.path.join(path, 'saveFlyData.xsd')
 TRIGGER_POLL_INTERVAL_s = 0.1
+LAYOUT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "usaxs-bluesky", "nexus_layout"
+)
+LAYOUT_CACHE_VERSION = 1    # increment when the *_Specification classes change
 
 manager = None # singleton instance of NeXus_Structure
+_layout_cache = {}  # key: layout_cache_key(), value: compiled layout (dict)
+_signal_cache = {}  # key: pvname, value: connected ophyd signal
 
 
 class EpicsSignalDesc(EpicsSignal):
@@ -61,6 +70,48 @@ def reset_manager():
     manager = None
 
 
+def clear_layout_cache(signals=False):
+    """
+    forget all compiled NeXus layouts, in memory and on disk
+
+    If ``signals`` is True, also forget the ophyd signals kept
+    for reuse across ``reset_manager()``.
+    """
+    _layout_cache.clear()
+    if os.path.exists(LAYOUT_CACHE_DIR):
+        for fname in os.listdir(LAYOUT_CACHE_DIR):
+            if fname.endswith(".pickle"):
+                os.remove(os.path.join(LAYOUT_CACHE_DIR, fname))
+    if signals:
+        for signal in _signal_cache.values():
+            signal.destroy()
+        _signal_cache.clear()
+
+
+def _file_signature(filename):
+    """return (absolute path, mtime, sha256 of content) for filename"""
+    filename = os.path.abspath(filename)
+    with open(filename, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return filename, os.path.getmtime(filename), digest
+
+
+def layout_cache_key(config_file, schema_file=XSD_SCHEMA_FILE):
+    """
+    identify a compiled layout by its XML and XSD files
+
+    The key changes if either file path, mtime, or content changes.
+    """
+    text = repr(
+        (
+            LAYOUT_CACHE_VERSION,
+            _file_signature(config_file),
+            _file_signature(schema_file),
+        )
+    )
+    return hashlib.sha256(text.encode("utf8")).hexdigest()
+
+
 def get_manager(config_file):
     """
     return a reference to the NeXus structure manager
@@ -89,7 +140,75 @@ class NeXus_Structure(object):
         self.link_registry = {}     # key: node/@label,        value: Link_Specification object
         self.pv_registry = {}       # key: node/@label,        value: PV_Specification object
 
+    # attributes restored from a compiled layout
+    _layout_attributes = """
+        creator_version trigger_pv trigger_accepted_values timeout_pv
+        trigger_poll_interval_s
+        field_registry group_registry link_registry pv_registry
+    """.split()
+
     def _read_configuration(self):
+        """
+        layout the structure from the configuration, cached if possible
+
+        Parsing and validation of the XML configuration is skipped when
+        a compiled layout for identical XML and XSD files is found, in
+        memory or in ``LAYOUT_CACHE_DIR``.
+        """
+        try:
+            key = layout_cache_key(self.config_filename)
+        except OSError as exc:
+            logger.debug(f"cannot cache NeXus layout: {exc}")
+            key = None
+
+        layout = self._load_layout(key)
+        if layout is None:
+            self._parse_configuration()
+            self._save_layout(key)
+        else:
+            logger.debug(f"using cached NeXus layout: {key}")
+            for k in self._layout_attributes:
+                setattr(self, k, layout[k])
+            self.configured = True
+
+    def _load_layout(self, key):
+        """return compiled layout for key, or None if not cached"""
+        if key is None:
+            return None
+        if key not in _layout_cache:
+            cache_file = os.path.join(LAYOUT_CACHE_DIR, key + ".pickle")
+            if not os.path.exists(cache_file):
+                return None
+            try:
+                with open(cache_file, "rb") as f:
+                    _layout_cache[key] = pickle.load(f)
+            except Exception as exc:
+                logger.debug(f"cannot read NeXus layout cache {cache_file}: {exc}")
+                return None
+        # each manager needs its own copy of the *_Specification objects
+        return pickle.loads(pickle.dumps(_layout_cache[key]))
+
+    def _save_layout(self, key):
+        """save the compiled layout (in memory and on disk) for key"""
+        if key is None:
+            return
+        layout = {k: getattr(self, k) for k in self._layout_attributes}
+        buf = pickle.dumps(layout)
+        _layout_cache[key] = pickle.loads(buf)
+        try:
+            os.makedirs(LAYOUT_CACHE_DIR, exist_ok=True)
+            cache_file = os.path.join(LAYOUT_CACHE_DIR, key + ".pickle")
+            tmp_file = f"{cache_file}.{os.getpid()}"
+            with open(tmp_file, "wb") as f:
+                f.write(buf)
+            os.replace(tmp_file, cache_file)
+        except OSError as exc:
+            logger.debug(f"cannot write NeXus layout cache: {exc}")
+
+    def _parse_configuration(self):
+        # lxml: only when the layout is not cached
+        from lxml import etree as lxml_etree
+
         # first, validate configuration file against an XML Schema
         path = os.path.split(os.path.abspath(__file__))[0]
         xml_schema_file = os.path.join(path, XSD_SCHEMA_FILE)
@@ -153,7 +272,12 @@ class NeXus_Structure(object):
         self.configured = True
 
     def _connect_ophyd(self):
+        """create (or reuse from previous managers) the ophyd signals"""
         for i, pv in enumerate(self.pv_registry.values()):
+            if pv.pvname in _signal_cache:
+                # keep the existing CA connection
+                pv.ophyd_signal = _signal_cache[pv.pvname]
+                continue
             oname = f"metadata_{i+1:04d}"
             if pv.pvname.find(".") < 0:
                 creator = EpicsSignalDesc
@@ -162,6 +286,7 @@ class NeXus_Structure(object):
                 # cannot attach .DESC as suffix to this
                 creator = EpicsSignal
             pv.ophyd_signal = creator(pv.pvname, name=oname)
+            _signal_cache[pv.pvname] = pv.ophyd_signal
 
     @property
     def connected(self):
@@ -212,6 +337,14 @@ class Field_Specification(object):
 
         manager.field_registry[self.hdf5_path] = self
 
+    def __getstate__(self):
+        """for pickle: omit the XML node and run-time (EPICS & HDF5) objects"""
+        state = self.__dict__.copy()
+        for k in ("xml_node", ):
+            if k in state:
+                state[k] = None
+        return state
+
     def __str__(self):
         try:
             nm = self.hdf5_path
@@ -255,6 +388,14 @@ class Group_Specification(object):
             raise RuntimeError(msg)
         manager.group_registry[self.hdf5_path] = self
 
+    def __getstate__(self):
+        """for pickle: omit the XML node and run-time (EPICS & HDF5) objects"""
+        state = self.__dict__.copy()
+        for k in ("xml_node", "hdf5_group"):
+            if k in state:
+                state[k] = None
+        return state
+
     def __str__(self):
         return self.hdf5_path or 'Group_Specification object'
 
@@ -279,6 +420,14 @@ class Link_Specification(object):
 
         manager.link_registry[self.hdf5_path] = self
 
+    def __getstate__(self):
+        """for pickle: omit the XML node and run-time (EPICS & HDF5) objects"""
+        state = self.__dict__.copy()
+        for k in ("xml_node", ):
+            if k in state:
+                state[k] = None
+        return state
+
     def make_link(self, hdf_file_object):
         '''make this NeXus link within the HDF5 file'''
         source = self.source_hdf5_path      # source: existing HDF5 object
@@ -340,6 +489,14 @@ class PV_Specification(object):
         self.group_parent.group_children[self.hdf5_path] = self
         manager.pv_registry[self.hdf5_path] = self
 
+    def __getstate__(self):
+        """for pickle: omit the XML node and run-time (EPICS & HDF5) objects"""
+        state = self.__dict__.copy()
+        for k in ("xml_node", "pv", "ophyd_signal"):
+            if k in state:
+                state[k] = None
+        return state
+
     def __str__(self):
         try:
             nm = self.label + ' <' + self.pvname + '>'
@@ -6,11 +6,15 @@ save EPICS data from USAXS Fly Scan to a NeXus file
 '''
 
 
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 import datetime
 import logging
 import numpy
 import os
+import shutil
 import sys
+import threading
 import time
 # from importlib import import_module
 
@@ -36,6 +40,10 @@ COMMON_AD_CONFIG_DIR = "/share1/AreaDetectorConfig/FlyScan_config/"
 path = os.path.dirname(__file__)
 XML_CONFIGURATION_FILE = os.path.join(COMMON_AD_CONFIG_DIR, 'saveFlyData.xml')
 XSD_SCHEMA_FILE = os.path.join(path, 'saveFlyData.xsd')
+EXAMPLE_CONFIGURATION_FILE = os.path.join(path, 'saveFlyData_EXAMPLE.xml')
+TEMPLATE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "usaxs-bluesky", "saveFlyData_template"
+)
 
 
 class TimeoutException(Exception): pass
@@ -43,6 +51,10 @@ class EpicsNotConnected(Exception): pass
 
 NOT_CONNECTED_TEXT = "not connected"
 NO_DATA_TEXT = "no data"
+BULK_READ_MAX_WORKERS = 32     # concurrent CA gets issued by bulk_read_pvs()
+BULK_READ_TIMEOUT_S = 10       # per-PV timeout
+SLOW_PV_REPORT_S = 1.0         # report PVs slower than this (s)
+STREAM_CHUNK_SIZE = 4096       # HDF5 chunk length of streamed arrays
 
 
 class SaveFlyScan(object):
@@ -54,15 +66,24 @@ class SaveFlyScan(object):
     scantime_pv = '9idcLAX:USAXS:FS_ScanTime'
     creator_version = 'unknown'
     flyScanNotSaved_pv = '9idcLAX:USAXS:FlyScanNotSaved'
+    # labels of acquire_after_scan array PVs written while the scan runs
+    stream_pv_labels = ("mca1", "mca2", "mca3")
+    # copy static file structure from a template built once per configuration
+    use_template = True
 
-    def __init__(self, hdf5_file, config_file = None):
+    def __init__(self, hdf5_file, config_file = None, streaming=False, create_file=True):
         self.hdf5_file_name = hdf5_file
+        self.pv_latency = {}    # key: hdf5_path, value: time (s) to read the PV
+        self.streaming = streaming
+        self._streams = {}      # key: hdf5_path, value: _ArrayStream object
 
         path = self._get_support_code_dir()
         self.config_file = config_file or os.path.join(path, XML_CONFIGURATION_FILE)
 
         self.mgr = nexus.get_manager(self.config_file)
-        self._prepare_to_acquire()
+        self._connect()
+        if create_file:
+            self.createFile()
 
     def waitForData(self):
         """
@@ -91,37 +112,51 @@ class SaveFlyScan(object):
 
     def preliminaryWriteFile(self):
         """write all preliminary data to the file while fly scan is running"""
-        not_connected_PVs = self.mgr.unconnected_signals
+        self.writePreliminaryData(self.readPreliminaryData())
+
+    def saveFile(self):
+        '''write all desired data to the file and exit this code'''
+        self.writeFinalData(self.readFinalData())
+
+    # The reads (EPICS) and the writes (HDF5) are separate steps so that
+    # bluesky can read when the scan needs it and write in the background.
+
+    def readPreliminaryData(self):
+        """read the PVs recorded before the scan, returns dict of values"""
+        return self._read_pvs(False, "readPreliminaryData", use_monitor=False)
+
+    def readFinalData(self):
+        """stop streaming, read the PVs recorded after the scan, returns dict"""
+        self._stop_streaming()
+        # note: len(caget(array)) returns NORD (number of useful data)
+        return self._read_pvs(True, "readFinalData")
+
+    def _read_pvs(self, acquire_after_scan, caller, **kwargs):
+        pv_specs = [
+            pv_spec
+            for pv_spec in self.mgr.pv_registry.values()
+            if bool(pv_spec.acquire_after_scan) == acquire_after_scan
+        ]
+        values = self._bulk_read(pv_specs, caller, **kwargs)
+        for pv_spec in pv_specs:
+            value = values[pv_spec.hdf5_path]
+            if isinstance(value, numpy.ndarray):
+                values[pv_spec.hdf5_path] = self._apply_length_limit(pv_spec, value, values)
+        return {pv_spec.hdf5_path: values[pv_spec.hdf5_path] for pv_spec in pv_specs}
+
+    def writePreliminaryData(self, values):
+        """write values from ``readPreliminaryData()``, start streaming"""
         for pv_spec in self.mgr.pv_registry.values():
-            if pv_spec.acquire_after_scan:
+            if pv_spec.hdf5_path not in values:
                 continue
-            elif pv_spec in not_connected_PVs:
-                logger.warning(
-                    "preliminaryWriteFile(): PV %s is not connected now",
-                    pv_spec.pvname
-                )
-                value = NOT_CONNECTED_TEXT
-                # continue
-            elif pv_spec.as_string:
-                value = pv_spec.ophyd_signal.get(as_string=True, timeout=10, use_monitor=False)
-            else:
-                value = pv_spec.ophyd_signal.get(timeout=10, use_monitor=False)
-            if value is None:
-                value = NO_DATA_TEXT
-            logger.debug("saveFile(): writing {pv_spec}")
+            value = values[pv_spec.hdf5_path]
+            logger.debug("writePreliminaryData(): writing {pv_spec}")
             if not isinstance(value, numpy.ndarray):
                 value = [value]
-            else:
-                lim = pv_spec.length_limit
-                pv_reg = self.mgr.pv_registry
-                if lim and lim in pv_reg:
-                    length_limit = pv_reg[lim].ophyd_signal.get()
-                    if len(value) > length_limit:
-                        value = value[:length_limit]
 
             hdf5_parent = pv_spec.group_parent.hdf5_group
             try:
-                logger.debug('preliminaryWriteFile(name="%s", data=%s)', pv_spec.label, value)
+                logger.debug('writePreliminaryData(name="%s", data=%s)', pv_spec.label, value)
                 ds = makeDataset(hdf5_parent, pv_spec.label, value)
                 if ds is None:
                     logger.debug(f"Could not create {pv_spec.label}")
@@ -129,53 +164,51 @@ class SaveFlyScan(object):
                 self._attachEpicsAttributes(ds, pv_spec)
                 addAttributes(ds, **pv_spec.attrib)
             except IOError as e:
-                logger.debug("preliminaryWriteFile():")
+                logger.debug("writePreliminaryData():")
                 logger.debug("ERROR: pv_spec.label=%s, value=%s", pv_spec.label, str(value))
                 logger.debug("MESSAGE: %s", e)
                 logger.debug("RESOLUTION: writing as error message string")
                 makeDataset(hdf5_parent, pv_spec.label, [str(e).encode('utf8')])
 
-    def saveFile(self):
-        '''write all desired data to the file and exit this code'''
+        if self.streaming:
+            self._start_streaming()
+
+    def writeFinalData(self, values):
+        """write values from ``readFinalData()``, close the file"""
         t = datetime.datetime.now()
         timestamp = datetime.datetime.isoformat(t, sep=" ")
         f = self.mgr.group_registry['/'].hdf5_group
         f.attrs["timestamp"] = timestamp
 
-        # note: len(caget(array)) returns NORD (number of useful data)
-        not_connected_PVs = self.mgr.unconnected_signals
         for pv_spec in self.mgr.pv_registry.values():
-            if pv_spec in not_connected_PVs:
-                logger.warning(
-                    "saveFile(): PV %s is not connected now",
-                    pv_spec.pvname
-                )
-                # value = NOT_CONNECTED_TEXT  # unused assignment
-                # continue
-            if not pv_spec.acquire_after_scan:
+            if pv_spec.hdf5_path not in values:
                 continue
-            if pv_spec.as_string:
-                value = pv_spec.ophyd_signal.get(as_string=True)
-            else:
-                value = pv_spec.ophyd_signal.get()
-            if value is None:
-                value = NO_DATA_TEXT
-            if not isinstance(value, numpy.ndarray):
+            value = values[pv_spec.hdf5_path]
+            is_array = isinstance(value, numpy.ndarray)
+            if not is_array:
                 value = [value]
-            else:
-                if pv_spec.length_limit and pv_spec.length_limit in self.mgr.pv_registry:
-                    length_limit = self.mgr.pv_registry[pv_spec.length_limit].ophyd_signal.get()
-                    if len(value) > length_limit:
-                        value = value[:length_limit]
 
             hdf5_parent = pv_spec.group_parent.hdf5_group
+            stream = self._streams.pop(pv_spec.hdf5_path, None)
             try:
-                logger.debug(f"saveFile(name=\"{pv_spec.label}\", data={value})")
-                ds = makeDataset(hdf5_parent, pv_spec.label, value)
+                logger.debug(f"writeFinalData(name=\"{pv_spec.label}\", data={value})")
+                if stream is not None and stream.dataset is not None:
+                    if is_array:
+                        ds = stream.finish(value)   # write only the tail
+                    else:
+                        # final read failed: keep what was streamed
+                        logger.error(
+                            "writeFinalData(): final read of %s failed (%s),"
+                            " kept %d streamed values",
+                            pv_spec.label, value[0], stream.length,
+                        )
+                        ds = stream.keep(f"final read failed: {value[0]}")
+                else:
+                    ds = makeDataset(hdf5_parent, pv_spec.label, value)
                 self._attachEpicsAttributes(ds, pv_spec)
                 addAttributes(ds, **pv_spec.attrib)
             except Exception as e:
-                logger.debug("saveFile():")
+                logger.debug("writeFinalData():")
                 logger.debug("ERROR: pv_spec.label=%s, value=%s", pv_spec.label, str(value))
                 logger.debug("MESSAGE: %s", e)
                 logger.debug("RESOLUTION: writing as error message string")
@@ -186,13 +219,86 @@ class SaveFlyScan(object):
             v.make_link(f)
 
         f.close()    # be CERTAIN to close the file
-        logger.debug("saveFile(): file closed")
+        logger.debug("writeFinalData(): file closed")
+
+    def _bulk_read(self, pv_specs, caller, **kwargs):
+        """
+        read ``pv_specs`` concurrently, report problems, return dict of values
+
+        Unconnected PVs are reported and recorded as ``NOT_CONNECTED_TEXT``.
+        PVs with no data (or which time out) are recorded as ``NO_DATA_TEXT``.
+        Per-PV latency (s) is kept in ``self.pv_latency``.
+        """
+        not_connected_PVs = self.mgr.unconnected_signals
+        for pv_spec in pv_specs:
+            if pv_spec in not_connected_PVs:
+                logger.warning(
+                    "%s(): PV %s is not connected now",
+                    caller, pv_spec.pvname
+                )
+        connected = [p for p in pv_specs if p not in not_connected_PVs]
+
+        t0 = time.time()
+        values, latency = bulk_read_pvs(connected, **kwargs)
+        logger.debug(
+            "%s(): read %d PVs in %.3f s",
+            caller, len(connected), time.time() - t0
+        )
+        self.pv_latency.update(latency)
+        report_slow_pvs(latency, caller=caller)
+
+        for pv_spec in pv_specs:
+            if pv_spec in not_connected_PVs:
+                value = NOT_CONNECTED_TEXT
+            else:
+                value = values.get(pv_spec.hdf5_path)
+            if value is None:
+                value = NO_DATA_TEXT
+            values[pv_spec.hdf5_path] = value
+        return values
+
+    def _start_streaming(self):
+        """subscribe to the array PVs to be written while the scan runs"""
+        not_connected_PVs = self.mgr.unconnected_signals
+        for pv_spec in self.mgr.pv_registry.values():
+            if not pv_spec.acquire_after_scan:
+                continue
+            if pv_spec.label not in self.stream_pv_labels:
+                continue
+            if pv_spec in not_connected_PVs:
+                continue    # saveFile() will report it
+            stream = _ArrayStream(pv_spec)
+            stream.start()
+            self._streams[pv_spec.hdf5_path] = stream
+        logger.debug("streaming %d array PVs to HDF5", len(self._streams))
+
+    def _stop_streaming(self):
+        """unsubscribe from all streamed array PVs"""
+        for stream in self._streams.values():
+            stream.stop()
+
+    def _apply_length_limit(self, pv_spec, value, values):
+        """truncate array ``value`` to the length given by its length_limit PV"""
+        lim = pv_spec.length_limit
+        pv_reg = self.mgr.pv_registry
+        if lim and lim in pv_reg:
+            if lim in values:
+                length_limit = values[lim]      # already read in this batch
+            else:
+                length_limit = pv_reg[lim].ophyd_signal.get()
+            try:
+                length_limit = int(length_limit)
+            except (TypeError, ValueError):
+                return value
+            if len(value) > length_limit:
+                value = value[:length_limit]
+        return value
 
     def _get_support_code_dir(self):
         return os.path.split(os.path.abspath(__file__))[0]
 
-    def _prepare_to_acquire(self):
-        '''connect with EPICS and create HDF5 file and structure'''
+    def _connect(self):
+        '''connect with EPICS'''
         t0 = time.time()
         if not self.mgr.configured:
             self.mgr._read_configuration()
@@ -215,40 +321,27 @@ class SaveFlyScan(object):
                 break
             time.sleep(0.1)
 
-        # create the file
-        for key, xture in sorted(self.mgr.group_registry.items()):
-            if key == '/':
-                # create the file and internal structure
-                f = h5py.File(self.hdf5_file_name, "w")
-                # the following are attributes to the root element of the HDF5 file
-                root_attrs = {}
-                root_attrs["file_name"] = self.hdf5_file_name
-                root_attrs["creator"] = __file__
-                root_attrs["creator_version"] = self.creator_version
-                root_attrs["creator_config_file"] = self.config_file
-                root_attrs["HDF5_Version"] = h5py.version.hdf5_version
-                root_attrs["h5py_version"] = h5py.version.version
-                # root_attrs["NX_class"] = "NXroot",    # not illegal, *never* used
-                addAttributes(f, **root_attrs)
-                xture.hdf5_group = f
-            else:
-                hdf5_parent = xture.group_parent.hdf5_group
-                xture.hdf5_group = hdf5_parent.create_group(xture.name)
-                xture.hdf5_group.attrs["NX_class"] = xture.nx_class
-            addAttributes(xture.hdf5_group, **xture.attrib)
-
-        for field in self.mgr.field_registry.values():
-            if isinstance(field.text, type(u"unicode")):
-                field.text = field.text.encode('utf8')
+    def createFile(self):
+        '''create HDF5 file and structure'''
+        root_attrs = {}
+        root_attrs["file_name"] = self.hdf5_file_name
+        root_attrs["creator"] = __file__
+        root_attrs["creator_version"] = self.creator_version
+        root_attrs["creator_config_file"] = self.config_file
+        if self.use_template:
             try:
-                ds = makeDataset(field.group_parent.hdf5_group, field.name, [field.text])
-                #ds = field.group_parent.hdf5_group
-                addAttributes(ds, **field.attrib)
-            except Exception as _exc:
-                msg = "problem with field={}, text={}, exception={}".format(
-                    field.name, field.text, _exc
-                )
-                raise Exception(msg)
+                template = get_template_file(self.mgr)
+            except Exception as exc:
+                logger.warning("Cannot use HDF5 template file: %s", exc)
+                template = None
+        else:
+            template = None
+        if template is None:
+            create_file_structure(self.mgr, self.hdf5_file_name, root_attrs)
+        else:
+            create_file_from_template(
+                self.mgr, self.hdf5_file_name, root_attrs, template
+            )
 
     def _attachEpicsAttributes(self, node, pv):
         '''attach common attributes from EPICS to the HDF5 tree node'''
@@ -273,6 +366,281 @@ class SaveFlyScan(object):
         addAttributes(node, **attr)
 
 
+class _ArrayStream(object):
+    """
+    append a growing EPICS array PV to a resizable HDF5 dataset
+
+    Assumes the array only grows (new elements are appended) while the
+    fly scan is running, as do the Struck MCA arrays.  If the array
+    becomes shorter (cleared by the IOC), the dataset starts over.
+    """
+
+    def __init__(self, pv_spec, chunk_size=STREAM_CHUNK_SIZE):
+        self.pv_spec = pv_spec
+        self.chunk_size = chunk_size
+        self.dataset = None
+        self.length = 0     # number of elements written
+        self._cid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._cid = self.pv_spec.ophyd_signal.subscribe(
+            self._cb_value, run=False
+        )
+
+    def stop(self):
+        if self._cid is not None:
+            self.pv_spec.ophyd_signal.unsubscribe(self._cid)
+            self._cid = None
+
+    def _cb_value(self, value=None, **kwargs):
+        if not isinstance(value, numpy.ndarray) or len(value) == 0:
+            return
+        try:
+            self.append(value)
+        except Exception as exc:
+            # do not interrupt CA callbacks, saveFile() writes the full array
+            logger.warning("streaming %s: %s", self.pv_spec.label, exc)
+
+    def append(self, value):
+        """write any new elements of ``value`` to the dataset"""
+        with self._lock:
+            if self.dataset is None:
+                parent = self.pv_spec.group_parent.hdf5_group
+                self.dataset = parent.create_dataset(
+                    self.pv_spec.label,
+                    shape=(0,),
+                    maxshape=(None,),
+                    chunks=(self.chunk_size,),
+                    dtype=value.dtype,
+                )
+            n = len(value)
+            if n < self.length:
+                self.length = 0     # array was cleared, start over
+            if n > self.length:
+                self.dataset.resize((n,))
+                self.dataset[self.length:n] = value[self.length:n]
+                self.length = n
+
+    def finish(self, value):
+        """write the tail of the final ``value``, trim to its length"""
+        value = numpy.asarray(value)
+        with self._lock:
+            n = len(value)
+            self.length = min(self.length, n)
+            self.dataset.resize((n,))
+            if n > self.length:
+                self.dataset[self.length:n] = value[self.length:n]
+            self.length = n
+            return self.dataset
+
+    def keep(self, error):
+        """no final value: trim to what was streamed, note the ``error``"""
+        with self._lock:
+            self.dataset.resize((self.length,))
+            self.dataset.attrs["error"] = error
+            return self.dataset
+
+
+def create_file_structure(mgr, filename, root_attrs={}):
+    """
+    create HDF5 file with the groups and constant fields of the configuration
+
+    :param obj mgr: configured nexus.NeXus_Structure object
+    :param str filename: name of HDF5 file to be created
+    :param dict root_attrs: attributes of the root element of the HDF5 file
+    :return: h5py File object (open)
+    """
+    root_attrs = dict(root_attrs)
+    root_attrs["HDF5_Version"] = h5py.version.hdf5_version
+    root_attrs["h5py_version"] = h5py.version.version
+    # root_attrs["NX_class"] = "NXroot",    # not illegal, *never* used
+
+    for key, xture in sorted(mgr.group_registry.items()):
+        if key == '/':
+            # create the file and internal structure
+            f = h5py.File(filename, "w")
+            # the following are attributes to the root element of the HDF5 file
+            addAttributes(f, **root_attrs)
+            xture.hdf5_group = f
+        else:
+            hdf5_parent = xture.group_parent.hdf5_group
+            xture.hdf5_group = hdf5_parent.create_group(xture.name)
+            xture.hdf5_group.attrs["NX_class"] = xture.nx_class
+        addAttributes(xture.hdf5_group, **xture.attrib)
+
+    for field in mgr.field_registry.values():
+        if isinstance(field.text, type(u"unicode")):
+            field.text = field.text.encode('utf8')
+        try:
+            ds = makeDataset(field.group_parent.hdf5_group, field.name, [field.text])
+            #ds = field.group_parent.hdf5_group
+            addAttributes(ds, **field.attrib)
+        except Exception as _exc:
+            msg = "problem with field={}, text={}, exception={}".format(
+                field.name, field.text, _exc
+            )
+            raise Exception(msg)
+    return mgr.group_registry["/"].hdf5_group
+
+
+def get_template_file(mgr, template_dir=TEMPLATE_DIR):
+    """
+    return name of HDF5 template file for this configuration, build if needed
+
+    The template holds the static structure (groups, attributes,
+    constant fields) from ``create_file_structure()``.  There is one
+    template for each version (``nexus.layout_cache_key()``) of the
+    XML configuration and XSD schema files.
+    """
+    key = nexus.layout_cache_key(mgr.config_filename)
+    template = os.path.join(template_dir, f"saveFlyData_{key}.h5")
+    if not os.path.exists(template):
+        logger.debug("creating HDF5 template file: %s", template)
+        os.makedirs(template_dir, exist_ok=True)
+        tmp_file = f"{template}.{os.getpid()}"
+        create_file_structure(mgr, tmp_file).close()
+        os.replace(tmp_file, template)
+    return template
+
+
+def create_file_from_template(mgr, filename, root_attrs, template):
+    """
+    create HDF5 file as a copy of ``template`` (from ``get_template_file()``)
+
+    :param obj mgr: configured nexus.NeXus_Structure object
+    :param str filename: name of HDF5 file to be created
+    :param dict root_attrs: attributes of the root element of the HDF5 file
+    :param str template: name of HDF5 template file
+    :return: h5py File object (open)
+    """
+    shutil.copyfile(template, filename)
+    f = h5py.File(filename, "r+")
+    addAttributes(f, **root_attrs)
+    for key, xture in mgr.group_registry.items():
+        xture.hdf5_group = f if key == "/" else f[key]
+    return f
+
+
+def developer_benchmark_template(
+    config_file=EXAMPLE_CONFIGURATION_FILE,
+    num_files=20,
+    output_dir="/tmp",
+):
+    """
+    compare per-file setup time with and without the HDF5 template
+
+    Needs no EPICS, only the static structure is created.
+    """
+    mgr = nexus.NeXus_Structure(config_file)
+    mgr._read_configuration()
+    root_attrs = dict(creator=__file__, creator_config_file=config_file)
+    fname = os.path.join(output_dir, "sfs_benchmark.h5")
+
+    def _timed(make_file):
+        t0 = time.time()
+        for _i in range(num_files):
+            make_file().close()
+            os.remove(fname)
+        return (time.time() - t0) / num_files
+
+    t_direct = _timed(lambda: create_file_structure(mgr, fname, root_attrs))
+    template_dir = os.path.join(output_dir, "sfs_benchmark_template")
+    template = get_template_file(mgr, template_dir)
+    t_template = _timed(
+        lambda: create_file_from_template(mgr, fname, root_attrs, template)
+    )
+    shutil.rmtree(template_dir)
+
+    print(f"config: {config_file}")
+    print(f"groups: {len(mgr.group_registry)}  fields: {len(mgr.field_registry)}")
+    print(f"without template: {t_direct*1000:.2f} ms/file")
+    print(f"with template:    {t_template*1000:.2f} ms/file")
+    return t_direct, t_template
+
+
+def bulk_read_pvs(
+    pv_specs,
+    timeout=BULK_READ_TIMEOUT_S,
+    max_workers=BULK_READ_MAX_WORKERS,
+    **kwargs
+):
+    """
+    read the ophyd signals of many PV_Specification objects concurrently
+
+    Each ``get()`` is issued from a thread pool so the CA round-trips
+    overlap instead of running one after another.  Any keyword arguments
+    are passed to ``ophyd_signal.get()``.
+
+    :param [obj] pv_specs: list of nexus.PV_Specification objects
+    :param float timeout: per-PV timeout (s)
+    :param int max_workers: maximum number of concurrent reads
+    :return: tuple (values, latency), dictionaries keyed by ``hdf5_path``,
+        value is ``None`` if the PV could not be read
+    """
+    values, latency = {}, {}
+    if len(pv_specs) == 0:
+        return values, latency
+
+    def _get(pv_spec):
+        t0 = time.time()
+        try:
+            if pv_spec.as_string:
+                value = pv_spec.ophyd_signal.get(
+                    as_string=True, timeout=timeout, **kwargs)
+            else:
+                value = pv_spec.ophyd_signal.get(timeout=timeout, **kwargs)
+        except Exception as exc:
+            logger.warning("Could not read PV %s: %s", pv_spec.pvname, exc)
+            value = None
+        return value, time.time() - t0
+
+    workers = max(1, min(max_workers, len(pv_specs)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {
+            pv_spec.hdf5_path: (pv_spec, pool.submit(_get, pv_spec))
+            for pv_spec in pv_specs
+        }
+        # each get() enforces its own timeout, allow for queueing
+        deadline = time.time() + timeout * (1 + len(pv_specs) / workers)
+        for key, (pv_spec, future) in futures.items():
+            try:
+                values[key], latency[key] = future.result(
+                    timeout=max(0, deadline - time.time()))
+            except FuturesTimeoutError:
+                logger.warning("Timeout reading PV %s", pv_spec.pvname)
+                values[key], latency[key] = None, timeout
+    finally:
+        pool.shutdown(wait=False)
+    return values, latency
+
+
+def report_slow_pvs(latency, threshold=SLOW_PV_REPORT_S, caller=""):
+    """
+    log the PVs whose read time exceeded ``threshold`` seconds
+
+    :param dict latency: as returned by ``bulk_read_pvs()``
+    :return: list of (hdf5_path, latency) tuples, slowest first
+    """
+    slow = sorted(
+        [(k, v) for k, v in latency.items() if v > threshold],
+        key=lambda kv: kv[1],
+        reverse=True,
+    )
+    for key, dt in slow:
+        logger.warning("%s(): slow PV read %.3f s: %s", caller, dt, key)
+    if len(latency) > 0:
+        logger.debug(
+            "%s(): PV read latency: max %.3f s, mean %.3f s (%d PVs)",
+            caller,
+            max(latency.values()),
+            sum(latency.values()) / len(latency),
+            len(latency),
+        )
+    return slow
+
+
 def makeDataset(parent, name, data = None, **attr):
     '''
     create and write data to a dataset in the HDF5 file hierarchy
@@ -390,6 +758,7 @@ if __name__ == '__main__':
     main()  # production system - SPEC uses this
     # developer_bluesky()
     # developer_spec()
+    # developer_benchmark_template()
 
 
 '''
@@ -6,6 +6,13 @@ Step-Size Algorithm for Bonse-Hart Ultra-Small-Angle Scattering Instruments
 :see: https://www.jemian.org/SAS/ustep.pdf
 '''
 
+import functools
+import numpy
+
+BIG_STEP = 1e100    # limit of any one step
+FACTOR_CACHE_SIZE = 128
+
+
 
 class Ustep(object):
     '''
@@ -53,53 +60,18 @@ class Ustep(object):
         self.minStep = minStep
         self.sign = {True: 1, False: -1}[start < finish]
         self.factor = self._find_factor_()
-        
+
     def _find_factor_(self):
         '''
         Determine the factor that will make a series with the specified parameters.
-        
-        Consider recent history when refining choice.
+
+        Results are cached, command lists repeat the same uascan parameters.
         '''
-        
-        def assess_diff(factor):
-            series = self.series(factor)
-            diff = abs(series[0] - series[-1]) - span_target
-            return diff
-            
-        span_target = abs(self.finish - self.start)
-        span_precision = abs(self.minStep) * 0.2
-        factor = abs(self.finish-self.start) / (self.numPts -1)
-        diff = assess_diff(factor)
-        f = [factor, factor]
-        d = [diff, diff]
-        
-        # first make certain that d[0] < 0 and d[1] > 0, expand f[0] and f[1]
-        for _ in range(100):
-            if d[0] * d[1] < 0:
-                break           # now, d[0] and d[1] have opposite sign
-            factor *= {True: 2, False: 0.5}[diff < 0]
-            diff = assess_diff(factor)
-            key = {True: 1, False: 0}[diff > d[1]]
-            f[key] = factor
-            d[key] = diff
-            # print(f"expand: diff={diff} key={key}  factor={factor} last={self.series(factor)[-1]}")
-        
-        # now: d[0] < 0 and d[1] > 0, squeeze f[0] & f[1] to converge
-        for _ in range(100):
-            if (d[1] - d[0]) > span_target:
-                factor = (f[0] + f[1])/2              # bracket by bisection when not close
-            else:
-                factor = f[0] - d[0] * (f[1]-f[0])/(d[1]-d[0])    # linear interpolation when close
-            diff = assess_diff(factor)
-            if abs(diff) <= span_precision:
-                break
-            key = {True: 0, False: 1}[diff < 0]
-            f[key] = factor
-            d[key] = diff
-            # print(f"squeeze: diff={diff} key={key}  factor={factor} last={self.series(factor)[-1]}")
-
-        return factor
-    
+        return find_factor(
+            self.start, self.center, self.finish,
+            self.numPts, self.exponent, self.minStep
+        )
+
     def stepper(self, factor=None):
         """
         generator: series of angle steps
@@ -128,17 +100,170 @@ class Ustep(object):
         """
         return [x for x in self.stepper(factor)]
     
+    def series_array(self):
+        """series of positions as a numpy array"""
+        return numpy.fromiter(self.stepper(), dtype=float, count=self.numPts)
+
     def _calc_next_step_(self, x, factor):
         """
         Calculate the next step size with the given parameters
         """
-        if abs(x - self.center) > 1e100:
-            step = 1e100
+        if abs(x - self.center) > BIG_STEP:
+            step = BIG_STEP
         else:
             step = factor * pow( abs(x - self.center), self.exponent ) + self.minStep
         return step
 
 
+def _span_residual(start, center, numPts, exponent, minStep, sign, factor, span_target):
+    """
+    span of the series with ``factor``, less ``span_target``
+
+    Same arithmetic as ``Ustep.series(factor)``, written for speed.
+    """
+    big = BIG_STEP
+    x = start
+    first = None
+    for i in range(numPts):
+        d = abs(x - center)
+        if d > big:
+            x += sign * big
+        else:
+            x += sign * (factor * d**exponent + minStep)
+        if i == 0:
+            first = x
+    return abs(first - x) - span_target
+
+
+def find_factor_bisect(start, center, finish, numPts, exponent, minStep):
+    '''
+    factor :math:`k` for Ustep with these parameters, by bisection
+
+    Consider recent history when refining choice.
+
+    (original method, slower: used when SciPy is not available)
+    '''
+    sign = {True: 1, False: -1}[start < finish]
+
+    def assess_diff(factor):
+        return _span_residual(
+            start, center, numPts, exponent, minStep, sign, factor, span_target
+        )
+
+    span_target = abs(finish - start)
+    span_precision = abs(minStep) * 0.2
+    factor = abs(finish-start) / (numPts -1)
+    diff = assess_diff(factor)
+    f = [factor, factor]
+    d = [diff, diff]
+
+    # first make certain that d[0] < 0 and d[1] > 0, expand f[0] and f[1]
+    for _ in range(100):
+        if d[0] * d[1] < 0:
+            break           # now, d[0] and d[1] have opposite sign
+        factor *= {True: 2, False: 0.5}[diff < 0]
+        diff = assess_diff(factor)
+        key = {True: 1, False: 0}[diff > d[1]]
+        f[key] = factor
+        d[key] = diff
+
+    # now: d[0] < 0 and d[1] > 0, squeeze f[0] & f[1] to converge
+    for _ in range(100):
+        if (d[1] - d[0]) > span_target:
+            factor = (f[0] + f[1])/2              # bracket by bisection when not close
+        else:
+            factor = f[0] - d[0] * (f[1]-f[0])/(d[1]-d[0])    # linear interpolation when close
+        diff = assess_diff(factor)
+        if abs(diff) <= span_precision:
+            break
+        key = {True: 0, False: 1}[diff < 0]
+        f[key] = factor
+        d[key] = diff
+
+    return factor
+
+
+@functools.lru_cache(maxsize=FACTOR_CACHE_SIZE)
+def find_factor(start, center, finish, numPts, exponent, minStep):
+    """
+    factor :math:`k` for Ustep with these parameters
+
+    The solution is bracketed by doubling, then Brent's method finds
+    the root of the end-span residual.  Results are cached (LRU).
+    """
+    sign = {True: 1, False: -1}[start < finish]
+    span_target = abs(finish - start)
+    span_precision = abs(minStep) * 0.2
+    guess = abs(finish - start) / (numPts - 1)
+    args = (start, center, numPts, exponent, minStep, sign)
+
+    def residual(factor):
+        return _span_residual(*args, factor, span_target)
+
+    def original_method():
+        return find_factor_bisect(start, center, finish, numPts, exponent, minStep)
+
+    try:
+        from scipy.optimize import brentq
+    except ImportError:
+        return original_method()
+
+    # residual increases with factor: bracket the root by doubling
+    lo = hi = guess
+    d_lo = d_hi = residual(guess)
+    for _ in range(100):
+        if d_lo < 0 <= d_hi:
+            break
+        if d_hi < 0:
+            lo, d_lo = hi, d_hi
+            hi *= 2
+            d_hi = residual(hi)
+        else:
+            hi, d_hi = lo, d_lo
+            lo /= 2
+            d_lo = residual(lo)
+    else:
+        return original_method()
+
+    if d_hi == 0:
+        return hi
+    # converge on factor well within the span precision
+    rtol = max(1e-14, 0.05 * span_precision / span_target)
+    factor = brentq(residual, lo, hi, xtol=1e-300, rtol=rtol, maxiter=200)
+    if abs(residual(factor)) > span_precision:
+        return original_method()
+    return factor
+
+
+def benchmark(numPts=2000, repeat=3):
+    """compare time to compute the factor: bisection v. current method"""
+    import time
+
+    params = (10.0, 9.5, 7, numPts, 1.2, 0.0001)
+
+    t0 = time.time()
+    for _ in range(repeat):
+        f_orig = find_factor_bisect(*params)
+    t_orig = (time.time() - t0) / repeat
+
+    find_factor(*params)    # not timed: imports scipy
+    t0 = time.time()
+    for _ in range(repeat):
+        find_factor.cache_clear()
+        f_new = find_factor(*params)
+    t_new = (time.time() - t0) / repeat
+
+    t0 = time.time()
+    for _ in range(repeat):
+        find_factor(*params)
+    t_cached = (time.time() - t0) / repeat
+
+    print(f"numPts={numPts}")
+    print(f"bisection: factor={f_orig}  {t_orig*1000:.2f} ms")
+    print(f"brentq:    factor={f_new}  {t_new*1000:.2f} ms")
+    print(f"cached:    {t_cached*1e6:.2f} us")
+
+
 def main():
     start = 10.0
     center = 9.5
@@ -155,3 +280,4 @@ def main():
 
 if __name__ == '__main__':
     main()
+    # benchmark()
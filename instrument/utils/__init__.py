@@ -14,10 +14,19 @@ from .user_sample_title import *
 # (no need to import into global namespace)
 #------------------------------------------
 # from .a2q_q2a import *
+# from .ca_event_analyzer import *
+# from .ca_event_log import *
 # from .cleanup_text import *
+# from .command_file import *
 # from .derivative import *
 # from .dict_from_lists import *
+# from .edge_fit import *
+# from .import_profiler import *
+# from .lazy_import import *
 # from .peak_centers import *
+# from .plan_profiler import *
 # from .reporter import *
 # from .quoted_line import *
 # from .setup_new_user import *
+# from .spec_writer import *
+# from .writer_service import *
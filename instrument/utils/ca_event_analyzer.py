@@ -0,0 +1,211 @@
+"""
+analyze a binary CA event log: update rate, jitter, and gaps of each PV
+
+Reads a log written by ``instrument.utils.ca_event_log`` (chunks are
+memory-mapped and read in blocks of ``BLOCK_EVENTS``, so logs larger
+than memory are fine).  For each PV, from the intervals between its
+events: the mean update rate, the jitter (standard deviation of the
+intervals), the shortest & longest interval, and the gaps (intervals
+longer than ``gap_factor`` times the mean interval).
+
+From the command line, with a log directory or a camonitor text file
+(imported first, into ``<file>.events``)::
+
+    python -m instrument.utils.ca_event_analyzer _camonitor.log
+"""
+
+__all__ = """
+    analyze_event_log
+    event_log_table
+    open_event_log
+""".split()
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+import numpy as np
+import pathlib
+
+from .ca_event_log import chunk_files
+from .ca_event_log import EVENT_DTYPE
+from .ca_event_log import read_pv_names
+
+
+BLOCK_EVENTS = 1 << 22      # events analyzed at once
+GAP_FACTOR = 5              # a gap: interval longer than this times the mean
+
+
+def open_event_log(path):
+    """PV names and the chunks (read-only memory maps) of a log"""
+    chunks = [
+        np.memmap(f, dtype=EVENT_DTYPE, mode="r")
+        for f in chunk_files(path)
+        if f.stat().st_size >= EVENT_DTYPE.itemsize
+    ]
+    return read_pv_names(path), chunks
+
+
+def _blocks(chunks, block_events=BLOCK_EVENTS):
+    for chunk in chunks:
+        for start in range(0, len(chunk), block_events):
+            yield chunk[start : start + block_events]
+
+
+def _intervals(chunks, num_pvs, block_events=BLOCK_EVENTS):
+    """
+    per block: (PV ids, intervals) in PV order, and the event times
+
+    Yields ``(pv, dt, ts, first)``: ``pv`` and ``ts`` of the block's
+    events sorted by PV and time, ``dt`` the interval before each event
+    (``nan`` for the first event of a PV), ``first`` marks the first
+    event of each PV in the block.  (Events of a PV out of time order
+    are sorted within a block, not across blocks.)
+    """
+    last = np.full(num_pvs, np.nan)     # time of the last event of each PV
+    for block in _blocks(chunks, block_events):
+        pv = np.asarray(block["pv"])
+        ts = np.asarray(block["timestamp"])
+        # events are written as they come: already in time order for each
+        # PV, a stable sort by PV (radix sort for 16-bit ids) is enough
+        if num_pvs <= 1 << 16:
+            order = np.argsort(pv.astype(np.uint16), kind="stable")
+        else:
+            order = np.argsort(pv, kind="stable")
+        pv, ts = pv[order], ts[order]
+        first = np.empty(len(pv), dtype=bool)
+        first[0] = True
+        np.not_equal(pv[1:], pv[:-1], out=first[1:])
+        dt = np.empty(len(ts))
+        dt[1:] = ts[1:] - ts[:-1]
+        if (dt[1:][~first[1:]] < 0).any():     # not in time order after all
+            order = np.lexsort((ts, pv))
+            pv, ts = pv[order], ts[order]
+            dt[1:] = ts[1:] - ts[:-1]
+        dt[first] = ts[first] - last[pv[first]]     # from the blocks before
+        final = np.append(first[1:], True)          # last event of each PV
+        last[pv[final]] = ts[final]
+        yield pv, dt, ts, first
+
+
+def analyze_event_log(path, gap_factor=GAP_FACTOR, block_events=BLOCK_EVENTS):
+    """
+    statistics of each PV in the log at ``path``
+
+    Returns dictionary (by PV name) of dictionaries: ``events``,
+    ``first`` & ``last`` (timestamps), ``rate`` (1/s), ``interval``
+    (mean, s), ``jitter`` (s), ``min_interval``, ``max_interval``
+    (s), ``gaps``.  Two passes over the log (the gaps need the mean).
+    """
+    pv_names, chunks = open_event_log(path)
+    n = len(pv_names)
+    events = np.zeros(n, dtype=np.int64)
+    intervals = np.zeros(n, dtype=np.int64)
+    total = np.zeros(n)
+    total_sq = np.zeros(n)
+    shortest = np.full(n, np.inf)
+    longest = np.full(n, -np.inf)
+    t_first = np.full(n, np.inf)
+    t_last = np.full(n, -np.inf)
+
+    for pv, dt, ts, first in _intervals(chunks, n, block_events):
+        events += np.bincount(pv, minlength=n)
+        starts = np.flatnonzero(first)
+        np.minimum.at(t_first, pv[starts], ts[starts])
+        np.maximum.at(t_last, pv[starts], np.maximum.reduceat(ts, starts))
+        ok = ~np.isnan(dt)
+        pv, dt = pv[ok], dt[ok]
+        if len(pv) == 0:
+            continue
+        intervals += np.bincount(pv, minlength=n)
+        total += np.bincount(pv, weights=dt, minlength=n)
+        total_sq += np.bincount(pv, weights=dt * dt, minlength=n)
+        starts = np.flatnonzero(np.append(True, pv[1:] != pv[:-1]))
+        np.minimum.at(shortest, pv[starts], np.minimum.reduceat(dt, starts))
+        np.maximum.at(longest, pv[starts], np.maximum.reduceat(dt, starts))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / intervals
+        jitter = np.sqrt(np.maximum(total_sq / intervals - mean**2, 0))
+
+    gaps = np.zeros(n, dtype=np.int64)
+    limit = gap_factor * mean
+    for pv, dt, _ts, _first in _intervals(chunks, n, block_events):
+        with np.errstate(invalid="ignore"):
+            late = dt > limit[pv]
+        gaps += np.bincount(pv[late], minlength=n)
+
+    results = {}
+    for i, pv in enumerate(pv_names):
+        if events[i] == 0:
+            continue
+        has_intervals = intervals[i] > 0
+        results[pv] = dict(
+            events=int(events[i]),
+            first=t_first[i],
+            last=t_last[i],
+            rate=1 / mean[i] if has_intervals and mean[i] > 0 else np.nan,
+            interval=mean[i] if has_intervals else np.nan,
+            jitter=jitter[i] if has_intervals else np.nan,
+            min_interval=shortest[i] if has_intervals else np.nan,
+            max_interval=longest[i] if has_intervals else np.nan,
+            gaps=int(gaps[i]),
+        )
+    return results
+
+
+def event_log_table(results):
+    """results of ``analyze_event_log()`` as a pyRestTable.Table"""
+    import pyRestTable
+
+    table = pyRestTable.Table()
+    table.labels = (
+        "PV events rate,1/s interval,s jitter,s min,s max,s gaps".split()
+    )
+    for pv, r in results.items():
+        table.addRow((
+            pv,
+            r["events"],
+            f"{r['rate']:.4g}",
+            f"{r['interval']:.4g}",
+            f"{r['jitter']:.3g}",
+            f"{r['min_interval']:.3g}",
+            f"{r['max_interval']:.3g}",
+            r["gaps"],
+        ))
+    return table
+
+
+def main(argv=None):
+    """command line: analyze a log directory or a camonitor text file"""
+    import argparse
+    import shutil
+    import time
+
+    from .ca_event_log import import_camonitor
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log", help="log directory, or camonitor text file")
+    parser.add_argument("--gap-factor", type=float, default=GAP_FACTOR)
+    args = parser.parse_args(argv)
+
+    path = pathlib.Path(args.log)
+    if path.is_file():
+        events_path = path.with_name(path.name + ".events")
+        if events_path.exists() and events_path.stat().st_mtime < path.stat().st_mtime:
+            shutil.rmtree(events_path)      # text file has changed since
+        if not events_path.exists():
+            t0 = time.time()
+            n = import_camonitor(path, events_path)
+            print(f"imported {n} events from {path} in {time.time() - t0:.2f} s")
+        path = events_path
+
+    t0 = time.time()
+    results = analyze_event_log(path, gap_factor=args.gap_factor)
+    print(event_log_table(results))
+    print(f"analyzed {path} in {time.time() - t0:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+record EPICS CA events (PV, timestamp, value) in a compact binary log
+
+The log is a directory, written append-only:
+
+* ``pvs.txt`` : PV names, one per line, the line index is the PV id
+* ``events-000000.bin``, ... : chunks of at most ``CHUNK_EVENTS``
+  records of ``EVENT_DTYPE`` (PV id, timestamp, value), raw, so they
+  can be memory-mapped (see ``instrument.utils.ca_event_analyzer``)
+
+Values are stored as float (``nan`` if not a number).  Events are
+buffered, a background thread writes them at least every
+``FLUSH_INTERVAL`` s, also when no more events arrive.
+
+Record the CA monitor events of some devices (or signals) this session::
+
+    from instrument.utils.ca_event_log import start_ca_event_log, stop_ca_event_log
+    start_ca_event_log(s_stage, a_stage, terms.SAXS)
+    ...
+    stop_ca_event_log()
+
+Import a text log from ``camonitor``::
+
+    import_camonitor("_camonitor.log", "_camonitor.events")
+"""
+
+__all__ = """
+    CAEventLog
+    CAEventRecorder
+    import_camonitor
+    start_ca_event_log
+    stop_ca_event_log
+""".split()
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+import numpy as np
+import pathlib
+import re
+import threading
+import time
+
+
+EVENT_DTYPE = np.dtype([("pv", "<u4"), ("timestamp", "<f8"), ("value", "<f8")])
+CHUNK_EVENTS = 1 << 22      # records per chunk file (80 MB)
+BUFFER_EVENTS = 1 << 13     # records buffered before writing
+FLUSH_INTERVAL = 1.0        # s, write buffered records at least this often
+IMPORT_BATCH_LINES = 100_000
+PV_NAMES_FILE = "pvs.txt"
+CHUNK_FILE = "events-{:06d}.bin"
+
+# typical camonitor log file line (more columns when in alarm)
+# 9idcAERO:m12.RBV               2022-12-02 09:35:54.535389 8.84368
+_CAMONITOR_LINE = re.compile(
+    r"^(\S+)\s+(\d{4}-\d\d-\d\d)\s+(\d\d:\d\d:\d\d(?:\.\d+)?)\s+(\S+)"
+)
+
+_recorder = None    # from start_ca_event_log()
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def chunk_files(path):
+    """chunk files of the log at ``path``, in order"""
+    return sorted(pathlib.Path(path).glob(CHUNK_FILE.replace("{:06d}", "[0-9]" * 6)))
+
+
+def read_pv_names(path):
+    """PV names of the log at ``path`` (index: PV id)"""
+    pv_file = pathlib.Path(path) / PV_NAMES_FILE
+    if not pv_file.exists():
+        return []
+    return pv_file.read_text().splitlines()
+
+
+class CAEventLog:
+    """
+    append-only binary log of CA events, in directory ``path``
+
+    An existing log is appended.  Thread-safe.  Use as context manager
+    or call ``close()`` (writes what is buffered).  Buffered events are
+    written at least every ``flush_interval`` s (by a thread, started
+    with the first ``append()``).
+    """
+
+    def __init__(
+        self, path,
+        chunk_events=CHUNK_EVENTS,
+        buffer_events=BUFFER_EVENTS,
+        flush_interval=FLUSH_INTERVAL,
+    ):
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.chunk_events = chunk_events
+        self.pv_names = read_pv_names(self.path)
+        self._pv_ids = {pv: i for i, pv in enumerate(self.pv_names)}
+        self._buffer = np.empty(buffer_events, dtype=EVENT_DTYPE)
+        self._n = 0
+        self._lock = threading.Lock()
+        self._t_flush = time.monotonic()
+        self.flush_interval = flush_interval
+        self._closed = threading.Event()
+        self._flusher = None    # thread, from the first append()
+        self.events = 0     # written by this object
+
+        chunks = chunk_files(self.path)
+        self._chunk = len(chunks) - 1 if len(chunks) > 0 else 0
+        self._chunk_size = 0
+        if len(chunks) > 0:
+            self._chunk_size = chunks[-1].stat().st_size // EVENT_DTYPE.itemsize
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def pv_id(self, pvname):
+        """id of ``pvname``, new PVs are added to the PV names file"""
+        pv_id = self._pv_ids.get(pvname)
+        if pv_id is None:
+            with self._lock:
+                pv_id = self._pv_ids.get(pvname)
+                if pv_id is None:
+                    pv_id = len(self.pv_names)
+                    with open(self.path / PV_NAMES_FILE, "a") as fp:
+                        fp.write(f"{pvname}\n")
+                    self.pv_names.append(pvname)
+                    self._pv_ids[pvname] = pv_id
+        return pv_id
+
+    def append(self, pvname, timestamp, value):
+        """add one event (buffered)"""
+        pv_id = self.pv_id(pvname)
+        with self._lock:
+            self._buffer[self._n] = (pv_id, timestamp, _as_float(value))
+            self._n += 1
+            if (
+                self._n == len(self._buffer)
+                or time.monotonic() - self._t_flush > self.flush_interval
+            ):
+                self._flush()
+            if self._flusher is None and not self._closed.is_set():
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically,
+                    name="ca_event_log_flush",
+                    daemon=True,
+                )
+                self._flusher.start()
+
+    def _flush_periodically(self):
+        """(in a thread) write buffered events when not written for a while"""
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._lock:
+                if time.monotonic() - self._t_flush >= self.flush_interval:
+                    self._flush()
+
+    def append_many(self, pv_ids, timestamps, values):
+        """add events (arrays, PV ids from ``pv_id()``), written now"""
+        events = np.empty(len(pv_ids), dtype=EVENT_DTYPE)
+        events["pv"] = pv_ids
+        events["timestamp"] = timestamps
+        events["value"] = values
+        with self._lock:
+            self._flush()
+            self._write(events)
+
+    def flush(self):
+        """write what is buffered"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._n > 0:
+            self._write(self._buffer[: self._n])
+            self._n = 0
+        self._t_flush = time.monotonic()
+
+    def _write(self, events):
+        """append to the chunk files, a new chunk when one is full"""
+        start = 0
+        while start < len(events):
+            if self._chunk_size >= self.chunk_events:
+                self._chunk += 1
+                self._chunk_size = 0
+            n = min(len(events) - start, self.chunk_events - self._chunk_size)
+            with open(self.path / CHUNK_FILE.format(self._chunk), "ab") as fp:
+                events[start : start + n].tofile(fp)
+            self._chunk_size += n
+            self.events += n
+            start += n
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+
+class CAEventRecorder:
+    """
+    record the CA monitor events of ophyd signals in a ``CAEventLog``
+
+    ``add()`` devices or signals, each EPICS signal is subscribed
+    (value changes).  ``remove()`` ends the subscriptions.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self._subscriptions = []    # (signal, cid)
+
+    def _record(self, value=None, timestamp=None, obj=None, **kwargs):
+        self.log.append(obj.pvname, timestamp or time.time(), value)
+
+    def add(self, *objects):
+        """subscribe the EPICS signals of the devices (or signals)"""
+        from ophyd.signal import EpicsSignalBase
+
+        for obj in objects:
+            if hasattr(obj, "walk_signals"):
+                signals = [walk.item for walk in obj.walk_signals()]
+            else:
+                signals = [obj]
+            for signal in signals:
+                if isinstance(signal, EpicsSignalBase):
+                    cid = signal.subscribe(self._record, event_type="value", run=False)
+                    self._subscriptions.append((signal, cid))
+        return len(self._subscriptions)
+
+    def remove(self):
+        """end all subscriptions, write what is buffered"""
+        while len(self._subscriptions) > 0:
+            signal, cid = self._subscriptions.pop()
+            signal.unsubscribe(cid)
+        self.log.flush()
+
+
+def start_ca_event_log(*objects, path=None):
+    """
+    record CA events of devices (or signals), returns the recorder
+
+    Log directory ``path`` (default: ``ca_events`` in the session log
+    directory).  Calling again adds more devices.
+    """
+    global _recorder
+
+    if _recorder is None:
+        if path is None:
+            from .._log_utils import get_log_path
+
+            path = get_log_path() / "ca_events"
+        _recorder = CAEventRecorder(CAEventLog(path))
+    n = _recorder.add(*objects)
+    logger.info("recording CA events of %d signals in %s", n, _recorder.log.path)
+    return _recorder
+
+
+def stop_ca_event_log():
+    """stop recording CA events, write what is buffered"""
+    global _recorder
+
+    if _recorder is not None:
+        _recorder.remove()
+        logger.info(
+            "%d CA events recorded in %s", _recorder.log.events, _recorder.log.path
+        )
+        _recorder = None
+
+
+def import_camonitor(text_file, path, batch_lines=IMPORT_BATCH_LINES):
+    """
+    import a ``camonitor`` text log into the binary log at ``path``
+
+    Lines not matching ``PV date time value ...`` are skipped.  The
+    timestamps are taken as UTC (as ``user/analyze_camonitor_log.py``).
+    Returns the number of events imported.
+    """
+    count = 0
+    with CAEventLog(path) as log, open(text_file, "r") as fp:
+        while True:
+            pv_ids, times, values = [], [], []
+            for line in fp:
+                match = _CAMONITOR_LINE.match(line)
+                if match is not None:
+                    pv, ymd, hms, value = match.groups()
+                    pv_ids.append(log.pv_id(pv))
+                    times.append(f"{ymd}T{hms}")
+                    values.append(_as_float(value))
+                    if len(pv_ids) == batch_lines:
+                        break
+            if len(pv_ids) == 0:
+                break
+            timestamps = np.array(times, dtype="datetime64[us]").astype(np.int64) / 1e6
+            log.append_many(pv_ids, timestamps, values)
+            count += len(pv_ids)
+    logger.info("%d camonitor events imported from %s", count, text_file)
+    return count
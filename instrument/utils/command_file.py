@@ -0,0 +1,303 @@
+"""
+read & check command files (text or Excel), remember what was read
+
+A command file is read into a list of ``Command`` records, which are
+tuples ``(action, args, line_number, raw_command)`` as expected by
+``execute_command_list()``, with the scan parameters available typed.
+
+Files read are remembered by path: a file is read again only if it
+changed (its modification time *and* its content hash), so
+``summarize_command_file()``, ``run_command_file()``, and others read
+each file once.  Text files are read line by line, Excel files in
+read-only mode, row by row (legacy .xls files with pandas and xlrd).
+"""
+
+__all__ = """
+    Command
+    CommandFile
+    read_command_file
+    validate_commands
+""".split()
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from collections import namedtuple
+import hashlib
+import os
+import zipfile
+
+from .quoted_line import split_quoted_line
+
+
+EXCEL_LABELS_ROW = 3        # zero-based, as apstools ExcelDatabaseFileGeneric
+HASH_BLOCK_SIZE = 1 << 20
+OLE2_SIGNATURE = bytes.fromhex("D0CF11E0A1B11AE1")     # legacy Excel (.xls)
+SCAN_ACTIONS = "flyscan usaxsscan saxs saxsexp waxs waxsexp".split()
+ORDER_DIRECTIVES = dict(    # in a command file: run order, not run themselves
+    group_by_technique=False,   # group the scans of a sample set by technique
+    strict_order=True,          # the order of the file
+)
+KNOWN_ACTIONS = SCAN_ACTIONS + list(ORDER_DIRECTIVES) + """
+    allusaxstune
+    mode_blackfly mode_radiography mode_saxs mode_usaxs mode_waxs
+    pi_off pi_onf pi_onr
+    preusaxstune
+    run run_python
+    set
+""".split()     # as handled by execute_command_list()
+THICKNESS_MAX_MM = 20       # thicker samples are reported as suspicious
+
+_cache = {}     # absolute path: CommandFile
+
+
+class Command(namedtuple("Command", "action args line_number raw_command")):
+    """one command of a command file"""
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        """action, lower case"""
+        return str(self.action).lower()
+
+    @property
+    def is_scan(self):
+        return self.name in SCAN_ACTIONS
+
+    def scan_parameters(self):
+        """
+        ``(sx, sy, thickness, title)`` of a scan
+
+        Raises ValueError (its message names the line) if not a proper scan.
+        """
+
+        def _error(reason):
+            return ValueError(
+                f"line {self.line_number}: Improper command :"
+                f" {self.raw_command} : {reason}"
+            )
+
+        if len(self.args) < 4:
+            raise _error(f"expected: {self.action} sx sy thickness title")
+        try:
+            # a blank Excel cell is None: TypeError
+            sx, sy, thickness = (float(v) for v in self.args[:3])
+        except (TypeError, ValueError):
+            raise _error(f"sx, sy, thickness must be numbers, given {list(self.args[:3])}")
+        title = self.args[3]
+        if title is None or str(title).strip() == "":
+            raise _error("no sample title")
+        return sx, sy, thickness, title
+
+
+class CommandFile:
+    """commands read from a file, with what identifies the file version"""
+
+    def __init__(self, filename, kind, mtime, size, digest, commands):
+        self.filename = filename
+        self.kind = kind    # "text" or "excel"
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        self.commands = commands
+
+
+def _file_digest(filename):
+    h = hashlib.sha1()
+    with open(filename, "rb") as fp:
+        for block in iter(lambda: fp.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_text(filename):
+    """commands of a text file, read line by line"""
+    commands = []
+    with open(filename, "rb") as fp:
+        for i, raw in enumerate(fp):
+            raw_command = raw.decode("utf-8", errors="replace")
+            row = raw_command.strip()
+            if row == "" or row.startswith("#"):
+                continue                    # comment or blank
+            action, *values = split_quoted_line(row)
+            commands.append(Command(action, values, i+1, raw_command.rstrip()))
+    return commands
+
+
+def _commands_from_rows(rows):
+    """
+    commands of the rows of an Excel sheet
+
+    The table layout is as ``apstools.utils.ExcelDatabaseFileGeneric``:
+    labels on row ``EXCEL_LABELS_ROW + 1`` (ends at the first empty
+    label), one command per row (ends at the first empty action).  Rows
+    with an action starting with ``#`` are comments.
+    """
+    labels = next(rows, ())
+    num_columns = len(labels)
+    for j, label in enumerate(labels):
+        if label is None:
+            num_columns = j
+            break
+
+    commands = []
+    for i, row in enumerate(rows):
+        row = list(row[:num_columns])
+        if len(row) == 0 or row[0] is None:
+            break
+        action, *values = row
+        if str(action).strip().startswith("#"):
+            continue
+        # trim off any None values from end
+        while len(values) > 0 and values[-1] is None:
+            values.pop()
+        commands.append(Command(action, values, i+1, row))
+    return commands
+
+
+def _read_excel(filename):
+    """
+    commands of an Excel (.xlsx) file, read row by row
+
+    Cells with a formula give the value computed by Excel.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(min_row=EXCEL_LABELS_ROW + 1, values_only=True)
+        commands = _commands_from_rows(rows)
+    finally:
+        wb.close()
+    return commands
+
+
+def _read_xls(filename):
+    """
+    commands of a legacy Excel (.xls) file
+
+    openpyxl reads only .xlsx files, these are read with pandas (xlrd).
+    """
+    import pandas
+
+    try:
+        sheet = pandas.read_excel(filename, sheet_name=0, header=None, engine="xlrd")
+    except ImportError as exc:
+        raise ImportError(
+            f"Cannot read legacy Excel (.xls) command file {filename}:"
+            " needs the xlrd package, or save it as .xlsx"
+        ) from exc
+    sheet = sheet.astype(object).where(sheet.notna(), None)     # blank: None
+    rows = iter(sheet.values.tolist()[EXCEL_LABELS_ROW:])
+    return _commands_from_rows(rows)
+
+
+def _is_xls(filename):
+    """a legacy Excel (.xls) file is an OLE2 file, not a zip file"""
+    with open(filename, "rb") as fp:
+        return fp.read(len(OLE2_SIGNATURE)) == OLE2_SIGNATURE
+
+
+def read_command_file(filename):
+    """
+    read the commands of a text or Excel file, returns a CommandFile
+
+    Excel files (.xlsx and legacy .xls) are recognized by content, not
+    by name.  A file is read again only if it changed since it was read
+    last.
+
+    RAISES
+
+    FileNotFoundError
+        if file cannot be found
+    ImportError
+        if a legacy .xls file cannot be read (no xlrd package)
+    """
+    full_filename = os.path.abspath(filename)
+    stat = os.stat(full_filename)
+    cached = _cache.get(full_filename)
+    if (
+        cached is not None
+        and cached.mtime == stat.st_mtime_ns
+        and cached.size == stat.st_size
+    ):
+        return cached
+
+    xls = _is_xls(full_filename)
+    kind = "excel" if xls or zipfile.is_zipfile(full_filename) else "text"
+    digest = _file_digest(full_filename)
+    if cached is not None and cached.digest == digest:
+        commands = cached.commands      # only touched
+    elif xls:
+        commands = _read_xls(full_filename)
+    elif kind == "excel":
+        commands = _read_excel(full_filename)
+    else:
+        commands = _read_text(full_filename)
+
+    result = CommandFile(
+        full_filename, kind, stat.st_mtime_ns, stat.st_size, digest, commands
+    )
+    _cache[full_filename] = result
+    logger.debug("read %d commands from %s file %s", len(commands), kind, filename)
+    return result
+
+
+def _check_limits(errors, name, value, limits, command):
+    if limits is None:
+        return
+    low, high = limits
+    if value < low:
+        errors.append(
+            f"line {command.line_number}: {name} low limit: value {value}"
+            f" < low limit {low},  command: {command.raw_command}"
+        )
+    if value > high:
+        errors.append(
+            f"line {command.line_number}: {name} high limit: value {value}"
+            f" > high limit {high},  command: {command.raw_command}"
+        )
+
+
+def validate_commands(commands, x_limits=None, y_limits=None):
+    """
+    check the commands, returns lists of errors and of warnings
+
+    * scans: sx, sy, thickness are numbers and a title is given, sx & sy
+      are within ``x_limits`` & ``y_limits`` ``(low, high)`` (if given),
+      thickness is not negative (warn if above ``THICKNESS_MAX_MM``)
+    * ``run_python``: a file name
+    * ``set``: warn if not two arguments, the first starts with ``terms.``
+    * other actions: warn if not known (they will not be run)
+
+    Commands may be ``Command`` records or plain tuples.
+    """
+    errors, warnings = [], []
+    for command in commands:
+        command = Command(*command)
+        i = command.line_number
+        action = command.name
+        if command.is_scan:
+            try:
+                sx, sy, thickness, _title = command.scan_parameters()
+            except ValueError as exc:
+                errors.append(str(exc))
+                continue
+            _check_limits(errors, "SX", sx, x_limits, command)
+            _check_limits(errors, "SY", sy, y_limits, command)
+            if thickness < 0:
+                errors.append(f"line {i}: negative thickness {thickness}: {command.raw_command}")
+            elif thickness > THICKNESS_MAX_MM:
+                warnings.append(f"line {i}: thickness {thickness} mm?: {command.raw_command}")
+        elif action == "set":
+            if len(command.args) != 2 or not str(command.args[0]).startswith("terms."):
+                warnings.append(f"line {i}: expected: SET terms.component value, will be skipped : {command.raw_command}")
+        elif action in ("run", "run_python"):
+            if len(command.args) == 0:
+                errors.append(f"line {i}: expected: {command.action} filename : {command.raw_command}")
+        elif action not in KNOWN_ACTIONS:
+            warnings.append(f"line {i}: unknown action, will be skipped: {command.raw_command}")
+    return errors, warnings
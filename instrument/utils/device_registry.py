@@ -0,0 +1,328 @@
+"""
+connect the instrument's devices concurrently, in the background
+
+Constructing an ophyd device does not wait for EPICS, waiting for its
+connections does.  Done in turn, at import, the startup takes the sum
+of all the connection waits and one IOC that is down (a 15 s timeout
+per signal) stalls everything after it.
+
+The ``device_registry`` knows the devices of the instrument:
+
+* ``add(device, on_connect=...)``: a device constructed at import;
+  what must wait for its connection (such as reading a PV to configure
+  it) goes in ``on_connect(device)``, called once it is connected.
+* ``declare(name, factory, on_connect=...)``: a device constructed
+  (``factory()``) only when connecting, such as one whose PV prefix must
+  first be read from EPICS.
+
+``connect()`` starts connecting them all, concurrently, and returns at
+once.  ``device_registry["name"]`` (or ``get()``) waits for that device
+only, and for its ``on_connect``: use it before anything that needs the
+setup done there (as the Dexela detector's ``stage()`` does).  When all are done, the connect time of each device is logged
+(also ``report()``, a table, slowest first).
+
+Compare with connecting in turn, with simulated devices (ophyd.sim)::
+
+    python -m instrument.utils.device_registry
+"""
+
+__all__ = """
+    device_registry
+    DeviceRegistry
+""".split()
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from concurrent.futures import ThreadPoolExecutor
+import concurrent.futures
+import threading
+import time
+
+
+DEVICE_CONNECT_TIMEOUT = 15     # s, as EpicsSignalBase.set_defaults() in initialize
+DEVICE_CONNECT_WORKERS = 16     # devices connecting at once
+
+
+class _RegistryEntry:
+    """a device of the registry, with its connection status"""
+
+    def __init__(self, name, device=None, factory=None):
+        self.name = name
+        self.device = device
+        self.factory = factory
+        self.on_connect = []
+        self.future = None
+        self.status = "pending"     # connected, timeout, or error when done
+        self.error = None
+        self.seconds = None
+        self.t_done = None
+
+
+class DeviceRegistry:
+    """
+    devices of the instrument, connected concurrently in the background
+
+    PARAMETERS
+
+    timeout *float* :
+        Connection timeout (s) of each device.
+        (default: ``DEVICE_CONNECT_TIMEOUT``)
+    max_workers *int* :
+        Devices connecting at once.  (default: ``DEVICE_CONNECT_WORKERS``)
+    """
+
+    def __init__(self, timeout=DEVICE_CONNECT_TIMEOUT, max_workers=DEVICE_CONNECT_WORKERS):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.t0 = None              # connect() started
+        self._entries = {}          # name: _RegistryEntry, in order added
+        self._executor = None
+        self._lock = threading.RLock()
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def names(self):
+        return list(self._entries)
+
+    def _register(self, entry, on_connect):
+        with self._lock:
+            entry = self._entries.setdefault(entry.name, entry)
+            if on_connect is not None:
+                entry.on_connect.append(on_connect)
+            if self._executor is not None and entry.future is None:
+                self._submit(entry)
+        return entry
+
+    def add(self, device, name=None, on_connect=None):
+        """
+        add a (constructed) device, returns it
+
+        ``on_connect(device)`` is called once the device is connected
+        (not if it fails to connect).  Adding a device again only adds
+        its ``on_connect``.
+        """
+        entry = _RegistryEntry(name or device.name, device=device)
+        self._register(entry, on_connect)
+        return device
+
+    def declare(self, name, factory, on_connect=None):
+        """add a device to be constructed (``factory()``) when connecting"""
+        self._register(_RegistryEntry(name, factory=factory), on_connect)
+
+    def add_namespace(self, namespace):
+        """add the ophyd objects (not their components) of a namespace"""
+        from ophyd.ophydobj import OphydObject
+
+        known = set(id(e.device) for e in self._entries.values())
+        for key, obj in namespace.items():
+            if (
+                not key.startswith("_")
+                and isinstance(obj, OphydObject)
+                and obj.parent is None
+                and id(obj) not in known
+            ):
+                known.add(id(obj))
+                self.add(obj, name=key)
+
+    def _submit(self, entry):
+        if self._executor is None:
+            self.t0 = time.time()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="device_registry",
+            )
+        entry.future = self._executor.submit(self._connect, entry)
+
+    def _connect(self, entry):
+        """(in a worker thread) construct, wait for connection, on_connect"""
+        t0 = time.time()
+        try:
+            if entry.device is None:
+                entry.device = entry.factory()
+            entry.device.wait_for_connection(timeout=self.timeout)
+            for hook in entry.on_connect:
+                hook(entry.device)
+            entry.status = "connected"
+        except TimeoutError as exc:
+            entry.status, entry.error = "timeout", exc
+        except Exception as exc:
+            entry.status, entry.error = "error", exc
+        entry.t_done = time.time()
+        entry.seconds = entry.t_done - t0
+        return entry.device
+
+    def connect(self, report=True):
+        """
+        start connecting all devices, returns at once
+
+        With ``report``, log the connect times when all are done.
+        """
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.future is None:
+                    self._submit(entry)
+        if report:
+            threading.Thread(
+                target=self._report_when_done,
+                name="device_registry_report",
+                daemon=True,
+            ).start()
+
+    def _report_when_done(self):
+        self.wait()
+        for entry in self._entries.values():
+            if entry.status != "connected":
+                logger.warning("device %s: %s %s", entry.name, entry.status, entry.error or "")
+        logger.info("%s\n%s", self.summary(), self.report())
+
+    def get(self, name, timeout=None):
+        """
+        the device ``name``, once connected (or failed to connect)
+
+        Waits for this device only, at most ``timeout`` s (default: no
+        limit).  Connects it now if ``connect()`` was not called yet.
+
+        RAISES
+
+        KeyError
+            if ``name`` is not in the registry
+        concurrent.futures.TimeoutError
+            if not done connecting within ``timeout``
+        Exception
+            of ``factory()``, if the device could not be constructed
+        """
+        entry = self._entries[name]
+        with self._lock:
+            if entry.future is None:
+                self._submit(entry)
+        entry.future.result(timeout=timeout)
+        if entry.device is None:
+            raise entry.error
+        return entry.device
+
+    def wait(self, timeout=None):
+        """wait for all devices to be done connecting, True if all are"""
+        futures = [e.future for e in self._entries.values() if e.future is not None]
+        done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        return len(not_done) == 0
+
+    def summary(self):
+        """text: count of devices by status, time since connect() started"""
+        counts = {}
+        for entry in self._entries.values():
+            counts[entry.status] = counts.get(entry.status, 0) + 1
+        text = f"{len(self)} devices: "
+        text += ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+        if self.t0 is not None:
+            waits = sum(e.seconds or 0 for e in self._entries.values())
+            text += (
+                f"; connected in {self.elapsed():.2f} s"
+                f" (sum of waits {waits:.2f} s)"
+            )
+        return text
+
+    def elapsed(self):
+        """s from connect() until the last device was done (or until now)"""
+        if self.t0 is None:
+            return 0
+        ends = [e.t_done for e in self._entries.values()]
+        if None in ends:
+            return time.time() - self.t0
+        return max(ends, default=self.t0) - self.t0
+
+    def report(self):
+        """connect time of each device, slowest first, as a pyRestTable.Table"""
+        import pyRestTable
+
+        def _key(entry):
+            return -1 if entry.seconds is None else entry.seconds
+
+        table = pyRestTable.Table()
+        table.labels = "device status seconds error".split()
+        for entry in sorted(self._entries.values(), key=_key, reverse=True):
+            table.addRow((
+                entry.name,
+                entry.status,
+                "" if entry.seconds is None else f"{entry.seconds:.3f}",
+                "" if entry.error is None else str(entry.error)[:60],
+            ))
+        return table
+
+
+device_registry = DeviceRegistry()
+
+
+def benchmark(num_devices=40, delay=0.2, dead=2, timeout=1.0):
+    """
+    compare connecting in turn with the registry, simulated devices
+
+    Each of ``num_devices`` devices takes up to ``delay`` s to connect,
+    ``dead`` of them never connect (they time out after ``timeout`` s).
+    Returns the registry, ``report()`` has the connect times.
+    """
+    import random
+    from ophyd.sim import SynAxis
+
+    class _SlowAxis(SynAxis):
+        """simulated device that takes time to connect"""
+
+        connect_delay = 0
+
+        def wait_for_connection(self, all_signals=False, timeout=2.0):
+            if self.connect_delay > timeout:
+                time.sleep(timeout)
+                raise TimeoutError(f"{self.name} not connected")
+            time.sleep(self.connect_delay)
+
+    def _devices():
+        devices = []
+        for i in range(num_devices):
+            device = _SlowAxis(name=f"sim{i:02d}")
+            if i < dead:
+                device.connect_delay = 2 * timeout
+            else:
+                device.connect_delay = random.uniform(0, delay)
+            devices.append(device)
+        return devices
+
+    t0 = time.time()
+    for device in _devices():
+        try:
+            device.wait_for_connection(timeout=timeout)
+        except TimeoutError:
+            pass
+    serial = time.time() - t0
+
+    registry = DeviceRegistry(timeout=timeout)
+    t0 = time.time()
+    for device in _devices():
+        registry.add(device)
+    registry.connect(report=False)
+    first = registry.get(f"sim{num_devices - 1:02d}")
+    t_first = time.time() - t0
+    registry.wait()
+    parallel = time.time() - t0
+
+    print(
+        f"{num_devices} simulated devices ({dead} not connecting, timeout {timeout} s)"
+        f"\nin turn: {serial:.2f} s"
+        f"\nregistry: {parallel:.2f} s ({first.name} available after {t_first:.2f} s)"
+    )
+    print(registry.summary())
+    print(registry.report())
+    return registry
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,302 @@
+"""
+find the edge of a blade (such as a guard slit) in the beam
+
+As a blade moves across a beam of gaussian profile, the transmitted
+intensity is an error function of the blade position::
+
+    I(x) = background + height * (1 + erf((x - edge) / (sqrt(2) * sigma))) / 2
+
+(``height < 0`` when the blade closes as ``x`` increases).  The
+``width = 2 * sigma`` is that of the beam, as ``peak_center()`` gives
+from the derivative of a fixed-step scan.
+
+``fit_edge()`` fits this model to readings.  ``edge_scan()`` (a plan)
+takes the fewest readings it can: the two ends of the range, then
+bisection towards the half-intensity point until readings land on the
+slope, then pairs of readings on the slopes about the fitted edge until
+the edge is known to ``tolerance * width``.
+
+Compare with the fixed-step scan on a simulated blade (ophyd.sim)::
+
+    python -m instrument.utils.edge_fit
+"""
+
+__all__ = [
+    "edge_scan",
+    "fit_edge",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from bluesky import plan_stubs as bps
+from bluesky import preprocessors as bpp
+import numpy as np
+import time
+
+
+EDGE_MAX_POINTS = 30        # readings per blade, at most
+EDGE_TOLERANCE = 0.05       # of the width, 1-sigma uncertainty of the edge
+EDGE_SLOPE_POINTS = 2       # readings on the slope to end the bisection
+EDGE_SLOPE_LIMITS = (0.1, 0.9)  # fraction of the height: on the slope
+FIT_MIN_POINTS = 5          # readings needed to fit the edge (4 parameters)
+CONFIDENCE_FACTOR = 1.96    # 95% confidence interval, in standard errors
+
+
+def _edge(x, edge, sigma, height, background):
+    from scipy.special import erf
+
+    return background + height * (1 + erf((x - edge) / (np.sqrt(2) * sigma))) / 2
+
+
+def fit_edge(x, y, guess=None):
+    """
+    fit the error-function edge to y(x)
+
+    Weights are from counting statistics.  Start from ``guess``
+    (a previous result) if given, to refine the fit as points are added.
+
+    Returns dictionary (edge, edge_error, confidence, sigma, width,
+    height, background, chisqr) or ``None`` if the fit failed.
+    ``confidence`` is the half-width of the 95% confidence interval
+    of the edge.
+    """
+    from scipy.optimize import curve_fit
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) < FIT_MIN_POINTS:
+        return None
+    if guess is None:
+        order = np.argsort(x)
+        xs, ys = x[order], y[order]
+        background, height = ys[0], ys[-1] - ys[0]
+        frac = (ys - background) / (height or 1)
+        slope = xs[(frac > EDGE_SLOPE_LIMITS[0]) & (frac < EDGE_SLOPE_LIMITS[1])]
+        edge = np.interp(0.5, frac, xs) if height > 0 else np.interp(0.5, frac[::-1], xs[::-1])
+        sigma = max(np.ptp(slope) / 2 if len(slope) > 1 else 0, np.min(np.diff(xs)) / 2)
+        p0 = [edge, sigma, height, background]
+    else:
+        p0 = [guess[k] for k in "edge sigma height background".split()]
+    try:
+        popt, pcov = curve_fit(
+            _edge, x, y, p0=p0,
+            sigma=np.sqrt(np.maximum(y, 1)), absolute_sigma=True,
+            maxfev=2000,
+        )
+    except (RuntimeError, ValueError) as exc:
+        logger.debug("edge fit failed: %s", exc)
+        return None
+    edge, sigma, height, background = popt
+    if (
+        not np.isfinite(pcov[0, 0])
+        or not x.min() <= edge <= x.max()
+        or sigma == 0
+    ):
+        return None
+    edge_error = np.sqrt(pcov[0, 0])
+    residuals = (y - _edge(x, *popt)) / np.sqrt(np.maximum(y, 1))
+    return dict(
+        edge=edge,
+        edge_error=edge_error,
+        confidence=CONFIDENCE_FACTOR * edge_error,
+        sigma=abs(sigma),
+        width=2 * abs(sigma),
+        height=height,
+        background=background,
+        chisqr=(residuals**2).sum() / max(1, len(x) - 4),
+    )
+
+
+def edge_scan(
+    detectors, axis, start, end,
+    signal_name=None,
+    max_points=EDGE_MAX_POINTS,
+    tolerance=EDGE_TOLERANCE,
+    min_step=None,
+    md=None,
+):
+    """
+    plan: find the edge of a blade, moving ``axis`` from ``start`` to ``end``
+
+    The first two readings are at ``start`` and ``end``, they must
+    differ (blade out of and into the beam).  Then the range between
+    readings either side of half intensity is halved (bisection) until
+    ``EDGE_SLOPE_POINTS`` readings are on the slope or the range is less
+    than ``min_step`` (default: ``|end - start| / 200``).  With a wide
+    beam, readings are added within the final range, up to
+    ``FIT_MIN_POINTS``.  Then fit the edge and read on both sides, at
+    about ``sigma`` from the fitted edge, until the uncertainty of the
+    edge is below ``tolerance * width`` or after ``max_points`` readings.
+
+    The axis is left at the last reading.  Returns a dictionary: the
+    results of ``fit_edge()`` (``None`` values if the fit failed, with
+    ``edge`` and ``width`` from the final bisection range instead),
+    ``method`` (``fit``, ``fit (not converged)``, or ``bisection``),
+    ``points``, ``elapsed``, and the readings (``x``, ``y``).
+    """
+    t0 = time.time()
+    signal_name = signal_name or detectors[0].name
+    signal_list = list(detectors) + [axis]
+    lo, hi = min(start, end), max(start, end)
+    if min_step is None:
+        min_step = (hi - lo) / 200
+    x_data, y_data = [], []
+    result = dict(edge=None, edge_error=None, confidence=None, sigma=None, width=None)
+
+    _md = dict(
+        plan_name="edge_scan",
+        motors=(axis.name,),
+        detectors=(signal_name,),
+        edge_scan=dict(start=start, end=end, max_points=max_points, tolerance=tolerance),
+        hints=dict(dimensions=[([axis.name], "primary")]),
+    )
+    _md.update(md or {})
+
+    def _measure(position):
+        yield from bps.checkpoint()
+        yield from bps.mv(axis, min(hi, max(lo, position)))
+        reading = yield from bps.trigger_and_read(signal_list)
+        x_data.append(reading[axis.name]["value"])
+        y_data.append(reading[signal_name]["value"])
+
+    @bpp.stage_decorator(signal_list)
+    @bpp.run_decorator(md=_md)
+    def _scan():
+        yield from _measure(start)
+        yield from _measure(end)
+        y_start, y_end = y_data
+        if y_start == y_end:
+            result["method"] = "bisection"
+            return
+
+        # bisection: (a, b) bracket the half-intensity point
+        a, b = start, end
+        while len(x_data) < max_points and abs(b - a) >= min_step:
+            frac = (np.array(y_data[2:]) - y_end) / (y_start - y_end)
+            on_slope = (frac > EDGE_SLOPE_LIMITS[0]) & (frac < EDGE_SLOPE_LIMITS[1])
+            if on_slope.sum() >= EDGE_SLOPE_POINTS:
+                break
+            yield from _measure((a + b) / 2)
+            if abs(y_data[-1] - y_start) < abs(y_data[-1] - y_end):
+                a = x_data[-1]
+            else:
+                b = x_data[-1]
+        result.update(edge=(a + b) / 2, width=abs(b - a), method="bisection")
+
+        # a wide beam: the bisection ends after few readings, the fit
+        # needs more, take them on the slope, within the bracket
+        center, half = (a + b) / 2, abs(b - a) / 2
+        offsets = iter(half * np.array([0.5, -0.5, 0.25, -0.25, 0.75, -0.75]))
+        while len(x_data) < min(FIT_MIN_POINTS, max_points):
+            yield from _measure(center + next(offsets))
+
+        # refine: readings on the slopes about the fitted edge
+        fit = None
+        step = 0
+        while True:
+            fit = fit_edge(x_data, y_data, guess=fit)
+            if fit is None:
+                return
+            result.update(fit)
+            result["method"] = "fit (not converged)"
+            if fit["edge_error"] < tolerance * fit["width"]:
+                result["method"] = "fit"
+                return
+            if len(x_data) + 2 > max_points:
+                return
+            offset = fit["sigma"] * (1, 0.5, 1.5)[step % 3]
+            step += 1
+            yield from _measure(fit["edge"] - offset)
+            yield from _measure(fit["edge"] + offset)
+
+    yield from _scan()
+
+    result.update(
+        points=len(x_data),
+        elapsed=time.time() - t0,
+        x=np.array(x_data),
+        y=np.array(y_data),
+    )
+    logger.info(
+        "%s edge: %s +/- %s (95%%), width %s, %s, %d points in %.2f s",
+        axis.name, result["edge"], result["confidence"], result["width"],
+        result["method"], result["points"], result["elapsed"]
+    )
+    return result
+
+
+def benchmark(
+    edge=0.05, sigma=0.02, height=1e5, background=10,
+    start=0.25, end=-0.15, num_points=100, trials=20, point_time=0.5,
+):
+    """
+    compare edge_scan() with the fixed-step scan, on a simulated blade
+
+    The fixed-step scan takes ``num_points + 1`` readings, as
+    ``tune_blade_edge()`` of the guard slit tune, then finds the edge
+    from the derivative (``numerical_derivative()``, ``peak_center()``).
+    ``point_time`` (s, count time with motor move) estimates the time
+    each method takes at the instrument.  Returns a pyRestTable.Table.
+    """
+    from bluesky import RunEngine
+    from bluesky import plans as bp
+    from bluesky.callbacks.fitting import PeakStats
+    from ophyd.sim import SynAxis, SynSignal
+    import pyRestTable
+
+    from .derivative import numerical_derivative
+    from .peak_centers import peak_center
+
+    rng = np.random.default_rng()
+    blade = SynAxis(name="blade")
+    det = SynSignal(
+        func=lambda: rng.poisson(
+            _edge(blade.readback.get(), edge, sigma, height, background)
+        ),
+        name="det",
+    )
+    RE = RunEngine({})
+
+    stats = {"fixed step": [], "edge fit": []}
+    for _ in range(trials):
+        peaks = PeakStats(x=blade.name, y=det.name)
+        t0 = time.time()
+        RE(bp.scan([det], blade, start, end, num_points + 1), peaks)
+        x, y = numerical_derivative(peaks.x_data, peaks.y_data)
+        position, width = peak_center(x, y)
+        stats["fixed step"].append(
+            (num_points + 1, time.time() - t0, position - edge, width)
+        )
+
+        t0 = time.time()
+        results = []
+
+        def _plan():
+            results.append((yield from edge_scan([det], blade, start, end)))
+
+        RE(_plan())
+        r = results[0]
+        stats["edge fit"].append((r["points"], time.time() - t0, r["edge"] - edge, r["width"]))
+
+    table = pyRestTable.Table()
+    table.labels = "method points sim,s est.,s rms(edge-true) mean(width)".split()
+    for method, rows in stats.items():
+        points, elapsed, error, width = np.array(rows, dtype=float).T
+        table.addRow((
+            method,
+            f"{points.mean():.1f}",
+            f"{elapsed.mean():.3f}",
+            f"{points.mean() * point_time:.1f}",
+            f"{np.sqrt((error**2).mean()):.2g}",
+            f"{width.mean():.3g}",
+        ))
+    print(f"simulated blade: edge={edge} width={2 * sigma}, {trials} trials")
+    print(table)
+    return table
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,323 @@
+"""
+measure the startup (import) time of the instrument package, by module
+
+Starts a new python (a cold start, as the IPython session does) with
+``-X importtime`` and reads its report: the import tree, with the time
+of each module alone (self) and with all it imported (cumulative).
+Each module is charged to the instrument module that imported it first
+(``h5py`` to ``instrument.usaxs_support.saveFlyData``, ...), so the
+report shows what each instrument subpackage costs at startup::
+
+    python -m instrument.utils.import_profiler           # report
+    python -m instrument.utils.import_profiler --save    # new baseline
+    python -m instrument.utils.import_profiler --check   # regression?
+
+``--check`` (run after changes) exits with status 1 if the startup is
+slower than the saved baseline by more than ``--tolerance``, or if a
+module of ``DEFERRED_MODULES`` (to be imported only when used) was
+imported.
+"""
+
+__all__ = """
+    check_startup
+    ImportProfile
+    parse_importtime
+    profile_imports
+    save_baseline
+""".split()
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from collections import defaultdict
+from collections import namedtuple
+import datetime
+import json
+import os
+import re
+import subprocess
+import sys
+
+
+DEFAULT_MODULE = "instrument.collection"
+PACKAGE = "instrument"
+PACKAGE_PARENT_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+BASELINE_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "usaxs-bluesky", "import_baseline.json"
+)
+DEFERRED_MODULES = (    # not at startup, imported (lazy) when used
+    "reportlab",        # usaxs_support.encode_decode
+    "spec2nexus",       # framework.metadata reads only its version
+)   # (scipy, lxml, and h5py are imported at startup by apstools anyway)
+STARTUP_REPEAT = 3          # cold starts, the fastest is kept
+STARTUP_TOLERANCE = 0.2     # slower than the baseline by this fraction fails
+STARTUP_OWNER = "(python)"  # modules imported before the package
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)\s*$")
+
+ImportRecord = namedtuple("ImportRecord", "name self_us cumulative_us level owner")
+
+
+def parse_importtime(text):
+    """
+    records (``ImportRecord``) of ``python -X importtime`` output
+
+    In import order (a module before the modules it imported).  The
+    ``owner`` is the nearest instrument module in the import chain
+    (``STARTUP_OWNER`` if none).  Other lines of ``text`` are ignored.
+    """
+    pending = defaultdict(list)     # level: nodes waiting for their parent
+    for line in text.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        level = (len(indent) - 1) // 2
+        # python reports a module after the modules it imported
+        node = (name, int(self_us), int(cumulative_us), level, pending.pop(level + 1, []))
+        pending[level].append(node)
+
+    records = []
+
+    def _walk(node, owner):
+        name, self_us, cumulative_us, level, children = node
+        if name == PACKAGE or name.startswith(PACKAGE + "."):
+            owner = name
+        records.append(ImportRecord(name, self_us, cumulative_us, level, owner))
+        for child in children:
+            _walk(child, owner)
+
+    for node in pending.get(0, []):
+        _walk(node, STARTUP_OWNER)
+    return records
+
+
+def _subpackage(owner):
+    """``instrument.devices.stages`` -> ``instrument.devices``"""
+    return ".".join(owner.split(".")[:2])
+
+
+class ImportProfile:
+    """
+    import times of one (cold) start
+
+    PARAMETERS
+
+    text *str* :
+        Output (stderr) of ``python -X importtime``.
+    module *str* :
+        Module imported.  (default: ``None``)
+    returncode *int* :
+        Exit status of that python.  (default: 0)
+    """
+
+    def __init__(self, text, module=None, returncode=0):
+        self.module = module
+        self.returncode = returncode
+        self.records = parse_importtime(text)
+        self.errors = [
+            line for line in text.splitlines()
+            if line.strip() and not line.startswith("import time:")
+        ]
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    @property
+    def total(self):
+        """s to import everything"""
+        return sum(r.cumulative_us for r in self.records if r.level == 0) / 1e6
+
+    def imported(self, name):
+        """the record of module ``name`` (or of a submodule), else None"""
+        for record in self.records:
+            if record.name == name or record.name.startswith(name + "."):
+                return record
+
+    def by_owner(self):
+        """s charged to each instrument module (and STARTUP_OWNER)"""
+        times = defaultdict(float)
+        for record in self.records:
+            times[record.owner] += record.self_us / 1e6
+        return dict(times)
+
+    def by_subpackage(self):
+        """s charged to each instrument subpackage (and STARTUP_OWNER)"""
+        times = defaultdict(float)
+        for owner, seconds in self.by_owner().items():
+            times[_subpackage(owner)] += seconds
+        return dict(times)
+
+    def packages(self):
+        """records of packages imported by an instrument module, first time"""
+        levels = {r.name: r.level for r in self.records}
+        return [
+            r for r in self.records
+            if r.owner != STARTUP_OWNER
+            and r.name.split(".")[0] != PACKAGE
+            and r.level == levels[r.owner] + 1
+        ]
+
+    def table(self, top=20):
+        """instrument modules, by time charged (with their packages)"""
+        import pyRestTable
+
+        packages = defaultdict(list)
+        for record in self.packages():
+            packages[record.owner].append(record)
+
+        table = pyRestTable.Table()
+        table.labels = ["module", "seconds", "%", "heaviest imports (s)"]
+        total = self.total or 1
+        owners = sorted(self.by_owner().items(), key=lambda kv: kv[1], reverse=True)
+        for owner, seconds in owners[:top]:
+            heaviest = sorted(packages[owner], key=lambda r: r.cumulative_us, reverse=True)
+            table.addRow((
+                owner,
+                f"{seconds:.3f}",
+                f"{100 * seconds / total:.1f}",
+                ", ".join(f"{r.name} {r.cumulative_us / 1e6:.2f}" for r in heaviest[:3]),
+            ))
+        return table
+
+    def report(self, top=20):
+        """text: total, by subpackage, heaviest instrument modules"""
+        import pyRestTable
+
+        text = f"import {self.module}: {self.total:.3f} s"
+        if not self.ok:
+            text += f" (FAILED, exit status {self.returncode})"
+        subpackages = pyRestTable.Table()
+        subpackages.labels = "subpackage seconds".split()
+        for name, seconds in sorted(
+            self.by_subpackage().items(), key=lambda kv: kv[1], reverse=True
+        ):
+            subpackages.addRow((name, f"{seconds:.3f}"))
+        text += f"\n\n{subpackages}\n{self.table(top=top)}"
+        if not self.ok:
+            text += "\n" + "\n".join(self.errors[-5:])
+        return text
+
+
+def profile_imports(module=DEFAULT_MODULE, repeat=STARTUP_REPEAT, python=None):
+    """
+    ``ImportProfile`` of importing ``module`` in a new python
+
+    The fastest of ``repeat`` starts is kept (the first may also
+    compile the ``.pyc`` files).
+    """
+    command = [python or sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    best = None
+    for _ in range(max(1, repeat)):
+        process = subprocess.run(
+            command,
+            cwd=PACKAGE_PARENT_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        profile = ImportProfile(process.stderr, module=module, returncode=process.returncode)
+        if best is None or profile.total < best.total:
+            best = profile
+    return best
+
+
+def save_baseline(profile, filename=BASELINE_FILE):
+    """save the startup times of ``profile`` as the baseline"""
+    baseline = dict(
+        module=profile.module,
+        total=profile.total,
+        by_subpackage=profile.by_subpackage(),
+        python=sys.version.split()[0],
+        date=datetime.datetime.now().isoformat(sep=" ", timespec="seconds"),
+    )
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "w") as fp:
+        json.dump(baseline, fp, indent=2)
+    logger.info("startup baseline %.3f s saved: %s", profile.total, filename)
+    return baseline
+
+
+def check_startup(
+    module=DEFAULT_MODULE,
+    baseline_file=BASELINE_FILE,
+    tolerance=STARTUP_TOLERANCE,
+    repeat=STARTUP_REPEAT,
+):
+    """
+    compare a cold start with the baseline, returns (profile, problems)
+
+    Problems (text): the import failed, the startup is slower than the
+    baseline by more than ``tolerance`` (with the subpackages that grew
+    most), a module of ``DEFERRED_MODULES`` was imported.  No baseline
+    is not a problem (save one with ``save_baseline()``).
+    """
+    profile = profile_imports(module, repeat=repeat)
+    problems = []
+    if not profile.ok:
+        problems.append(f"import {module} failed: {profile.errors[-1:]}")
+
+    for name in DEFERRED_MODULES:
+        record = profile.imported(name)
+        if record is not None:
+            problems.append(f"{record.name} imported at startup, by {record.owner}")
+
+    if os.path.exists(baseline_file):
+        with open(baseline_file) as fp:
+            baseline = json.load(fp)
+        limit = baseline["total"] * (1 + tolerance)
+        if profile.total > limit:
+            before = baseline.get("by_subpackage", {})
+            growth = sorted(
+                (
+                    (seconds - before.get(name, 0), name)
+                    for name, seconds in profile.by_subpackage().items()
+                ),
+                reverse=True,
+            )
+            problems.append(
+                f"startup {profile.total:.3f} s > {limit:.3f} s"
+                f" (baseline {baseline['total']:.3f} s of {baseline['date']}),"
+                " grew most: "
+                + ", ".join(f"{name} {dt:+.3f} s" for dt, name in growth[:3])
+            )
+    else:
+        logger.warning("no startup baseline: %s", baseline_file)
+    return profile, problems
+
+
+def main(argv=None):
+    """command line: report, save baseline, or check for regression"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("module", nargs="?", default=DEFAULT_MODULE)
+    parser.add_argument("--save", action="store_true", help="save as baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if regressed")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=STARTUP_TOLERANCE)
+    parser.add_argument("--repeat", type=int, default=STARTUP_REPEAT)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.check:
+        profile, problems = check_startup(
+            args.module, args.baseline, args.tolerance, args.repeat
+        )
+    else:
+        profile, problems = profile_imports(args.module, repeat=args.repeat), []
+    print(profile.report(top=args.top))
+    if args.save and profile.ok:
+        save_baseline(profile, args.baseline)
+    for problem in problems:
+        print(f"REGRESSION: {problem}")
+    return 1 if len(problems) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+import a module when it is first used, not at startup
+
+For heavy packages used only by rare paths::
+
+    etree = lazy_import("lxml.etree")   # not imported yet
+    ...
+    etree.parse(filename)               # imported now
+"""
+
+__all__ = [
+    "lazy_import",
+    "LazyModule",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """stands for a module, imports it at first attribute access"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    @property
+    def imported(self):
+        return self.__dict__["_lazy_module"] is not None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_lazy_module"] = module
+            logger.debug("imported %s (lazy)", self.__name__)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "imported" if self.imported else "not imported yet"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name):
+    """module ``name``, imported when first used (now, if already imported)"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
@@ -1,17 +1,26 @@
-
 """
 center-of-mass and sqrt(variance) of y(x)
+
+``StreamingPeakStats`` computes the same statistics as bluesky's
+``PeakStats`` as each event arrives, so they are available during the
+scan (for example to stop a scan once it has passed the peak).
 """
 
-__all__ = ["peak_center",]
+__all__ = ["peak_center", "StreamingPeakStats",]
 
 import logging
 
 logger = logging.getLogger(__name__)
 logger.info(__file__)
 
+from bluesky.callbacks.core import CallbackBase
+from collections import namedtuple
 import numpy as np
 
+STATS_FIELDS = "min max com cen crossings fwhm lin_bkg".split()
+PeakStatistics = namedtuple("PeakStatistics", STATS_FIELDS)
+
+
 def peak_center(x, y, use_area=False):
     """
     calculate center-of-mass and sqrt(variance) of y vs. x
@@ -42,3 +51,219 @@ def peak_center(x, y, use_area=False):
     variance = sum_yxx / sum_y - x_bar*x_bar
     width = 2 * np.sqrt(abs(variance))
     return x_bar, width
+
+
+class StreamingPeakStats(CallbackBase):
+    """
+    peak statistics of y(x), updated with each event of a run
+
+    A replacement for ``bluesky.callbacks.fitting.PeakStats`` with the
+    same attributes (``x y x_data y_data min max com cen crossings fwhm
+    lin_bkg stats``) and the same results.  ``PeakStats`` keeps the
+    events and computes at the end of the run.  Here, each event updates
+    running sums (for ``com``, ``centroid`` and ``sigma``) and the
+    running ``min`` and ``max``, a constant cost per event.  The
+    half-maximum ``crossings`` (and ``cen`` and ``fwhm``) are computed
+    from the data only when asked for, once per new event.
+
+    The statistics are reset at the start of each run.
+
+    PARAMETERS
+
+    x *str* :
+        Field name of the x variable (such as a motor).
+    y *str* :
+        Field name of the y variable (such as a detector).
+    edge_count *int* :
+        If not ``None``, number of points at the beginning and end used
+        for a linear background subtraction (as ``PeakStats``).  The
+        background changes with each new point, so the statistics are
+        then all computed from the data when asked for.
+        (default: ``None``)
+    """
+
+    def __init__(self, x, y, *, edge_count=None, capacity=64):
+        super().__init__()
+        self.x = x
+        self.y = y
+        self._edge_count = edge_count
+        self._capacity = capacity
+        self.derivative_stats = None
+        self.reset()
+
+    def reset(self):
+        """clear all data and results"""
+        self._x = np.empty(self._capacity)
+        self._y = np.empty(self._capacity)
+        self.n = 0
+        self._sum_y = 0.0
+        self._sum_iy = 0.0
+        self._sum_xy = 0.0
+        self._sum_xxy = 0.0
+        self._argmin = None
+        self._argmax = None
+        self._stats = None      # cached, until the next event
+
+    def start(self, doc):
+        self.reset()
+        super().start(doc)
+
+    def event(self, doc):
+        try:
+            x = doc["data"][self.x]
+            y = doc["data"][self.y]
+        except KeyError:
+            pass
+        else:
+            self.append(x, y)
+        super().event(doc)
+
+    def stop(self, doc):
+        self.compute()
+        super().stop(doc)
+
+    def append(self, x, y):
+        """add one point"""
+        i = self.n
+        if i == len(self._x):
+            self._x = np.resize(self._x, 2 * i)
+            self._y = np.resize(self._y, 2 * i)
+        self._x[i] = x
+        self._y[i] = y
+        self.n += 1
+
+        self._sum_y += y
+        self._sum_iy += i * y
+        self._sum_xy += x * y
+        self._sum_xxy += x * x * y
+        # first occurrence, as np.argmin() & np.argmax()
+        if self._argmin is None or y < self._y[self._argmin]:
+            self._argmin = i
+        if self._argmax is None or y > self._y[self._argmax]:
+            self._argmax = i
+        self._stats = None
+
+    @property
+    def x_data(self):
+        return self._x[: self.n]
+
+    @property
+    def y_data(self):
+        return self._y[: self.n]
+
+    @property
+    def centroid(self):
+        """center of mass in x (not interpolated by index, as ``com``)"""
+        if self.n == 0 or self._sum_y == 0:
+            return None
+        return self._sum_xy / self._sum_y
+
+    @property
+    def sigma(self):
+        """sqrt(variance) of y(x) about ``centroid``"""
+        x_bar = self.centroid
+        if x_bar is None:
+            return None
+        return np.sqrt(abs(self._sum_xxy / self._sum_y - x_bar * x_bar))
+
+    def compute(self):
+        """return the statistics (``PeakStatistics``), computed if needed"""
+        if self._stats is None and self.n > 0:
+            if self._edge_count is None:
+                self._stats = self._streaming_stats()
+            else:
+                self._stats = self._background_stats()
+        return self._stats
+
+    @property
+    def stats(self):
+        return self.compute()
+
+    def _result(self, key):
+        stats = self.compute()
+        return None if stats is None else getattr(stats, key)
+
+    min = property(lambda self: self._result("min"))
+    max = property(lambda self: self._result("max"))
+    com = property(lambda self: self._result("com"))
+    cen = property(lambda self: self._result("cen"))
+    crossings = property(lambda self: self._result("crossings"))
+    fwhm = property(lambda self: self._result("fwhm"))
+    lin_bkg = property(lambda self: self._result("lin_bkg"))
+
+    def __getitem__(self, key):
+        if key in ["x", "y", "stats", "derivative_stats"] + STATS_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def _com(self, index_com):
+        """x at fractional index ``index_com``, as np.interp() but O(1)"""
+        if self.n == 1 or not np.isfinite(index_com):
+            return np.interp(index_com, np.arange(self.n), self.x_data)
+        i = int(np.clip(np.floor(index_com), 0, self.n - 2))
+        frac = np.clip(index_com - i, 0, 1)
+        return self._x[i] + frac * (self._x[i + 1] - self._x[i])
+
+    def _streaming_stats(self):
+        x, y = self.x_data, self.y_data
+        i_min, i_max = self._argmin, self._argmax
+        with np.errstate(divide="ignore", invalid="ignore"):
+            index_com = np.float64(self._sum_iy) / self._sum_y
+        return self._finish(
+            x, y, y,
+            (x[i_min], y[i_min]),
+            (x[i_max], y[i_max]),
+            self._com(index_com),
+            None,
+        )
+
+    def _background_stats(self):
+        x, y_orig = self.x_data, self.y_data
+        k = self._edge_count
+        left_x, left_y = np.mean(x[:k]), np.mean(y_orig[:k])
+        right_x, right_y = np.mean(x[-k:]), np.mean(y_orig[-k:])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            m = (right_y - left_y) / (right_x - left_x)
+        b = left_y - m * left_x
+        y = y_orig - (m * x + b)
+        i_min, i_max = np.argmin(y), np.argmax(y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            index_com = (np.arange(self.n) * y).sum() / y.sum()
+        return self._finish(
+            x, y, y_orig,
+            (x[i_min], y_orig[i_min]),
+            (x[i_max], y_orig[i_max]),
+            self._com(index_com),
+            {"m": m, "b": b},
+        )
+
+    @staticmethod
+    def _finish(x, y, y_orig, y_min, y_max, com, lin_bkg):
+        """interpolate the half-maximum crossings, as ``PeakStats``"""
+        mid = (np.max(y) + np.min(y)) / 2
+        i = np.nonzero(np.diff((y > mid).astype(int)))[0]
+        cen = crossings = fwhm = None
+        if len(i) > 0:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crossings = x[i] + (mid - y[i]) * (x[i + 1] - x[i]) / (y[i + 1] - y[i])
+            cen = np.mean(crossings)
+            if len(crossings) >= 2:
+                fwhm = np.abs(crossings[-1] - crossings[0], dtype=float)
+        return PeakStatistics(y_min, y_max, com, cen, crossings, fwhm, lin_bkg)
+
+    def peak_passed(self, peak_factor=4, points=2):
+        """
+        True when the scan has gone past a peak
+
+        A peak is seen (``max > peak_factor * min``, the test of
+        ``TuneAxis.peak_detected()``) and the last ``points`` readings,
+        after the maximum, are all below half maximum.  Checked with
+        each new event, so a scan can stop there.
+        """
+        if self.n < points + 2 or self._argmax >= self.n - points:
+            return False
+        y_max, y_min = self._y[self._argmax], self._y[self._argmin]
+        if not y_max > peak_factor * y_min:
+            return False
+        mid = (y_max + y_min) / 2
+        return bool((self._y[self.n - points : self.n] < mid).all())
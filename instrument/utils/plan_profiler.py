@@ -0,0 +1,340 @@
+"""
+profile where the wall-clock time of a measurement plan is spent
+
+The profiler watches the messages of a plan as they pass to the
+RunEngine.  The time between one message and the next (the RunEngine
+processing the message plus any plan code run before the next message)
+is charged to the message's command, its device, and the plan phase
+active at the time.  A ``wait`` is charged to the devices that were
+``set`` (or triggered) in the same group, so the time of a ``bps.mv()``
+lands on the motors that moved.
+
+Phases are named by wrapping parts of a plan::
+
+    @plan_profiler.profiled("SAXS")
+    def SAXS(...):
+        yield from plan_profiler.phase("mode change", mode_SAXS())
+        ...
+
+At the end of each run, a summary (seconds per phase so far) is
+logged.  At the end of each profiled plan, the summary is logged and
+the totals are appended to a rolling CSV log file.
+
+Report the top overhead contributors from the log::
+
+    python -m instrument.utils.plan_profiler
+    python -m instrument.utils.plan_profiler --by device --top 20
+"""
+
+__all__ = [
+    "PlanProfiler",
+    "plan_profiler",
+    "profile_report",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from bluesky import preprocessors as bpp
+from collections import defaultdict
+import csv
+import datetime
+import functools
+import os
+import time
+
+
+PROFILE_LOG_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "usaxs-bluesky", "plan_profile.csv"
+)
+PROFILE_LOG_MAX_BYTES = 20 * 1024 * 1024    # then rotate to *.1
+PROFILE_LOG_FIELDS = """
+    time plan title phase command device count seconds
+""".split()
+DEFAULT_PHASE = "other"
+GROUP_COMMANDS = "set trigger kickoff complete collect".split()
+REPORT_KEYS = "plan phase command device".split()
+
+
+def _obj_name(obj):
+    if obj is None:
+        return ""
+    return getattr(obj, "name", None) or str(obj)
+
+
+class _ProfileSession:
+    """time charged while one profiled plan runs"""
+
+    def __init__(self, plan_name):
+        self.plan_name = plan_name
+        self.title = ""
+        self.time_start = time.time()
+        self.t0 = time.perf_counter()
+        self.totals = defaultdict(lambda: [0, 0.0])     # key: [count, seconds]
+        self.phase = DEFAULT_PHASE
+        self.groups = defaultdict(set)
+        self._open = None       # (t, key) of the message in progress
+
+    def record(self, msg):
+        """close the previous message, start timing ``msg``"""
+        now = time.perf_counter()
+        self._close(now)
+        device = _obj_name(msg.obj)
+        group = msg.kwargs.get("group")
+        if msg.command in GROUP_COMMANDS and group is not None:
+            self.groups[group].add(device)
+        elif msg.command == "wait":
+            device = "+".join(sorted(self.groups.pop(group, [])))
+        elif msg.command == "open_run":
+            self.title = self.title or msg.kwargs.get("title", "")
+        self._open = (now, (self.phase, msg.command, device))
+
+    def _close(self, now):
+        if self._open is not None:
+            t, key = self._open
+            entry = self.totals[key]
+            entry[0] += 1
+            entry[1] += now - t
+            self._open = None
+
+    def finish(self):
+        self._close(time.perf_counter())
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.t0
+
+    def by(self, index):
+        """seconds, summed by phase (0), command (1), or device (2)"""
+        result = defaultdict(float)
+        for key, (_n, seconds) in self.totals.items():
+            result[key[index]] += seconds
+        return dict(result)
+
+    def summary(self):
+        """one line: seconds per phase, in order of decreasing time"""
+        phases = sorted(self.by(0).items(), key=lambda kv: -kv[1])
+        text = ", ".join(f"{k}={v:.1f}" for k, v in phases)
+        return f"{self.plan_name} profile (s): {text}, total={self.elapsed:.1f}"
+
+    def rows(self):
+        timestamp = datetime.datetime.fromtimestamp(self.time_start).isoformat(
+            sep=" ", timespec="seconds"
+        )
+        for (phase, command, device), (n, seconds) in sorted(self.totals.items()):
+            yield dict(
+                time=timestamp,
+                plan=self.plan_name,
+                title=self.title,
+                phase=phase,
+                command=command,
+                device=device,
+                count=n,
+                seconds=f"{seconds:.4f}",
+            )
+
+
+class PlanProfiler:
+    """
+    charge the time of a plan to its phases, message types, and devices
+
+    PARAMETERS
+
+    log_file *str* :
+        Rolling CSV file with the totals of each profiled plan.
+        Set ``None`` to skip the log.  (default: ``PROFILE_LOG_FILE``)
+    history *int* :
+        Number of recent profile sessions kept in ``sessions``.
+        (default: 20)
+    """
+
+    enabled = True
+
+    def __init__(self, log_file=PROFILE_LOG_FILE, history=20):
+        self.log_file = log_file
+        self.history = history
+        self.sessions = []
+        self._session = None
+
+    def _mutate(self, msg):
+        session = self._session
+        if session is None:
+            return msg
+        session.record(msg)
+        if msg.command == "close_run":
+            logger.info("run of %s", session.summary())
+        return msg
+
+    def phase(self, name, plan):
+        """run ``plan``, charging its time to phase ``name``"""
+        session = self._session
+        if session is None:
+            return (yield from plan)
+        previous = session.phase
+        session.phase = name
+        try:
+            return (yield from plan)
+        finally:
+            session.phase = previous
+
+    def profile(self, plan_name, plan):
+        """
+        run ``plan`` and profile it
+
+        A profiled plan run within another profiled plan becomes
+        a phase of the outer one.
+        """
+        if self._session is not None:
+            return (yield from self.phase(plan_name, plan))
+        if not self.enabled:
+            return (yield from plan)
+
+        session = _ProfileSession(plan_name)
+        self._session = session
+        try:
+            return (yield from bpp.msg_mutator(plan, self._mutate))
+        finally:
+            self._session = None
+            session.finish()
+            self.sessions = (self.sessions + [session])[-self.history:]
+            logger.info(session.summary())
+            self.write_log(session)
+
+    def profiled(self, plan_name):
+        """decorator: profile each call of a plan"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return (yield from self.profile(plan_name, func(*args, **kwargs)))
+            return wrapper
+        return decorator
+
+    def write_log(self, session):
+        """append the totals of ``session`` to the rolling CSV log"""
+        if self.log_file is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+            if (
+                os.path.exists(self.log_file)
+                and os.path.getsize(self.log_file) > PROFILE_LOG_MAX_BYTES
+            ):
+                os.replace(self.log_file, self.log_file + ".1")
+            new_file = not os.path.exists(self.log_file)
+            with open(self.log_file, "a", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=PROFILE_LOG_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(session.rows())
+        except OSError as exc:
+            logger.warning("could not write plan profile log: %s", exc)
+
+
+plan_profiler = PlanProfiler()
+
+
+def read_profile_log(log_file=PROFILE_LOG_FILE, since=None):
+    """
+    rows of the profile log (and its rotated predecessor)
+
+    ``since`` (ISO8601 text) skips rows of plans started before then
+    """
+    rows = []
+    for fname in (log_file + ".1", log_file):
+        if not os.path.exists(fname):
+            continue
+        with open(fname, newline="") as f:
+            for row in csv.DictReader(f):
+                if since is not None and row["time"] < since:
+                    continue
+                row["count"] = int(row["count"])
+                row["seconds"] = float(row["seconds"])
+                rows.append(row)
+    return rows
+
+
+def profile_report(log_file=PROFILE_LOG_FILE, by="phase", top=10, since=None, printing=True):
+    """
+    table of the top time consumers in the profile log
+
+    PARAMETERS
+
+    by *str* or *list* :
+        Sum the time by any of: ``plan phase command device``,
+        such as ``"device"`` or ``["phase", "command"]``.
+        (default: ``"phase"``)
+    top *int* :
+        Number of rows to report.  (default: 10)
+    since *str* :
+        ISO8601 date (and time), report only plans started since then,
+        such as the start of the beamtime.  (default: all)
+    """
+    import pyRestTable
+
+    keys = [by] if isinstance(by, str) else list(by)
+    for k in keys:
+        if k not in REPORT_KEYS:
+            raise ValueError(f"Cannot report by '{k}', expected one of {REPORT_KEYS}")
+
+    rows = read_profile_log(log_file, since=since)
+    plans = {(row["time"], row["plan"]) for row in rows}
+    total = sum(row["seconds"] for row in rows)
+    totals = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        entry = totals[tuple(row[k] for k in keys)]
+        entry[0] += row["count"]
+        entry[1] += row["seconds"]
+
+    table = pyRestTable.Table()
+    table.labels = keys + "messages seconds % s/plan".split()
+    ranked = sorted(totals.items(), key=lambda kv: -kv[1][1])
+    for key, (n, seconds) in ranked[:top]:
+        table.addRow(
+            list(key)
+            + [
+                n,
+                f"{seconds:.1f}",
+                f"{100 * seconds / (total or 1):.1f}",
+                f"{seconds / (len(plans) or 1):.2f}",
+            ]
+        )
+    if printing:
+        print(f"{len(plans)} plans, {total:.1f} s total, from {log_file}")
+        print(table)
+    return table
+
+
+def get_CLI_options():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="report the top time consumers of profiled USAXS plans"
+    )
+    parser.add_argument(
+        "--log",
+        default=PROFILE_LOG_FILE,
+        help=f"profile log file (default: {PROFILE_LOG_FILE})",
+    )
+    parser.add_argument(
+        "--by",
+        default="phase",
+        help=f"comma-separated, any of: {', '.join(REPORT_KEYS)} (default: phase)",
+    )
+    parser.add_argument("--top", type=int, default=10, help="number of rows")
+    parser.add_argument("--since", default=None, help="ISO8601 start date")
+    return parser.parse_args()
+
+
+def main():
+    options = get_CLI_options()
+    profile_report(
+        options.log,
+        by=options.by.split(","),
+        top=options.top,
+        since=options.since,
+    )
+
+
+if __name__ == "__main__":
+    main()
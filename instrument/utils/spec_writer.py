@@ -0,0 +1,459 @@
+"""
+SPEC data file writer for USAXS: buffered rows, batched flushes
+
+``UsaxsSpecWriterCallback`` writes the same SPEC file as apstools'
+``SpecWriterCallback`` (subscribed in ``instrument.framework.callbacks``),
+with these changes:
+
+* Rows of the primary stream are kept in memory and formatted a column
+  at a time (numpy), not a value at a time.
+* Rows are written (appended) at the end of the run and also, during
+  long runs, after ``flush_rows`` new rows or ``flush_interval`` s
+  (checked at each event), so the file follows the scan.
+* Array data is never rendered as text: array keys of the primary
+  stream are not columns (a ``#C`` line names them), array streams
+  (such as ``mca`` of the fly scan, the Struck channels) are summarized
+  by a ``#C`` line per key.
+* A uid already in the file is found from the ``#MD uid`` lines, read
+  once per file, not by reading the whole file at the end of each run.
+
+Compare with the apstools writer, a 16k-channel fly scan & a uascan::
+
+    python -m instrument.utils.spec_writer
+"""
+
+__all__ = [
+    "UsaxsSpecWriterCallback",
+]
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from apstools.callbacks import SpecWriterCallback
+import numpy as np
+import pathlib
+import time
+
+
+PRIMARY_STREAM_NAME = "primary"
+SPEC_FLUSH_INTERVAL = 30    # s, write new rows (during a run) at least this often
+SPEC_FLUSH_ROWS = 500       # write new rows (during a run) when this many
+
+
+def _is_array(data_key):
+    """Is this (descriptor) data key an array, not a single value?"""
+    return len(data_key.get("shape") or []) > 0 and not data_key.get("external")
+
+
+class UsaxsSpecWriterCallback(SpecWriterCallback):
+    """
+    SPEC data file writer: buffered rows, batched flushes, no array text
+
+    PARAMETERS
+
+    flush_interval *float* :
+        During a run, write new rows after this many s (``None``: only at
+        the end of the run).  (default: ``SPEC_FLUSH_INTERVAL``)
+    flush_rows *int* :
+        During a run, write new rows when this many (``None``: only at
+        the end of the run).  (default: ``SPEC_FLUSH_ROWS``)
+    summarize_arrays *bool* :
+        Add a ``#C`` line (size, sum, max) for each array of other
+        streams (such as ``mca``).  (default: ``True``)
+
+    Other parameters as ``apstools.callbacks.SpecWriterCallback``.
+    """
+
+    def __init__(
+        self,
+        filename=None,
+        auto_write=True,
+        RE=None,
+        reset_scan_id=False,
+        flush_interval=SPEC_FLUSH_INTERVAL,
+        flush_rows=SPEC_FLUSH_ROWS,
+        summarize_arrays=True,
+    ):
+        # before super(), it calls clear() and newfile() or usefile()
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.summarize_arrays = summarize_arrays
+        self._file_uids = None      # uids of the scans in the file, read once
+        if filename is not None:
+            self.spec_filename = pathlib.Path(filename)    # for usefile()
+        super().__init__(filename, auto_write, RE, reset_scan_id)
+
+    def clear(self):
+        """reset all scan data defaults"""
+        super().clear()
+        self.array_keys = {}            # primary stream, not columns: shape
+        self._rows_written = 0          # rows of this scan in the file
+        self._scan_header_written = False
+        self._header_comments = {}      # comments written with the #S header: count
+        self._t_flush = time.monotonic()
+
+    def newfile(self, filename=None, scan_id=None, RE=None):
+        """prepare to use a new SPEC data file (created with the first scan)"""
+        self._file_uids = None
+        return super().newfile(filename, scan_id=scan_id, RE=RE)
+
+    def usefile(self, filename):
+        """read from existing SPEC data file"""
+        self._file_uids = None
+        return super().usefile(filename)
+
+    def file_uids(self):
+        """uids of the scans in the SPEC file (the file is read once)"""
+        if self._file_uids is None:
+            self._file_uids = set()
+            if self.spec_filename.exists():
+                with open(self.spec_filename) as f:
+                    for line in f:
+                        if line.startswith("#MD uid = "):
+                            self._file_uids.add(line.split()[-1])
+        return self._file_uids
+
+    def descriptor(self, doc):
+        """
+        handle *descriptor* documents
+
+        Array keys of the primary stream are not columns.
+        """
+        super().descriptor(doc)
+        if doc["name"] != PRIMARY_STREAM_NAME:
+            return
+        for key, data_key in doc["data_keys"].items():
+            if _is_array(data_key) and key in self.data:
+                self.data.pop(key)
+                self.array_keys[key] = tuple(data_key["shape"])
+        if len(self.array_keys) > 0:
+            self._cmt(
+                "descriptor",
+                "array data not written: "
+                + ", ".join(f"{k} {list(s)}" for k, s in self.array_keys.items()),
+            )
+
+    def event(self, doc):
+        """
+        handle *event* documents
+
+        Primary stream: buffer the row, write when enough are waiting.
+        """
+        descriptor = self._streams.get(doc["descriptor"])
+        if descriptor is None:
+            raise KeyError(f"descriptor UID {doc['descriptor']} not found")
+        if descriptor["name"] == self._motor_stream_name:
+            super().event(doc)
+        elif descriptor["name"] == PRIMARY_STREAM_NAME:
+            data = doc["data"]
+            for k in data:
+                if k not in self.data and k not in self.array_keys:
+                    raise KeyError(f"unexpected failure here, key {k} not found")
+            for k, column in self.data.items():
+                if k == "Epoch":
+                    column.append(int(doc["time"] - self.time + 0.5))
+                elif k == "Epoch_float":
+                    column.append(doc["time"] - self.time)
+                else:
+                    # like SPEC, default to 0 if not found by name
+                    column.append(data.get(k, 0))
+            self.num_primary_data += 1
+            if self._flush_due():
+                self.flush()
+        elif self.summarize_arrays:
+            self._summarize_arrays(descriptor, doc)
+
+    def _summarize_arrays(self, descriptor, doc):
+        """one #C line for each array of an event of another stream"""
+        for key, data_key in descriptor["data_keys"].items():
+            if _is_array(data_key) and key in doc["data"]:
+                values = np.asarray(doc["data"][key])
+                text = f"{descriptor['name']} {key}: shape={list(values.shape)}"
+                if values.size > 0 and values.dtype.kind in "biuf":
+                    text += (
+                        f" sum={values.sum()} max={values.max()}"
+                        f" at {int(values.argmax())}"
+                    )
+                self._cmt("event", text)
+
+    def _flush_due(self):
+        if not self.auto_write:
+            return False    # the caller writes the scan
+        waiting = self.num_primary_data - self._rows_written
+        if self.flush_rows is not None and waiting >= self.flush_rows:
+            return True
+        if self.flush_interval is not None and waiting > 0:
+            return time.monotonic() - self._t_flush >= self.flush_interval
+        return False
+
+    def _scan_header_lines(self):
+        """#S ... #L lines of the scan"""
+        lines = self.prepare_scan_contents(rows=False)
+        self._header_comments = {
+            k: len(self.comments[k]) for k in ("start", "descriptor")
+        }
+        return lines
+
+    def _data_lines(self, start, stop):
+        """
+        rows ``start:stop`` of the primary stream, as text
+
+        A column of numbers all of one type is converted at once, by
+        numpy.  Others are converted value by value (numpy would make
+        ``0``, ``True``, ``3`` of a mixed column into ``0.0``, ``1.0``,
+        ``3.0``).  As SPEC expects numbers, text is replaced by the row
+        number and reported after the row in a ``#U`` line.
+        """
+        if stop <= start or len(self.data) == 0:
+            return []
+        columns = []
+        text_data = {}      # row: [(key, text)]
+        for k, values in self.data.items():
+            values = values[start:stop]
+            if len(set(map(type, values))) == 1:
+                array = np.asarray(values)
+                if array.ndim == 1 and array.dtype.kind in "biuf":
+                    columns.append(array.astype(str))
+                    continue
+            column = []
+            for i, datum in enumerate(values, start=start):
+                if isinstance(datum, str):
+                    text_data.setdefault(i, []).append((k, datum))
+                    datum = i
+                column.append(str(datum))
+            columns.append(column)
+
+        rows = [" ".join(row) for row in zip(*columns)]
+        if len(text_data) == 0:
+            return rows
+        lines = []
+        for i, row in enumerate(rows, start=start):
+            lines.append(row)
+            for k, datum in text_data.get(i, []):
+                lines.append(f"#U {i} {k} {datum}")
+        return lines
+
+    def prepare_scan_contents(self, rows=True):
+        """
+        format the scan for a SPEC data file
+
+        With ``rows=False``, only the lines before the data rows.
+
+        :returns: [str] a list of lines to append to the data file
+        """
+        # the apstools lines, without any data rows, then ours
+        num_primary_data, self.num_primary_data = self.num_primary_data, 0
+        comments, self.comments = self.comments, self._empty_comments_dict()
+        self.comments["start"] = comments["start"]
+        self.comments["descriptor"] = comments["descriptor"]
+        try:
+            lines = super().prepare_scan_contents()
+        finally:
+            self.num_primary_data = num_primary_data
+            self.comments = comments
+        if rows:
+            lines += self._data_lines(0, self.num_primary_data)
+            lines += self._comment_lines(
+                {k: len(self.comments[k]) for k in ("start", "descriptor")}
+            )
+        return lines
+
+    def _comment_lines(self, written):
+        """#C lines after the data rows, not ``written`` (count) before"""
+        lines = []
+        for key in "start descriptor event resource datum stop".split():
+            for v in self.comments[key][written.get(key, 0):]:
+                lines.append("#C " + v)
+        return lines
+
+    def _check_uid(self):
+        if self.uid in self.file_uids():
+            msg = f"{self.spec_filename} already contains uid={self.uid}"
+            raise ValueError(msg)
+
+    def _write_new_header(self):
+        """write the file header (#F ... #O), if needed"""
+        if sorted(self.positioners.keys()) != self._header_motor_keys:
+            self.write_new_header = True
+        if self.write_new_header:
+            self.write_header()
+            logger.info("wrote header to SPEC file: %s", self.spec_filename)
+
+    def flush(self):
+        """
+        write (append) the rows waiting, during a run
+
+        The first time, also the #S ... #L lines.  Comments added to the
+        start or descriptor after that are written after the rows.
+        """
+        if not self.scanning or self.uid is None:
+            return
+        lines = []
+        if not self._scan_header_written:
+            self._check_uid()
+            self._write_new_header()
+            lines += self._scan_header_lines()
+            self._scan_header_written = True
+            self.file_uids().add(self.uid)
+        lines += self._data_lines(self._rows_written, self.num_primary_data)
+        lines.append("")
+        self._write_lines_(lines, mode="a")
+        logger.debug(
+            "wrote rows %d-%d of scan %d to SPEC file: %s",
+            self._rows_written + 1,
+            self.num_primary_data,
+            self.scan_id,
+            self.spec_filename,
+        )
+        self._rows_written = self.num_primary_data
+        self._t_flush = time.monotonic()
+
+    def write_scan(self):
+        """
+        write the most recent (completed) scan to the file
+
+        * creates file if not existing
+        * writes header if needed
+        * appends scan data (what was not flushed before)
+        """
+        if self._scan_header_written:
+            lines = self._data_lines(self._rows_written, self.num_primary_data)
+            lines += self._comment_lines(self._header_comments)
+        else:
+            self._check_uid()
+            self._write_new_header()
+            lines = self.prepare_scan_contents()
+            self._scan_header_written = True
+            self.file_uids().add(self.uid)
+        lines.append("")
+        self._write_lines_(lines, mode="a")
+        self._rows_written = self.num_primary_data
+        logger.info("wrote scan %d to SPEC file: %s", self.scan_id, self.spec_filename)
+
+
+def _documents(num_rows=0, num_columns=30, num_channels=0, row_array=0):
+    """
+    (name, doc) of one simulated run
+
+    ``num_rows`` primary events of ``num_columns`` values (and of an
+    array of ``row_array`` values, if not 0), then an ``mca`` event of
+    3 arrays of ``num_channels`` values (if not 0).
+    """
+    import uuid
+
+    rng = np.random.default_rng()
+    t0 = time.time()
+    run_uid = str(uuid.uuid4())
+    columns = [f"signal{i}" for i in range(num_columns)]
+    start = dict(
+        uid=run_uid, time=t0, scan_id=1, plan_type="generator",
+        plan_name="benchmark", detectors=columns[-1:], motors=columns[:1],
+        hints={}, login_id="usaxs@localhost",
+    )
+    yield "start", start
+
+    if num_rows > 0:
+        data_keys = {k: dict(dtype="number", shape=[], source="SIM") for k in columns}
+        if row_array > 0:
+            data_keys["waveform"] = dict(dtype="array", shape=[row_array], source="SIM")
+        descriptor = dict(
+            uid=str(uuid.uuid4()), run_start=run_uid, time=t0, name="primary",
+            data_keys=data_keys, hints={columns[-1]: dict(fields=[columns[-1]])},
+            object_keys={}, configuration={},
+        )
+        yield "descriptor", descriptor
+        values = rng.random((num_rows, num_columns))
+        for i in range(num_rows):
+            data = dict(zip(columns, values[i].tolist()))
+            if row_array > 0:
+                data["waveform"] = rng.random(row_array)
+            yield "event", dict(
+                uid=str(uuid.uuid4()), descriptor=descriptor["uid"],
+                time=t0 + i, seq_num=i + 1, data=data, timestamps={},
+            )
+
+    if num_channels > 0:
+        keys = "mca1 mca2 mca3".split()
+        descriptor = dict(
+            uid=str(uuid.uuid4()), run_start=run_uid, time=t0, name="mca",
+            data_keys={
+                k: dict(dtype="array", shape=[num_channels], source="SIM")
+                for k in keys
+            },
+            hints={}, object_keys={}, configuration={},
+        )
+        yield "descriptor", descriptor
+        yield "event", dict(
+            uid=str(uuid.uuid4()), descriptor=descriptor["uid"], time=t0,
+            seq_num=1, timestamps={},
+            data={k: rng.integers(0, 100_000, num_channels) for k in keys},
+        )
+
+    yield "stop", dict(
+        uid=str(uuid.uuid4()), run_start=run_uid, time=t0,
+        exit_status="success", num_events={},
+    )
+
+
+def benchmark(num_channels=16384, num_rows=500, num_scans=100, repeat=5):
+    """
+    write time of the apstools writer and ``UsaxsSpecWriterCallback``
+
+    Each run is written to a SPEC file already holding ``num_scans``
+    uascan runs of ``num_rows`` rows: a fly scan (``mca`` stream of 3 x
+    ``num_channels``), a uascan (``num_rows`` rows), and a scan with a
+    ``num_channels`` array in the primary stream.  Best of ``repeat``.
+    """
+    import os
+    import pyRestTable
+    import shutil
+    import tempfile
+
+    runs = {
+        "fly_scan": dict(num_channels=num_channels),
+        "uascan": dict(num_rows=num_rows),
+        "array_rows": dict(num_rows=50, row_array=num_channels),
+    }
+    tempdir = tempfile.mkdtemp()
+    try:
+        existing = os.path.join(tempdir, "existing.dat")
+        writer = UsaxsSpecWriterCallback(existing)
+        for _ in range(num_scans):
+            for name, doc in _documents(num_rows=num_rows):
+                writer.receiver(name, doc)
+        size = os.path.getsize(existing)
+
+        table = pyRestTable.Table()
+        table.labels = ["run", "apstools (s)", "USAXS (s)", "apstools (bytes)", "USAXS (bytes)"]
+        for run, kwargs in runs.items():
+            documents = list(_documents(**kwargs))
+            row = [run]
+            sizes = []
+            for klass in (SpecWriterCallback, UsaxsSpecWriterCallback):
+                best = None
+                for _ in range(repeat):
+                    filename = os.path.join(tempdir, f"{klass.__name__}.dat")
+                    shutil.copy(existing, filename)
+                    writer = klass()
+                    writer.spec_filename = pathlib.Path(filename)
+                    writer.usefile(writer.spec_filename)
+                    t0 = time.perf_counter()
+                    for name, doc in documents:
+                        writer.receiver(name, doc)
+                    seconds = time.perf_counter() - t0
+                    best = seconds if best is None else min(best, seconds)
+                row.append(f"{best:.4f}")
+                sizes.append(os.path.getsize(filename) - size)
+            table.addRow(row + sizes)
+    finally:
+        shutil.rmtree(tempdir)
+
+    print(f"SPEC file of {num_scans} scans ({size / 1e6:.1f} MB) before each run")
+    print(table)
+    return table
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,255 @@
+"""
+background service to write data files, decoupled from the RunEngine
+
+Jobs (python callables) are placed on a bounded queue and run, in
+order of submission, by a pool of worker threads.  Each job has an
+ophyd ``Status`` object that reports when the job is done, and if it
+failed.  The ``backlog`` is the number of jobs not yet finished.
+
+``submit()`` does not block by default (it raises ``queue.Full``): a
+plan must not block the RunEngine thread, it waits for room with
+``bps.sleep()`` while ``full``, see ``submit_plan()``.  It waits for
+a job the same way, see ``WriterJob.wait_plan()``.
+"""
+
+__all__ = ["WriterJob", "WriterService",]
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.info(__file__)
+
+from collections import deque
+from ophyd.status import Status
+import queue
+import threading
+import time
+
+
+class WriterJob:
+    """
+    one job of the WriterService
+
+    ``status`` (ophyd Status) is finished when the job is done,
+    ``result`` is the return value of the callable,
+    ``exception`` is set if the job failed.
+    """
+
+    def __init__(self, name, func, *args, **kwargs):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = Status()
+        self.result = None
+        self.exception = None
+        self.time_submitted = time.time()
+        self.time_started = None
+        self.time_finished = None
+
+    @property
+    def done(self):
+        return self.status.done
+
+    @property
+    def success(self):
+        return self.status.done and self.exception is None
+
+    @property
+    def elapsed(self):
+        """time (s) spent running the job"""
+        if self.time_started is None:
+            return 0
+        return (self.time_finished or time.time()) - self.time_started
+
+    def run(self):
+        self.time_started = time.time()
+        try:
+            self.result = self.func(*self.args, **self.kwargs)
+        except Exception as exc:
+            self.exception = exc
+            self.time_finished = time.time()
+            logger.error("%s failed after %.2f s: %s", self.name, self.elapsed, exc)
+            self.status.set_exception(exc)
+        else:
+            self.time_finished = time.time()
+            logger.debug("%s finished in %.2f s", self.name, self.elapsed)
+            self.status.set_finished()
+
+    def wait(self, timeout=None):
+        """
+        block until the job is done, return True if it succeeded
+
+        Does not raise if the job failed, check ``exception``.
+        """
+        try:
+            self.status.wait(timeout=timeout)
+        except Exception:
+            pass
+        return self.success
+
+    def wait_plan(self, timeout=120, poll_s=0.1):
+        """
+        plan: wait (``bps.sleep()``) until the job is done, return success
+
+        Same as ``wait()``, without blocking the RunEngine.
+        """
+        from bluesky import plan_stubs as bps
+
+        t_end = time.time() + timeout
+        while not self.done and time.time() < t_end:
+            yield from bps.sleep(poll_s)
+        return self.success
+
+    def __str__(self):
+        if not self.done:
+            state = "running" if self.time_started else "queued"
+        elif self.exception is None:
+            state = "done"
+        else:
+            state = f"failed: {self.exception}"
+        return f"{self.name} ({state})"
+
+
+class WriterService:
+    """
+    bounded queue of file-writing jobs, run by worker threads
+
+    PARAMETERS
+
+    num_workers *int* :
+        Number of worker threads.  Jobs which share state (such as the
+        fly scan NeXus structure manager) must use only one worker,
+        so that they run strictly in order of submission.
+        (default: 1)
+    max_queue *int* :
+        Maximum number of jobs waiting to run.  ``submit()`` raises
+        ``queue.Full`` when the queue is full.  (default: 4)
+    history *int* :
+        Number of most recent jobs kept in ``jobs``.  (default: 20)
+    """
+
+    def __init__(self, num_workers=1, max_queue=4, history=20, name="writer"):
+        self.name = name
+        self.num_workers = num_workers
+        self.jobs = deque(maxlen=history)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._workers = []
+        self._subscribers = []
+
+    def _start_workers(self):
+        self._workers = [w for w in self._workers if w.is_alive()]
+        for i in range(len(self._workers), self.num_workers):
+            worker = threading.Thread(
+                target=self._work,
+                name=f"{self.name}_{i}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job.run()
+            finally:
+                with self._lock:
+                    self._pending.remove(job)
+                self._queue.task_done()
+                self._notify()
+
+    def _notify(self):
+        backlog = self.backlog
+        for func in self._subscribers:
+            try:
+                func(backlog)
+            except Exception as exc:
+                logger.warning("backlog subscriber %s: %s", func, exc)
+
+    def subscribe(self, func):
+        """call ``func(backlog)`` whenever the backlog changes"""
+        self._subscribers.append(func)
+
+    def submit(self, name, func, *args, timeout=0, **kwargs):
+        """
+        queue ``func(*args, **kwargs)`` to run, return its WriterJob
+
+        If the queue is full, waits up to ``timeout`` s (default: do not
+        wait), then raises ``queue.Full``.  Never call with a timeout
+        from the RunEngine thread, use ``submit_plan()``.
+        """
+        job = WriterJob(name, func, *args, **kwargs)
+        with self._lock:
+            self._start_workers()
+            self._pending.append(job)
+        try:
+            if timeout is not None and timeout <= 0:
+                self._queue.put_nowait(job)
+            else:
+                self._queue.put(job, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._pending.remove(job)
+            raise
+        self.jobs.append(job)
+        self._notify()
+        return job
+
+    def submit_plan(self, name, func, *args, timeout=120, poll_s=0.1, **kwargs):
+        """
+        plan: wait (``bps.sleep()``) for room in the queue, then submit
+
+        Returns the WriterJob.  The RunEngine is not blocked while
+        waiting (pause, abort, and suspenders work).
+
+        RAISES
+
+        RuntimeError
+            if there is no room after ``timeout`` s
+        """
+        from bluesky import plan_stubs as bps
+
+        t_end = time.time() + timeout
+        while self.full:
+            if time.time() >= t_end:
+                raise RuntimeError(
+                    f"{self.name}: no room to queue {name} after {timeout} s"
+                    f", {self.backlog} jobs pending: "
+                    + ", ".join(str(job) for job in self.pending)
+                )
+            yield from bps.sleep(poll_s)
+        return self.submit(name, func, *args, **kwargs)
+
+    @property
+    def full(self):
+        """is the queue full (``submit()`` would raise)?"""
+        return self._queue.full()
+
+    @property
+    def backlog(self):
+        """number of jobs queued or running"""
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def pending(self):
+        """list of jobs queued or running"""
+        with self._lock:
+            return list(self._pending)
+
+    @property
+    def failed(self):
+        """list of recent jobs that failed"""
+        return [job for job in self.jobs if job.done and not job.success]
+
+    def wait(self, timeout=None):
+        """block until all pending jobs are done, return True if all succeeded"""
+        t_end = None if timeout is None else time.time() + timeout
+        ok = True
+        for job in self.pending:
+            remaining = None if t_end is None else max(0, t_end - time.time())
+            ok = job.wait(timeout=remaining) and ok
+        return ok
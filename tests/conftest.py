@@ -0,0 +1,23 @@
+"""
+test setup: the instrument package, without starting the session
+
+``instrument.callbacks`` (its ``__init__``) starts the RunEngine,
+databroker, and devices.  The data reduction modules in it need none
+of that, the tests import them from the bare package.
+"""
+
+import pathlib
+import sys
+import types
+
+ROOT = pathlib.Path(__file__).parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))   # with pytest (not python -m pytest)
+
+if "instrument.callbacks" not in sys.modules:
+    import instrument
+
+    package = types.ModuleType("instrument.callbacks")
+    package.__path__ = [str(ROOT / "instrument" / "callbacks")]
+    sys.modules[package.__name__] = package
+    instrument.callbacks = package
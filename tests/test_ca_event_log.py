@@ -0,0 +1,35 @@
+"""
+CAEventLog writes buffered events on time, also when no more events arrive
+"""
+
+import time
+
+import numpy
+
+from instrument.utils.ca_event_log import CAEventLog
+from instrument.utils.ca_event_log import chunk_files
+from instrument.utils.ca_event_log import EVENT_DTYPE
+
+
+def events_written(path):
+    return sum(f.stat().st_size for f in chunk_files(path)) // EVENT_DTYPE.itemsize
+
+
+def test_flush_interval(tmp_path):
+    log = CAEventLog(tmp_path, flush_interval=0.2)
+    for i in range(3):
+        log.append("9idcLAX:test", 1000.0 + i, i)
+    assert events_written(tmp_path) == 0       # buffered
+
+    deadline = time.time() + 2
+    while events_written(tmp_path) < 3 and time.time() < deadline:
+        time.sleep(0.05)
+    assert events_written(tmp_path) == 3       # no more appends needed
+
+    log.append("9idcLAX:other", 1010.0, "text")
+    log.close()
+    assert not log._flusher.is_alive()
+    events = numpy.fromfile(chunk_files(tmp_path)[0], dtype=EVENT_DTYPE)
+    assert list(events["pv"]) == [0, 0, 0, 1]
+    assert numpy.isnan(events["value"][-1])
+    assert log.pv_names == ["9idcLAX:test", "9idcLAX:other"]
@@ -0,0 +1,100 @@
+"""
+zinger removal and peak center of rocking curves (calculate_reduced_data)
+"""
+
+import numpy
+import pytest
+
+from instrument.callbacks.calculate_reduced_data import centroid
+from instrument.callbacks.calculate_reduced_data import find_zingers
+from instrument.callbacks.calculate_reduced_data import ZINGER_THRESHOLD
+
+AR_CENTER = 10.5      # degrees
+AR_HWHM = 0.0004      # degrees
+
+
+def rocking_curve(rng, num_points=2000, center=AR_CENTER, hwhm=AR_HWHM):
+    """ar & R of a Lorentzian rocking curve, with counting noise"""
+    ar = numpy.linspace(center - 40 * hwhm, center + 40 * hwhm, num_points)
+    ar += rng.uniform(-0.1, 0.1, num_points) * (ar[1] - ar[0])   # motor jitter
+    counts = 1e3 + 1e6 / (1 + ((ar - center) / hwhm) ** 2)
+    return ar, rng.poisson(counts).astype(float)
+
+
+def add_zingers(rng, r, num_zingers=8, adjacent=False):
+    """multiply randomly chosen, separated points, returns the new r and the mask"""
+    r = r.copy()
+    zingers = numpy.zeros(len(r), dtype=bool)
+    choices = rng.choice(numpy.arange(5, len(r) - 5, 5), num_zingers, replace=False)
+    for i in choices:
+        r[i] *= rng.uniform(50, 500)
+        zingers[i] = True
+        if adjacent:
+            # a weaker neighbor, found once the stronger one is removed
+            r[i + 1] *= 10
+            zingers[i + 1] = True
+    return r, zingers
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_no_zingers_in_clean_curve(seed):
+    rng = numpy.random.default_rng(seed)
+    _ar, r = rocking_curve(rng)
+    assert not find_zingers(r).any()
+
+
+@pytest.mark.parametrize("adjacent", [False, True])
+@pytest.mark.parametrize("seed", range(10))
+def test_find_zingers(seed, adjacent):
+    rng = numpy.random.default_rng(seed)
+    _ar, r = rocking_curve(rng)
+    r, expected = add_zingers(rng, r, adjacent=adjacent)
+    numpy.testing.assert_array_equal(find_zingers(r), expected)
+
+
+def test_find_zingers_threshold():
+    r = numpy.ones(9)
+    r[4] = 3 * ZINGER_THRESHOLD - 2     # just at the limit: not a zinger
+    assert not find_zingers(r).any()
+    r[4] *= 1.01
+    numpy.testing.assert_array_equal(find_zingers(r), numpy.arange(9) == 4)
+
+
+@pytest.mark.parametrize("r", [[], [5.0], [1.0, 100.0]])
+def test_find_zingers_short(r):
+    assert len(find_zingers(r)) == len(r)
+    assert not find_zingers(r).any()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_centroid_with_zingers(seed):
+    rng = numpy.random.default_rng(seed)
+    ar, r = rocking_curve(rng)
+    center = centroid(ar, r)
+    assert center == pytest.approx(AR_CENTER, abs=0.05 * AR_HWHM)
+
+    r_zingers, zingers = add_zingers(rng, r, adjacent=seed % 2 == 1)
+    # same as if the zingers had not been measured
+    expected = centroid(ar[~zingers], r[~zingers])
+    assert centroid(ar, r_zingers) == pytest.approx(expected, rel=1e-12)
+
+
+def test_centroid_masked():
+    rng = numpy.random.default_rng(1)
+    ar, r = rocking_curve(rng)
+    masked = numpy.zeros(len(r), dtype=bool)
+    masked[::7] = True
+    r_masked = numpy.ma.masked_array(r.copy(), mask=masked)
+    r_masked.data[masked] = 1e12     # would dominate, if not masked
+    assert centroid(ar, r_masked) == pytest.approx(
+        centroid(ar[~masked], r[~masked]), rel=1e-12
+    )
+
+
+def test_centroid_one_point_peak():
+    ar = numpy.arange(10.0)
+    r = numpy.full(10, 1.0)
+    r[6] = 3.5      # above the cutoff, but not a zinger
+    assert centroid(ar, r) == 6.0
+    r[2] = 100      # a zinger before the peak does not move it
+    assert centroid(ar, r) == 6.0
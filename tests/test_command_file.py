@@ -0,0 +1,83 @@
+"""
+read_command_file() recognizes text, Excel (.xlsx), and legacy Excel (.xls) files
+"""
+
+import numpy
+import openpyxl
+import pandas
+import pytest
+
+from instrument.utils import command_file
+from instrument.utils.command_file import read_command_file
+
+ROWS = [
+    ["action", "sx", "sy", "thickness", "title", None],
+    ["FlyScan", 0, 1.5, 0.1, "blank", None],
+    ["# comment", None, None, None, None, None],
+    ["SAXS", 2, 3, 0.2, "sample A", None],
+    ["preUSAXStune", None, None, None, None, None],
+    [None, None, None, None, None, None],
+    ["WAXS", 0, 0, 0, "after the end", None],
+]
+EXPECTED = [
+    ("FlyScan", [0, 1.5, 0.1, "blank"]),
+    ("SAXS", [2, 3, 0.2, "sample A"]),
+    ("preUSAXStune", []),
+]
+
+
+def as_expected(result):
+    return [(c.action, list(c.args)) for c in result.commands]
+
+
+def test_text(tmp_path):
+    path = tmp_path / "commands.txt"
+    path.write_text('# comment\nFlyScan 0 1.5 0.1 blank\n\nSAXS 2 3 0.2 "sample A"\n')
+    result = read_command_file(path)
+    assert result.kind == "text"
+    assert as_expected(result) == [
+        ("FlyScan", ["0", "1.5", "0.1", "blank"]),
+        ("SAXS", ["2", "3", "0.2", "sample A"]),
+    ]
+
+
+def test_xlsx(tmp_path):
+    path = tmp_path / "commands.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in [["title row"], [], []] + ROWS:
+        ws.append(row)
+    wb.save(path)
+
+    result = read_command_file(path)
+    assert result.kind == "excel"
+    assert as_expected(result) == EXPECTED
+
+
+def test_xls(tmp_path, monkeypatch):
+    """a legacy .xls file is not a zip file, it must not be read as text"""
+    path = tmp_path / "commands.xls"
+    path.write_bytes(command_file.OLE2_SIGNATURE + bytes(504))
+    sheet = pandas.DataFrame(
+        [["title row"] + [None] * 5, [None] * 6, [None] * 6] + ROWS
+    ).fillna(numpy.nan)     # blank cells, as pandas reads them
+    calls = []
+
+    def read_excel(filename, **kwargs):
+        calls.append(kwargs)
+        return sheet
+
+    monkeypatch.setattr(pandas, "read_excel", read_excel)
+    result = read_command_file(path)
+    assert result.kind == "excel"
+    assert calls[0]["engine"] == "xlrd"
+    assert as_expected(result) == EXPECTED
+
+
+def test_xls_unreadable(tmp_path):
+    """not a proper .xls file: an error, not commands read as text"""
+    path = tmp_path / "broken.xls"
+    path.write_bytes(command_file.OLE2_SIGNATURE + b"FlyScan 0 0 0 blank\n")
+    with pytest.raises(Exception):
+        read_command_file(path)
+    assert str(path) not in command_file._cache
@@ -0,0 +1,145 @@
+"""
+DeviceRegistry connects simulated devices (ophyd.sim) concurrently
+"""
+
+import concurrent.futures
+import threading
+import time
+
+from ophyd.sim import SynAxis
+import pytest
+
+from instrument.utils.device_registry import DeviceRegistry
+
+
+class SlowAxis(SynAxis):
+    """simulated device that takes ``connect_delay`` s to connect"""
+
+    def __init__(self, *args, connect_delay=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connect_delay = connect_delay
+
+    def wait_for_connection(self, all_signals=False, timeout=2.0):
+        if self.connect_delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"{self.name} not connected")
+        time.sleep(self.connect_delay)
+
+
+def test_get_waits_for_that_device_only():
+    registry = DeviceRegistry(timeout=5)
+    registry.add(SlowAxis(name="slow", connect_delay=2))
+    registry.add(SlowAxis(name="fast", connect_delay=0.05))
+    registry.connect(report=False)
+
+    t0 = time.time()
+    fast = registry["fast"]
+    assert fast.name == "fast"
+    assert time.time() - t0 < 1
+    assert registry._entries["slow"].status == "pending"
+
+    assert registry.wait(timeout=5)
+    assert registry._entries["slow"].status == "connected"
+
+
+def test_connect_is_concurrent():
+    registry = DeviceRegistry(timeout=5, max_workers=10)
+    for i in range(10):
+        registry.add(SlowAxis(name=f"sim{i}", connect_delay=0.3))
+
+    t0 = time.time()
+    registry.connect(report=False)
+    assert time.time() - t0 < 0.3     # returns at once
+    assert registry.wait(timeout=5)
+    assert time.time() - t0 < 1.5     # not 10 * 0.3 s
+    assert "10 connected" in registry.summary()
+
+
+def test_on_connect_done_before_get_returns():
+    registry = DeviceRegistry(timeout=5)
+    done = []
+
+    def setup(device):
+        time.sleep(0.2)
+        device.ramp = device.velocity       # as the Linkam setup
+        done.append(device.name)
+
+    registry.add(SlowAxis(name="linkam", connect_delay=0.1), on_connect=setup)
+    registry.connect(report=False)
+
+    device = registry.get("linkam")
+    assert done == ["linkam"]
+    assert device.ramp is device.velocity
+
+
+def test_timeout_and_error():
+    def broken(device):
+        raise RuntimeError("setup failed")
+
+    registry = DeviceRegistry(timeout=0.2)
+    hooks = []
+    registry.add(SlowAxis(name="dead", connect_delay=10), on_connect=hooks.append)
+    registry.add(SlowAxis(name="broken"), on_connect=broken)
+    registry.connect(report=False)
+
+    assert registry["dead"].name == "dead"     # done, not connected
+    assert registry._entries["dead"].status == "timeout"
+    assert hooks == []                          # not called
+    registry["broken"]
+    assert registry._entries["broken"].status == "error"
+    assert "setup failed" in str(registry._entries["broken"].error)
+
+    assert registry.wait(timeout=1)
+    table = str(registry.report())
+    assert "timeout" in table and "error" in table
+
+
+def test_get_timeout():
+    registry = DeviceRegistry(timeout=5)
+    registry.add(SlowAxis(name="slow", connect_delay=1))
+    registry.connect(report=False)
+    with pytest.raises(concurrent.futures.TimeoutError):
+        registry.get("slow", timeout=0.1)
+    with pytest.raises(KeyError):
+        registry.get("unknown")
+    registry.wait()
+
+
+def test_declare():
+    registry = DeviceRegistry(timeout=5)
+    constructed = []
+
+    def factory():
+        constructed.append(threading.current_thread().name)
+        return SlowAxis(name="lazy")
+
+    def no_device():
+        raise ValueError("no prefix")
+
+    registry.declare("lazy", factory)
+    registry.declare("missing", no_device)
+    assert constructed == []                   # not before connecting
+
+    assert registry.get("lazy").name == "lazy"     # connects it now
+    assert constructed[0].startswith("device_registry")
+    with pytest.raises(ValueError):
+        registry.get("missing")
+
+
+def test_add_namespace():
+    axis = SynAxis(name="axis")
+    namespace = dict(
+        axis=axis,
+        alias=axis,                 # same device, once
+        _private=SynAxis(name="private"),
+        component=axis.readback,    # not a top-level device
+        number=1,
+    )
+    registry = DeviceRegistry()
+    registry.add(axis, name="axis")
+    registry.add_namespace(namespace)
+    assert registry.names == ["axis"]
+
+    registry.add_namespace(dict(other=SynAxis(name="sim_other")))
+    assert "other" in registry
+    assert len(registry) == 2
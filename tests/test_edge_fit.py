@@ -0,0 +1,57 @@
+"""
+edge_scan() finds the edge of a simulated blade (ophyd.sim)
+"""
+
+from bluesky import RunEngine
+import numpy
+from ophyd.sim import SynAxis
+from ophyd.sim import SynSignal
+import pytest
+
+from instrument.utils.edge_fit import _edge
+from instrument.utils.edge_fit import edge_scan
+from instrument.utils.edge_fit import FIT_MIN_POINTS
+
+EDGE = 0.05
+START, END = 0.25, -0.15    # as the benchmark: blade out of, then into the beam
+
+
+def find_edge(sigma, seed, max_points=30):
+    rng = numpy.random.default_rng(seed)
+    blade = SynAxis(name="blade")
+    det = SynSignal(
+        func=lambda: rng.poisson(_edge(blade.readback.get(), EDGE, sigma, 1e5, 10)),
+        name="det",
+    )
+    results = []
+
+    def _plan():
+        results.append((yield from edge_scan([det], blade, START, END, max_points=max_points)))
+
+    RunEngine({})(_plan())
+    return results[0]
+
+
+@pytest.mark.parametrize("sigma", [0.005, 0.02, 0.05, 0.1, 0.15])
+@pytest.mark.parametrize("seed", range(3))
+def test_edge_scan(sigma, seed):
+    result = find_edge(sigma, seed)
+    assert result["method"] == "fit"
+    assert result["points"] >= FIT_MIN_POINTS
+    assert result["edge"] == pytest.approx(EDGE, abs=0.1 * sigma)
+    assert result["width"] == pytest.approx(2 * sigma, rel=0.25)
+    assert len(result["x"]) == len(result["y"]) == result["points"]
+
+
+@pytest.mark.parametrize("sigma", [0.1, 0.15])
+def test_wide_beam_not_bisection(sigma):
+    """the bisection ends after 4 readings: more are needed to fit"""
+    result = find_edge(sigma, 0)
+    assert result["method"] != "bisection"
+    assert result["confidence"] is not None
+
+
+def test_max_points():
+    result = find_edge(0.02, 0, max_points=4)
+    assert result["points"] <= 4
+    assert result["method"] == "bisection"
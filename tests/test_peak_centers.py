@@ -0,0 +1,119 @@
+"""
+StreamingPeakStats gives the same results as bluesky's PeakStats
+"""
+
+from bluesky.callbacks.fitting import PeakStats
+import numpy
+import pytest
+
+from instrument.utils.peak_centers import STATS_FIELDS
+from instrument.utils.peak_centers import StreamingPeakStats
+
+NUM_SCANS = 300
+
+
+def random_scan(rng):
+    """x & y of a tune scan: a noisy peak on a sloped background"""
+    num_points = int(rng.integers(5, 80))
+    x = numpy.linspace(*rng.uniform(-2, 2, 2), num_points)   # either direction
+    center = rng.uniform(x.min(), x.max())
+    width = rng.uniform(0.01, 1) * (x.max() - x.min())
+    y = rng.uniform(1e2, 1e6) * numpy.exp(-(((x - center) / width) ** 2))
+    y += rng.uniform(0, 100) + rng.uniform(-20, 20) * x
+    y += rng.normal(0, rng.uniform(0, 0.05) * y.max(), num_points)
+    if rng.uniform() < 0.2:
+        y = numpy.round(y)      # detector counts: ties for the maximum
+    return x, y
+
+
+def documents(x, y, num_events=None):
+    yield "start", dict(uid="start", time=0)
+    yield "descriptor", dict(uid="descriptor", run_start="start", time=0, data_keys={})
+    for i, (xi, yi) in enumerate(zip(x[:num_events], y[:num_events])):
+        yield "event", dict(
+            uid=f"event{i}",
+            descriptor="descriptor",
+            seq_num=i + 1,
+            time=i,
+            data=dict(motor=xi, det=yi),
+            timestamps=dict(motor=i, det=i),
+        )
+    yield "stop", dict(uid="stop", run_start="start", time=0, exit_status="success")
+
+
+def assert_same(value, expected):
+    if expected is None:
+        assert value is None
+    elif isinstance(expected, dict):
+        assert value.keys() == expected.keys()
+        for k in expected:
+            assert_same(value[k], expected[k])
+    else:
+        numpy.testing.assert_allclose(value, expected, rtol=1e-9, atol=1e-12)
+
+
+def assert_same_stats(streaming, peak_stats):
+    for key in STATS_FIELDS:
+        assert_same(getattr(streaming, key), getattr(peak_stats, key))
+        assert_same(getattr(streaming.stats, key), getattr(peak_stats.stats, key))
+    numpy.testing.assert_array_equal(streaming.x_data, peak_stats.x_data)
+    numpy.testing.assert_array_equal(streaming.y_data, peak_stats.y_data)
+
+
+@pytest.mark.parametrize("edge_count", [None, 2, 5])
+def test_same_as_PeakStats(edge_count):
+    rng = numpy.random.default_rng(16)
+    for _ in range(NUM_SCANS):
+        x, y = random_scan(rng)
+        streaming = StreamingPeakStats("motor", "det", edge_count=edge_count)
+        peak_stats = PeakStats("motor", "det", edge_count=edge_count)
+        for name, doc in documents(x, y):
+            streaming(name, doc)
+            peak_stats(name, doc)
+        assert_same_stats(streaming, peak_stats)
+
+
+@pytest.mark.parametrize("edge_count", [None, 3])
+def test_same_during_the_scan(edge_count):
+    """results after each event: as PeakStats of the scan so far"""
+    rng = numpy.random.default_rng(61)
+    x, y = random_scan(rng)
+    streaming = StreamingPeakStats("motor", "det", edge_count=edge_count)
+    for name, doc in documents(x, y):
+        if name == "stop":
+            break
+        streaming(name, doc)
+        if name != "event" or streaming.n < 3:
+            continue
+        peak_stats = PeakStats("motor", "det", edge_count=edge_count)
+        for args in documents(x, y, streaming.n):
+            peak_stats(*args)
+        assert_same_stats(streaming, peak_stats)
+
+
+def test_reset_at_start():
+    rng = numpy.random.default_rng(0)
+    streaming = StreamingPeakStats("motor", "det", capacity=4)   # must grow
+    for _ in range(3):
+        x, y = random_scan(rng)
+        peak_stats = PeakStats("motor", "det")
+        for name, doc in documents(x, y):
+            streaming(name, doc)
+            peak_stats(name, doc)
+        assert streaming.n == len(x)
+        assert_same_stats(streaming, peak_stats)
+
+
+def test_peak_passed():
+    x = numpy.linspace(-1, 1, 41)
+    y = 10 + 1000 * numpy.exp(-((x / 0.1) ** 2))
+    streaming = StreamingPeakStats("motor", "det")
+    passed = []
+    for name, doc in documents(x, y):
+        streaming(name, doc)
+        if name == "event":
+            passed.append(streaming.peak_passed())
+    # half maximum at x = +/-0.083: two points beyond at x = 0.15
+    first = passed.index(True)
+    assert x[first] == pytest.approx(0.15)
+    assert not any(passed[:first])
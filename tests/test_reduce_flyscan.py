@@ -0,0 +1,157 @@
+"""
+reduce_flyscan() of a small synthetic saveFlyData file, with amplifier range changes
+"""
+
+import h5py
+import numpy
+import pytest
+
+from instrument.callbacks.calculate_reduced_data import amplifier_range_per_channel
+from instrument.callbacks.calculate_reduced_data import reduce_flyscan
+from instrument.callbacks.calculate_reduced_data import reduce_flyscan_file
+
+NUM_CHANNELS = 2000
+CLOCK = 50e6                # 1/s, mca_clock_frequency
+CHANNEL_TIME = 1e-3         # s
+AR_START, AR_INCREMENT = 10.51, -1e-5
+AR_CENTER = 10.5
+UPD_GAINS = [1e4, 1e5, 1e6, 1e7, 1e8]
+UPD_DARK = [1e2, 2e2, 3e2, 4e2, 5e2]      # counts/s
+UPD_MASK_TIMES = [0.0025, 0.0025, 0.0035, 0.0045, 0.0055]   # s, per range
+I0_GAIN, I0_DARK = 1e6, 50
+
+
+def true_ratio(ar):
+    return 1e-5 + 1 / (1 + ((ar - AR_CENTER) / 4e-5) ** 2)
+
+
+def synthetic_scan():
+    """channels, ranges of the photodiode, and the expected mask"""
+    channels = numpy.arange(NUM_CHANNELS)
+    seconds = numpy.full(NUM_CHANNELS, CHANNEL_TIME)
+    seconds[::3] *= 1.2     # channels are not all the same length
+    ar = AR_START + AR_INCREMENT * channels
+    i0 = 1e3 * numpy.ones(NUM_CHANNELS)
+    pd = true_ratio(ar) * i0
+    # amplifier range: the most sensitive which does not saturate
+    ranges = numpy.clip(4 - numpy.floor(numpy.log10(pd / pd.min())).astype(int), 0, 4)
+    change = numpy.flatnonzero(numpy.diff(ranges)) + 1
+    change_channels = numpy.concatenate(([0], change))
+    return channels, seconds, ar, i0, pd, ranges, change_channels
+
+
+def write_file(filename, amplifier=0, names=(b"DLPCA200", b"DDPCA300"), mask_times=True):
+    channels, seconds, ar, i0, pd, ranges, change_channels = synthetic_scan()
+    gains = numpy.array(UPD_GAINS)[ranges]
+    dark = numpy.array(UPD_DARK)[ranges]
+    pd_counts = pd * gains * seconds + dark * seconds
+    pd_counts[change_channels[1:]] *= 0.01      # range change: not settled
+    i0_counts = i0 * I0_GAIN * seconds + I0_DARK * seconds
+
+    name = names[amplifier].decode()
+    padding = 10    # the IOC arrays are longer than the number of changes
+    with h5py.File(filename, "w") as root:
+        flyscan = root.create_group("/entry/flyScan")
+        flyscan["mca1"] = numpy.round(seconds * CLOCK)
+        flyscan["mca2"] = i0_counts
+        flyscan["mca3"] = pd_counts
+        flyscan["mca_channels"] = [NUM_CHANNELS]
+        flyscan["mca_clock_frequency"] = [CLOCK]
+        flyscan["AR_start"] = [AR_START]
+        flyscan["AR_increment"] = [AR_INCREMENT]
+        flyscan["upd_flyScan_amplifier"] = [amplifier]
+        flyscan["upd_flyScan_amplifier_ZNAM"] = [names[0]]
+        flyscan["upd_flyScan_amplifier_ONAM"] = [names[1]]
+        flyscan[f"changes_{name}_mcsChan"] = numpy.pad(change_channels, (0, padding))
+        flyscan[f"changes_{name}_ampGain"] = numpy.pad(ranges[change_channels], (0, padding))
+        flyscan["changes_I0_mcsChan"] = numpy.zeros(padding, dtype=int)
+        flyscan["changes_I0_ampGain"] = numpy.zeros(padding, dtype=int)
+
+        metadata = root.create_group("/entry/metadata")
+        metadata["DCM_wavelength"] = [0.59]
+        metadata["AR_center"] = [AR_CENTER]
+        for r in range(5):
+            metadata[f"upd_gain{r}"] = [UPD_GAINS[r]]
+            metadata[f"upd_bkg{r}"] = [UPD_DARK[r]]
+            metadata[f"I0_gain{r}"] = [I0_GAIN]
+            metadata[f"I0_bkg{r}"] = [I0_DARK]
+            if mask_times:
+                metadata[f"upd_amp_change_mask_time{r}"] = [UPD_MASK_TIMES[r]]
+
+
+def expected_mask():
+    _channels, seconds, _ar, _i0, _pd, ranges, change_channels = synthetic_scan()
+    t = numpy.concatenate(([0], numpy.cumsum(seconds)[:-1]))
+    mask = numpy.zeros(NUM_CHANNELS, dtype=bool)
+    for c in change_channels[1:]:
+        mask |= (t >= t[c]) & (t - t[c] < UPD_MASK_TIMES[ranges[c]])
+    return mask
+
+
+def test_synthetic_scan_has_range_changes():
+    _channels, _seconds, _ar, _i0, _pd, ranges, change_channels = synthetic_scan()
+    assert len(change_channels) > 4
+    assert set(ranges) == set(range(5))
+
+
+def test_amplifier_range_per_channel():
+    _channels, seconds, _ar, _i0, _pd, ranges, change_channels = synthetic_scan()
+    result, mask = amplifier_range_per_channel(
+        change_channels, ranges[change_channels], NUM_CHANNELS,
+        seconds=seconds, mask_times=UPD_MASK_TIMES,
+    )
+    numpy.testing.assert_array_equal(result, ranges)
+    numpy.testing.assert_array_equal(mask, expected_mask())
+
+    _result, mask = amplifier_range_per_channel(
+        change_channels, ranges[change_channels], NUM_CHANNELS, mask_after_change=2
+    )
+    assert mask.sum() == 2 * (len(change_channels) - 1)
+
+
+@pytest.mark.parametrize("amplifier, names", [
+    (0, (b"DLPCA200", b"DDPCA300")),
+    (1, (b"DLPCA200", b"DDPCA300")),
+    (1, (b"model_A", b"model_B")),      # as named by the IOC
+])
+def test_reduce_flyscan(tmp_path, amplifier, names):
+    filename = tmp_path / "flyscan.h5"
+    write_file(filename, amplifier=amplifier, names=names)
+    with h5py.File(filename, "r") as root:
+        data = reduce_flyscan(root)
+
+    mask = expected_mask()
+    _channels, seconds, ar, _i0, _pd, _ranges, _change = synthetic_scan()
+    assert data["num_channels"] == NUM_CHANNELS
+    assert len(data["R"]) == NUM_CHANNELS - mask.sum()
+    # gain & dark current corrected, the unsettled channels masked
+    numpy.testing.assert_allclose(data["R"], true_ratio(ar[~mask]), rtol=1e-9)
+    numpy.testing.assert_allclose(data["seconds"], seconds[~mask])
+    assert data["ar_0"] == AR_CENTER
+    assert data["ar_r_peak"] == pytest.approx(AR_CENTER, abs=abs(AR_INCREMENT))
+    assert (numpy.diff(data["Q"]) > 0).all()
+    assert (data["dR"] > 0).all()
+
+
+def test_reduce_flyscan_without_mask_times(tmp_path):
+    """older files: range changes are not masked, the unsettled channels remain"""
+    filename = tmp_path / "flyscan.h5"
+    write_file(filename, mask_times=False)
+    with h5py.File(filename, "r") as root:
+        data = reduce_flyscan(root)
+    assert len(data["R"]) == NUM_CHANNELS
+
+
+def test_reduce_flyscan_file(tmp_path):
+    filename = tmp_path / "flyscan.h5"
+    write_file(filename)
+    for _ in range(2):      # written again: replaced
+        data = reduce_flyscan_file(filename, num_bins=50)
+    with h5py.File(filename, "r") as root:
+        full = root["/entry/flyscan_reduced_full"]
+        rebinned = root["/entry/flyscan_reduced_rebinned"]
+        assert full.attrs["NX_class"] == "NXdata"
+        assert full.attrs["signal"] == "R"
+        numpy.testing.assert_array_equal(full["R"][()], data["R"])
+        assert 0 < len(rebinned["Q"]) <= 50
+        assert rebinned["Q"].attrs["units"] == "1/A"
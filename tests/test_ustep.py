@@ -0,0 +1,30 @@
+"""
+Ustep factor: Brent's method (cached) agrees with the original bisection
+"""
+
+import pytest
+
+from instrument.usaxs_support.ustep import find_factor
+from instrument.usaxs_support.ustep import find_factor_bisect
+from instrument.usaxs_support.ustep import Ustep
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        (10.0, 9.5, 7, 100, 1.2, 0.0001),
+        (10.0, 9.5, 7, 2000, 1.2, 0.0001),
+        (7, 9.5, 10.0, 150, 1.5, 0.0002),     # increasing angles
+    ],
+)
+def test_factor(params):
+    start, center, finish, numPts, exponent, minStep = params
+    find_factor.cache_clear()
+    factor = find_factor(*params)
+    assert factor == pytest.approx(find_factor_bisect(*params), rel=1e-3)
+
+    u = Ustep(*params)
+    series = u.series(factor)
+    span = abs(series[-1] - series[0])
+    assert span == pytest.approx(abs(finish - start), abs=0.2 * minStep)
+    assert u.series()[-1] == finish
@@ -48,7 +48,24 @@ def analyze(buffer):
 
 
 def main():
-    buf = read_logs(LOGFILE)
+    # import once into a binary log, analyzed memory-mapped (fast, any size)
+    main_event_log(LOGFILE)
+
+
+def main_event_log(logfile):
+    import sys
+
+    if str(PATH.parent) not in sys.path:
+        # run as a script, only user/ is on the path
+        sys.path.insert(0, str(PATH.parent))
+    from instrument.utils.ca_event_analyzer import main as analyzer
+
+    analyzer([str(logfile)])
+
+
+def main_text(logfile):
+    # the original: reads all of the text file into memory
+    buf = read_logs(logfile)
     for k, v in buf.items():
         print(f"{k=}  {len(v)=} camonitor events")
     analyze(buf)
@@ -27,7 +27,7 @@ from bluesky import plan_stubs as bps
 from ophyd import Signal
 import time
 
-from instrument.devices import linkam_ci94, linkam_tc1
+from instrument.utils.device_registry import device_registry
 from instrument.plans import SAXS, USAXSscan, WAXS
 from instrument.plans import before_command_list, after_command_list
 
@@ -77,8 +77,9 @@ def myLinkamPlan(pos_X, pos_Y, thickness, scan_title, temp1, rate1, delay1min, t
             md["title"]=sampleMod
             yield from WAXS(pos_X, pos_Y, thickness, sampleMod, md={})
 
-    linkam = linkam_tc1     #New Linkam from windows ioc (all except NIST 1500).
-    #linkam = linkam_ci94   #this is old TS1500 NIST from LAX
+    # waits until connected and configured (_linkam_setup)
+    linkam = device_registry["linkam_tc1"]     #New Linkam from windows ioc (all except NIST 1500).
+    #linkam = device_registry["linkam_ci94"]   #this is old TS1500 NIST from LAX
     #logger.info(f"Linkam controller PV prefix={linkam.prefix}")
     isDebugMode = linkam_debug.get()
 
@@ -178,8 +179,9 @@ def fanLinkamPlan(pos_X, pos_Y, thickness, scan_title, temp1, rate1, delay1min,
         yield from change_ramp_rate(rate)
         yield from linkam_change_setpoint(t, wait=wait)
 
-    linkam = linkam_tc1     #New Linkam from windows ioc (all except NIST 1500).
-    #linkam = linkam_ci94   #this is old TS1500 NIST from LAX
+    # waits until connected and configured (_linkam_setup)
+    linkam = device_registry["linkam_tc1"]     #New Linkam from windows ioc (all except NIST 1500).
+    #linkam = device_registry["linkam_ci94"]   #this is old TS1500 NIST from LAX
     logger.info(f"Linkam controller PV prefix={linkam.prefix}")
     isDebugMode = linkam_debug.get()
 
@@ -292,8 +294,9 @@ def Fan718LinkamPlan(pos_X, pos_Y, thickness, scan_title, temp1, rate1, delay1mi
         yield from change_ramp_rate(rate)
         yield from linkam_change_setpoint(t, wait=wait)
 
-    linkam = linkam_tc1     #New Linkam from windows ioc (all except NIST 1500).
-    #linkam = linkam_ci94   #this is old TS1500 NIST from LAX
+    # waits until connected and configured (_linkam_setup)
+    linkam = device_registry["linkam_tc1"]     #New Linkam from windows ioc (all except NIST 1500).
+    #linkam = device_registry["linkam_ci94"]   #this is old TS1500 NIST from LAX
     logger.info(f"Linkam controller PV prefix={linkam.prefix}")
     isDebugMode = linkam_debug.get()
 
@@ -437,8 +440,9 @@ def FanCryoPlan(pos_X, pos_Y, thickness, scan_title, temp1, rate1, delay1min, te
         yield from change_ramp_rate(rate)
         yield from linkam_change_setpoint(t, wait=wait)
 
-    linkam = linkam_tc1     #New Linkam from windows ioc (all except NIST 1500).
-    #linkam = linkam_ci94   #this is old TS1500 NIST from LAX
+    # waits until connected and configured (_linkam_setup)
+    linkam = device_registry["linkam_tc1"]     #New Linkam from windows ioc (all except NIST 1500).
+    #linkam = device_registry["linkam_ci94"]   #this is old TS1500 NIST from LAX
     logger.info(f"Linkam controller PV prefix={linkam.prefix}")
     isDebugMode = linkam_debug.get()
 